@@ -1,222 +1,217 @@
 import json
 import re
-from groq import Groq
-from config import GROQ_API_KEY, user_histories
-from utils import load_system_prompt, log_message, combine_character_prompt
+from contextlib import aclosing
+from config import user_histories
+from conversation_store import conversation_store
+from utils import load_system_prompt, log_message, combine_character_prompt, get_prompt_version
+from model_router import model_router
+from explanation_cache import explanation_cache
+from word_index import word_index
+from prompt_table import prompt_table
+from tracing import tracer
+# Validation lives in response_validator; re-exported here for existing callers
+from response_validator import validate_ai_response, StreamValidator, TELEGRAM_MAX_MESSAGE_LENGTH
 
-# Initialize the Groq API client
-client = Groq(api_key=GROQ_API_KEY)
+# Small models sometimes wrap JSON answers in a Markdown code fence
+_JSON_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
 
-# Telegram's message length limit
-TELEGRAM_MAX_MESSAGE_LENGTH = 4096
-
-def validate_ai_response(response: str, character_key: str = None) -> tuple[bool, str]:
-    """
-    Validates an AI response for corruption, excessive length, and other issues.
-    Returns (is_valid, cleaned_response_or_fallback)
-    """
-    if not response or not response.strip():
-        return False, "I'm not sure how to respond to that."
-    
-    response = response.strip()
-    
-    # Check for excessive length (Telegram limit and corruption indicator)
-    if len(response) > TELEGRAM_MAX_MESSAGE_LENGTH:
-        print(f"WARNING: AI response too long ({len(response)} chars), truncating")
-        response = response[:TELEGRAM_MAX_MESSAGE_LENGTH-50] + "..."
-        return True, response
-    
-    # Check for suspiciously long responses that might indicate corruption
-    if len(response) > 2000:
-        # For longer responses, do additional corruption checks
-        char_variety = len(set(response.replace(' ', '').replace('\n', '').replace('\t', '')))
-        if char_variety < 20:  # Very low character variety suggests repetition
-            print(f"WARNING: Suspiciously long response with low character variety ({char_variety} unique chars)")
-            return False, _get_fallback_response(character_key)
-    
-    # Check for corruption patterns
-    corruption_patterns = [
-        # Excessive repetition of random words
-        r'\b(\w+)(\s+\1){10,}',  # Same word repeated 10+ times
-        # Random code-like patterns
-        r'(BuilderFactory|externalActionCode|RODUCTION|\.visitInsn){5,}',
-        # Excessive dashes or special characters
-        r'[-]{20,}',
-        # Random programming terms repeated
-        r'(PSI|MAV|Basel|Toastr|contaminants|roscope){5,}',
-        # Excessive parentheses or brackets
-        r'[\(\)\[\]]{10,}',
-        # Excessive quotes (new pattern for the reported issue)
-        r'["\'"]{15,}',  # 15+ consecutive quote characters
-        # Repeated test/option strings (new pattern)
-        r'(test){8,}',  # "test" repeated 8+ times
-        r'(option){8,}',  # "option" repeated 8+ times
-        # Comma-separated repeated words (new pattern)
-        r'("[^"]*",\s*){20,}',  # 20+ comma-separated quoted items
-        # Excessive commas
-        r'[,]{10,}',  # 10+ consecutive commas
-    ]
-    
-    for pattern in corruption_patterns:
-        if re.search(pattern, response, re.IGNORECASE):
-            print(f"WARNING: Corrupted AI response detected (pattern: {pattern[:20]}...)")
-            print(f"Corrupted response preview: {response[:200]}...")
-            return False, _get_fallback_response(character_key)
-    
-    # Check for excessive repetition of any phrase
-    words = response.split()
-    if len(words) > 50:  # Only check longer responses
-        # Look for phrases repeated more than 5 times
-        for i in range(len(words) - 2):
-            phrase = ' '.join(words[i:i+3])
-            if response.count(phrase) > 5:
-                print(f"WARNING: Excessive phrase repetition detected: '{phrase}'")
-                return False, _get_fallback_response(character_key)
-    
-    # Check for reasonable character-to-word ratio (detect gibberish)
-    if len(words) > 10:
-        avg_word_length = len(response.replace(' ', '')) / len(words)
-        if avg_word_length > 15:  # Unusually long average word length
-            print(f"WARNING: Suspicious word length pattern (avg: {avg_word_length})")
-            return False, _get_fallback_response(character_key)
-    
-    # Check for incomplete or cut-off responses that might indicate corruption
-    suspicious_endings = [
-        'AssistantClass', '<|python_tag|>', '<|reserved_special_token_', '"}"}"}"}',
-        'scalablytyped', 'надлеж', 'кто-то', '...",",",",",",",",",",",",",",",",",",",",'
-    ]
-    for ending in suspicious_endings:
-        if ending.lower() in response.lower():
-            print(f"WARNING: Suspicious token/pattern detected: '{ending[:20]}...'")
-            return False, _get_fallback_response(character_key)
-    
-    return True, response
-
-def _get_fallback_response(character_key: str = None) -> str:
-    """Returns an appropriate fallback response for a character."""
-    if character_key:
-        from config import CHARACTER_DATA
-        char_data = CHARACTER_DATA.get(character_key, {})
-        char_name = char_data.get("full_name", character_key)
-        
-        # Special fallback for narrator
-        if character_key == "narrator":
-            return "We step aside to talk in private, away from the others."
-        
-        # Generic fallback for other characters
-        return f"I need a moment to think about that properly."
-    return "I'm having trouble processing that request right now."
+def _parse_json_reply(response_text: str, expected_type: type = object):
+    """Validates and parses a JSON answer; raises ValueError if it is unusable (the router then tries the next model)."""
+    is_valid, validated_response = validate_ai_response(response_text)
+    if not is_valid:
+        raise ValueError(f"corrupted response: {response_text[:200]}...")
+    value = json.loads(_JSON_FENCE.sub("", validated_response))
+    if not isinstance(value, expected_type):
+        raise ValueError(f"expected {expected_type.__name__}, got {type(value).__name__}")
+    return value
 
 def clear_user_conversation_history(user_id: int):
     """Clears conversation history for a user, useful when corruption is detected."""
     history_key = str(user_id)
     if history_key in user_histories:
         print(f"WARNING: Clearing conversation history for user {user_id} due to corruption")
-        user_histories[history_key] = []
+        conversation_store.clear(user_id)
         log_message(user_id, "history_cleared", "Conversation history cleared due to AI corruption", None)
 
 
 
-async def ask_for_dialogue(user_id: int, user_message: str, system_prompt: str, character_key: str = None) -> str:
-    """The main function for all dialogue-based AI calls. Always expects and returns a simple string."""
+def _build_dialogue_messages(user_id: int, user_message: str, system_prompt: str, character_key: str = None) -> list:
+    """Builds the chat messages for a dialogue call: system prompt, shared history and the new message."""
     # Use shared conversation history so characters can see what others have said
     # but enhance the system prompt to clearly identify the speaking character
-    history_key = str(user_id)
-    
-    if history_key not in user_histories:
-        user_histories[history_key] = []
-    
-    # Enhance system prompt with character identity reminder
+    # Enhance system prompt with character identity reminder (prebuilt for prompt-table prompts)
     if character_key:
-        from config import CHARACTER_DATA  # Local import to avoid circular dependency
-        char_data = CHARACTER_DATA.get(character_key, {})
-        char_name = char_data.get("full_name", character_key)
-        enhanced_system_prompt = f"{system_prompt}\n\nIMPORTANT: You are {char_name}. You must respond ONLY as {char_name}, speaking in first person about YOUR OWN experiences and observations. Do not speak for other characters or describe their actions."
+        enhanced_system_prompt = prompt_table.with_identity(system_prompt, character_key)
     else:
         enhanced_system_prompt = system_prompt
     
     messages = [{"role": "system", "content": enhanced_system_prompt}]
-    messages.extend(user_histories[history_key][-10:])
+    # Only the turns this character witnessed, within the token budget, preceded by its notes on older ones
+    messages.extend(conversation_store.build_context(user_id, character_key))
     messages.append({"role": "user", "content": user_message})
+    return messages
+
+def _strip_character_prefix(reply: str, character_key: str = None) -> str:
+    """Removes a leading speaker name such as "tim: " or "**Tim Kane:** " from a reply."""
+    if not character_key:
+        return reply
+    # Remove patterns like "tim: ", "fiona: ", "Tim Kane: ", etc.
+    from config import CHARACTER_DATA  # Local import to avoid circular dependency
+    char_data = CHARACTER_DATA.get(character_key, {})
+    char_name = char_data.get("full_name", character_key)
     
-    try:
-        chat_completion = client.chat.completions.create(model="llama-3.3-70b-versatile", messages=messages, temperature=0.7)  # Reduced from 0.8 for more stability
-        assistant_reply = chat_completion.choices[0].message.content
+    # Try to remove various patterns of character name prefixes
+    patterns_to_remove = [
+        f"[{character_key}]: ",
+        f"[{character_key.lower()}]: ",
+        f"[{character_key.upper()}]: ",
+        f"[{char_name}]: ",
+        f"{character_key}: ",
+        f"{character_key.lower()}: ",
+        f"{character_key.upper()}: ",
+        f"{char_name}: ",
+        f"*{char_name}:* ",
+        f"**{char_name}:** ",
+    ]
+    
+    for pattern in patterns_to_remove:
+        if reply.startswith(pattern):
+            return reply[len(pattern):].strip()
+    return reply
+
+def _finalise_dialogue_reply(user_id: int, assistant_reply: str, character_key: str = None) -> str:
+    """Validates a complete dialogue reply (falling back on corruption) and cleans it up."""
+    # Validate the AI response for corruption and excessive length
+    is_valid, validated_response = validate_ai_response(assistant_reply, character_key)
+    if not is_valid:
+        print(f"WARNING: AI response validation failed for user {user_id}, using fallback")
+        log_message(user_id, "ai_validation_failed", f"Original response preview: {assistant_reply[:200]}...", None)
         
-        if not assistant_reply or assistant_reply.strip() == "":
-            print(f"WARNING: Empty response from AI for user {user_id}")
-            return "I'm not sure how to respond to that."
+        # Clear conversation history more aggressively when corruption is detected
+        # Lowered threshold from 5000 to 2000 chars, and also clear on certain patterns
+        should_clear_history = (
+            len(assistant_reply) > 2000 or  # Long corrupted responses
+            '"""""""' in assistant_reply or  # Quote repetition pattern
+            'testtesttest' in assistant_reply or  # Test repetition pattern
+            'optionoptionoption' in assistant_reply or  # Option repetition pattern
+            assistant_reply.count(',') > 50  # Excessive commas
+        )
         
-        # Validate the AI response for corruption and excessive length
-        is_valid, validated_response = validate_ai_response(assistant_reply, character_key)
-        if not is_valid:
-            print(f"WARNING: AI response validation failed for user {user_id}, using fallback")
-            log_message(user_id, "ai_validation_failed", f"Original response preview: {assistant_reply[:200]}...", None)
-            
-            # Clear conversation history more aggressively when corruption is detected
-            # Lowered threshold from 5000 to 2000 chars, and also clear on certain patterns
-            should_clear_history = (
-                len(assistant_reply) > 2000 or  # Long corrupted responses
-                '"""""""' in assistant_reply or  # Quote repetition pattern
-                'testtesttest' in assistant_reply or  # Test repetition pattern
-                'optionoptionoption' in assistant_reply or  # Option repetition pattern
-                assistant_reply.count(',') > 50  # Excessive commas
-            )
-            
-            if should_clear_history:
-                print(f"WARNING: Severe AI corruption detected for user {user_id}, clearing conversation history")
-                clear_user_conversation_history(user_id)
-            
-            assistant_reply = validated_response
-        else:
-            assistant_reply = validated_response
+        if should_clear_history:
+            print(f"WARNING: Severe AI corruption detected for user {user_id}, clearing conversation history")
+            clear_user_conversation_history(user_id)
+    
+    # Clean up any character name prefixes from the response
+    return _strip_character_prefix(validated_response, character_key)
+
+def record_dialogue_turn(user_id: int, user_message: str, assistant_reply: str, character_key: str = None):
+    """Stores one exchange in the shared conversation history."""
+    # Store the conversation with character identification
+    if character_key:
+        tagged_user_message = f"[Detective to {character_key}]: {user_message}"
+        tagged_assistant_reply = f"[{character_key}]: {assistant_reply}"
+    else:
+        tagged_user_message = user_message
+        tagged_assistant_reply = assistant_reply
         
-        # Clean up any character name prefixes from the response
-        if character_key:
-            # Remove patterns like "tim: ", "fiona: ", "Tim Kane: ", etc.
-            from config import CHARACTER_DATA  # Local import to avoid circular dependency
-            char_data = CHARACTER_DATA.get(character_key, {})
-            char_name = char_data.get("full_name", character_key)
-            
-            # Try to remove various patterns of character name prefixes
-            patterns_to_remove = [
-                f"[{character_key}]: ",
-                f"[{character_key.lower()}]: ",
-                f"[{character_key.upper()}]: ",
-                f"[{char_name}]: ",
-                f"{character_key}: ",
-                f"{character_key.lower()}: ",
-                f"{character_key.upper()}: ",
-                f"{char_name}: ",
-                f"*{char_name}:* ",
-                f"**{char_name}:** ",
-            ]
-            
-            for pattern in patterns_to_remove:
-                if assistant_reply.startswith(pattern):
-                    assistant_reply = assistant_reply[len(pattern):].strip()
-                    break
+    conversation_store.record_turn(user_id, tagged_user_message, tagged_assistant_reply, character_key)
+
+@tracer.traced("dialogue.generate")
+async def generate_dialogue(user_id: int, user_message: str, system_prompt: str, character_key: str = None) -> str:
+    """
+    Generates a validated dialogue reply without recording it in the history.
+
+    Returns "" if the model produced nothing; raises on API errors. Use record_dialogue_turn
+    to store the exchange once the reply is actually shown.
+    """
+    tracer.set_attributes(character=character_key)
+    messages = _build_dialogue_messages(user_id, user_message, system_prompt, character_key)
+    result = await model_router.chat("dialogue", messages, temperature=0.7)  # Reduced from 0.8 for more stability
+    if not result.text or result.text.strip() == "":
+        return ""
+    return _finalise_dialogue_reply(user_id, result.text, character_key)
+
+async def ask_for_dialogue(user_id: int, user_message: str, system_prompt: str, character_key: str = None) -> str:
+    """The main function for all dialogue-based AI calls. Always expects and returns a simple string."""
+    try:
+        assistant_reply = await generate_dialogue(user_id, user_message, system_prompt, character_key)
+        if not assistant_reply:
+            print(f"WARNING: Empty response from AI for user {user_id}")
+            return "I'm not sure how to respond to that."
         
-        # Store the conversation with character identification
-        if character_key:
-            tagged_user_message = f"[Detective to {character_key}]: {user_message}"
-            tagged_assistant_reply = f"[{character_key}]: {assistant_reply}"
-        else:
-            tagged_user_message = user_message
-            tagged_assistant_reply = assistant_reply
-            
-        user_histories[history_key].extend([
-            {"role": "user", "content": tagged_user_message}, 
-            {"role": "assistant", "content": tagged_assistant_reply}
-        ])
-        if len(user_histories[history_key]) > 20: 
-            user_histories[history_key] = user_histories[history_key][-20:]
+        record_dialogue_turn(user_id, user_message, assistant_reply, character_key)
         return assistant_reply
     except Exception as e:
         print(f"ERROR: Failed in ask_for_dialogue for user {user_id}: {e}")
         log_message(user_id, "dialogue_error", f"ask_for_dialogue failed: {e}", None)
         return "Sorry, a server error occurred."
 
+# A partial reply is shown only up to the last complete sentence
+_SENTENCE_END = re.compile(r'[.!?…]["\'»)*_]*(?=\s)')
+
+@tracer.traced("dialogue.stream")
+async def ask_for_dialogue_stream(user_id: int, user_message: str, system_prompt: str, character_key: str = None, on_partial=None) -> str:
+    """
+    Streaming variant of ask_for_dialogue.
+
+    `on_partial(text)` is awaited each time another complete sentence of the reply is
+    available, so the caller can show it while the rest is generated. Every delta is
+    checked incrementally (StreamValidator) and the stream is abandoned on corruption.
+    Returns the final (validated) reply like ask_for_dialogue; if the stream breaks off, the
+    reply is generated again without streaming (see _recover_dialogue_stream).
+    """
+    tracer.set_attributes(character=character_key)
+    messages = _build_dialogue_messages(user_id, user_message, system_prompt, character_key)
+    received = ""
+    shown_length = 0
+    stream_validator = StreamValidator()
+    try:
+        async with aclosing(model_router.stream_chat("dialogue", messages, temperature=0.7)) as stream:
+            async for delta in stream:
+                received += delta
+                if not stream_validator.feed(delta):
+                    # The final validation below logs the failure and picks the fallback
+                    break
+                boundaries = [match.end() for match in _SENTENCE_END.finditer(received, shown_length)]
+                if not boundaries or on_partial is None:
+                    continue
+                shown_length = boundaries[-1]
+                partial = _strip_character_prefix(received[:shown_length].strip(), character_key)
+                if partial:
+                    await on_partial(partial)
+    except Exception as e:
+        print(f"ERROR: Failed in ask_for_dialogue_stream for user {user_id}: {e}")
+        log_message(user_id, "dialogue_error", f"ask_for_dialogue_stream failed: {e}", None)
+        return await _recover_dialogue_stream(user_id, user_message, system_prompt, character_key,
+                                              received[:shown_length])
+    
+    if not received.strip():
+        print(f"WARNING: Empty response from AI for user {user_id}")
+        return "I'm not sure how to respond to that."
+    
+    assistant_reply = _finalise_dialogue_reply(user_id, received, character_key)
+    record_dialogue_turn(user_id, user_message, assistant_reply, character_key)
+    return assistant_reply
+
+async def _recover_dialogue_stream(user_id: int, user_message: str, system_prompt: str, character_key: str, shown: str) -> str:
+    """
+    Replaces a reply whose stream broke off: generated again without streaming, or, if that fails too,
+    the part already shown ended with an error notice. A cut-off reply is not recorded in the history.
+    """
+    try:
+        assistant_reply = await generate_dialogue(user_id, user_message, system_prompt, character_key)
+    except Exception as e:
+        print(f"ERROR: Non-streamed retry failed for user {user_id}: {e}")
+        log_message(user_id, "dialogue_error", f"ask_for_dialogue_stream retry failed: {e}", None)
+        assistant_reply = ""
+    if assistant_reply:
+        record_dialogue_turn(user_id, user_message, assistant_reply, character_key)
+        return assistant_reply
+    shown = _strip_character_prefix(shown.strip(), character_key)
+    if not shown:
+        return "Sorry, a server error occurred."
+    return f"{shown} … _(Sorry, a server error occurred.)_"
+
 async def ask_tutor_for_analysis(user_id: int, text_to_analyze: str) -> dict:
     """A special function that calls the Tutor for text analysis and expects a JSON response."""
     from config import CHARACTER_DATA # Local import to avoid circular dependency
@@ -224,46 +219,59 @@ async def ask_tutor_for_analysis(user_id: int, text_to_analyze: str) -> dict:
     analysis_request = f"Analyze this text: '{text_to_analyze}'"
     messages = [{"role": "system", "content": tutor_prompt}, {"role": "user", "content": analysis_request}]
     try:
-        chat_completion = client.chat.completions.create(model="llama-3.3-70b-versatile", messages=messages, temperature=0.5)
-        response_text = chat_completion.choices[0].message.content
-        
-        # Validate response for corruption
-        is_valid, validated_response = validate_ai_response(response_text)
-        if not is_valid:
-            print(f"WARNING: Tutor analysis response validation failed for user {user_id}")
-            log_message(user_id, "tutor_validation_failed", f"Corrupted tutor response: {response_text[:200]}...", None)
-            return {"improvement_needed": False, "feedback": ""}
-        
-        return json.loads(validated_response)
+        # Runs on every message in the background: small model first, larger one if its JSON is unusable
+        routed = await model_router.chat("tutor_analysis", messages, temperature=0.5,
+                                         parse=lambda text: _parse_json_reply(text, dict))
+        return routed.value
     except (json.JSONDecodeError, Exception) as e:
         log_message(user_id, "tutor_error", f"Could not parse tutor analysis JSON: {e}", None)
         return {"improvement_needed": False, "feedback": ""}
 
-async def ask_tutor_for_explanation(user_id: int, text_to_explain: str, original_message: str = "") -> dict:
-    """A special function that calls the Tutor for an explanation and expects a JSON response."""
+def _route_models(route: str) -> str:
+    """The model chain of a route, as part of a cache key (any of its models may have produced the answer)."""
+    return ",".join(model_router.models_for(route))
+
+@tracer.traced("tutor.explanation")
+async def ask_tutor_for_explanation(user_id: int, text_to_explain: str, original_message: str = "", language_level: str = "B1") -> dict:
+    """A special function that calls the Tutor for an explanation and expects a JSON response (cached by content)."""
     from config import CHARACTER_DATA
-    tutor_prompt = load_system_prompt(CHARACTER_DATA["tutor"]["prompt_file"])
+    # Static game texts are answered from the precomputed index
+    indexed_explanation = word_index.lookup_explanation(text_to_explain, original_message, language_level)
+    tracer.set_attributes(word_index="hit" if indexed_explanation else "miss")
+    if indexed_explanation:
+        return indexed_explanation
+
+    prompt_file = CHARACTER_DATA["tutor"]["prompt_file"]
+    # A single word is explained on its own, so its answer is shared by every message it appears in
+    context_message = original_message if len(text_to_explain.split()) > 1 else ""
+    cache_key = explanation_cache.make_key(
+        "tutor_explanation", get_prompt_version(prompt_file), _route_models("tutor_explanation"),
+        language_level, text_to_explain, context_message
+    )
+    explanation = await explanation_cache.get_or_compute(
+        cache_key,
+        lambda: _request_tutor_explanation(user_id, prompt_file, text_to_explain, context_message, language_level)
+    )
+    return explanation or {}
+
+async def _request_tutor_explanation(user_id: int, prompt_file: str, text_to_explain: str, original_message: str, language_level: str):
+    """Calls the Tutor for an explanation. Returns None if the answer is unusable (so it is not cached)."""
+    tutor_prompt = load_system_prompt(prompt_file)
     
     explanation_request = f"Please explain the meaning of: '{text_to_explain}'."
     if original_message:
         explanation_request += f" Original message: '{original_message}'"
+    explanation_request += f" The learner's English level is {language_level}."
         
     messages = [{"role": "system", "content": tutor_prompt}, {"role": "user", "content": explanation_request}]
     try:
-        chat_completion = client.chat.completions.create(model="llama-3.3-70b-versatile", messages=messages, temperature=0.5)
-        response_text = chat_completion.choices[0].message.content
-        
-        # Validate response for corruption
-        is_valid, validated_response = validate_ai_response(response_text)
-        if not is_valid:
-            print(f"WARNING: Tutor explanation response validation failed for user {user_id}")
-            log_message(user_id, "tutor_validation_failed", f"Corrupted tutor response: {response_text[:200]}...", None)
-            return {}
-        
-        return json.loads(validated_response)
+        routed = await model_router.chat("tutor_explanation", messages, temperature=0.5,
+                                         parse=lambda text: _parse_json_reply(text, dict))
+        explanation = routed.value
+        return explanation if explanation.get("definition") else None
     except (json.JSONDecodeError, Exception) as e:
         log_message(user_id, "tutor_error", f"Could not parse tutor explanation JSON: {e}", None)
-        return {}
+        return None
 
 async def ask_tutor_for_final_summary(user_id: int, progress_data: dict) -> dict:
     """A special function that calls the Tutor for final learning summary and expects a JSON response."""
@@ -294,8 +302,8 @@ async def ask_tutor_for_final_summary(user_id: int, progress_data: dict) -> dict
     
     messages = [{"role": "system", "content": tutor_prompt}, {"role": "user", "content": summary_request}]
     try:
-        chat_completion = client.chat.completions.create(model="llama-3.3-70b-versatile", messages=messages, temperature=0.7)
-        response_text = chat_completion.choices[0].message.content
+        result = await model_router.chat("tutor_summary", messages, temperature=0.7)
+        response_text = result.text
         
         # Validate response for corruption
         is_valid, validated_response = validate_ai_response(response_text)
@@ -310,25 +318,35 @@ async def ask_tutor_for_final_summary(user_id: int, progress_data: dict) -> dict
         return {"summary": "Great job completing the game! You showed curiosity and engagement with English. Keep practicing and you'll continue to improve!"}
 
 
-async def ask_word_spotter(text_to_analyze: str) -> list:
-    """Asks the Word Spotter AI to find difficult words in a text."""
-    prompt = load_system_prompt("prompts/prompt_lexicographer.md")
+@tracer.traced("word_spotter")
+async def ask_word_spotter(text_to_analyze: str, language_level: str = "B1") -> list:
+    """Asks the Word Spotter AI to find difficult words in a text (cached by content)."""
+    # Static game texts are answered from the precomputed index
+    indexed_words = word_index.lookup_words(text_to_analyze, language_level)
+    tracer.set_attributes(word_index="hit" if indexed_words is not None else "miss")
+    if indexed_words is not None:
+        return indexed_words
+
+    prompt_file = "prompts/prompt_lexicographer.md"
+    cache_key = explanation_cache.make_key("word_spotter", get_prompt_version(prompt_file), _route_models("word_spotter"),
+                                           language_level, text_to_analyze)
+    words = await explanation_cache.get_or_compute(
+        cache_key, lambda: _request_word_spotter(prompt_file, text_to_analyze, language_level)
+    )
+    return words or []
+
+async def _request_word_spotter(prompt_file: str, text_to_analyze: str, language_level: str):
+    """Calls the Word Spotter. Returns None on failure (so it is not cached)."""
+    prompt = load_system_prompt(prompt_file)
+    prompt += f"\n\nThe learner's English level is {language_level}."
     messages = [{"role": "system", "content": prompt}, {"role": "user", "content": text_to_analyze}]
     try:
-        chat_completion = client.chat.completions.create(model="llama-3.3-70b-versatile", messages=messages, temperature=0.2)
-        response_text = chat_completion.choices[0].message.content
-        
-        # Validate response for corruption
-        is_valid, validated_response = validate_ai_response(response_text)
-        if not is_valid:
-            print(f"WARNING: Word spotter response validation failed")
-            print(f"Corrupted word spotter response: {response_text[:200]}...")
-            return []
-        
-        words = json.loads(validated_response)
-        return [word.lower() for word in words]
+        # Small model first, larger one if its JSON is unusable
+        routed = await model_router.chat("word_spotter", messages, temperature=0.2,
+                                         parse=lambda text: _parse_json_reply(text, list))
+        return [str(word).lower() for word in routed.value]
     except Exception as e:
-        print(f"Error calling Word Spotter or parsing JSON: {e}"); return []
+        print(f"Error calling Word Spotter or parsing JSON: {e}"); return None
 
 async def ask_director(user_id: int, context_text: str, message: str) -> dict:
     """Asks the Director LLM for the next scene and returns it as a dictionary."""
@@ -342,7 +360,9 @@ async def ask_director(user_id: int, context_text: str, message: str) -> dict:
         topic_memory = state.get("topic_memory", {"topic": "None", "spoken": []})
         print(f"DEBUG: Topic memory for user {user_id}: {topic_memory}")
         
-        predefined_response = try_predefined_response(user_id, message, topic_memory)
+        with tracer.span("director.predefined") as span:
+            predefined_response = try_predefined_response(user_id, message, topic_memory)
+            span.set_attribute("cache", "hit" if predefined_response else "miss")
         print(f"DEBUG: Predefined response result for user {user_id}: {predefined_response is not None}")
         
         if predefined_response:
@@ -363,8 +383,8 @@ async def ask_director(user_id: int, context_text: str, message: str) -> dict:
     director_messages = [{"role": "system", "content": director_prompt}, {"role": "user", "content": full_context_for_director}]
     try:
         print(f"DEBUG: Calling director for user {user_id} with context: {context_text[:100]}...")
-        chat_completion = client.chat.completions.create(model="llama-3.3-70b-versatile", messages=director_messages, temperature=0.5)
-        response_text = chat_completion.choices[0].message.content
+        result = await model_router.chat("director", director_messages, temperature=0.5)
+        response_text = result.text
         print(f"DEBUG: Director raw response for user {user_id}: {response_text[:200]}...")
         log_message(user_id, "director", response_text, None)
         
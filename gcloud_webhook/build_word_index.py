@@ -0,0 +1,119 @@
+"""
+Builds game_texts/word_index.json (see word_index.py).
+
+Runs the lexicographer over every static text in game_texts/ once per language
+level, then asks the tutor to explain each spotted word in context and the
+whole text. Needs the same credentials as the bot (GROQ_API_KEY).
+
+Usage: python build_word_index.py
+Re-run it whenever a static text or the lexicographer/tutor prompt changes.
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+
+from config import CHARACTER_DATA
+from ai_services import _request_word_spotter, _request_tutor_explanation
+from explanation_cache import normalise_text
+from llm_gateway import llm_gateway
+from utils import load_system_prompt, get_prompt_version
+from word_index import WORD_INDEX_PATH, LEXICOGRAPHER_PROMPT_FILE, LANGUAGE_LEVELS, text_key
+
+logger = logging.getLogger(__name__)
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Static texts shown to players; each file is one text
+STATIC_TEXT_PATTERNS = [
+    "game_texts/Clue*.txt",
+    "game_texts/intro-*.txt",
+    "game_texts/case_intro_*.txt",
+    "game_texts/atmospheric_start.txt",
+    "game_texts/reveal_*.txt",
+    "game_texts/defense_*.txt",
+]
+# Files where every line is a separate narrator phrase
+STATIC_PHRASE_FILES = ["game_texts/common_space.txt"]
+
+# Build-time user id for log entries of the tutor calls
+_BUILD_USER_ID = 0
+
+
+def collect_static_texts() -> list:
+    """Returns (source, text) pairs for every static text."""
+    texts = []
+    for pattern in STATIC_TEXT_PATTERNS:
+        for absolute_path in sorted(glob.glob(os.path.join(_BASE_DIR, pattern))):
+            filepath = os.path.relpath(absolute_path, _BASE_DIR)
+            texts.append((filepath, load_system_prompt(filepath)))
+    for filepath in STATIC_PHRASE_FILES:
+        for line_number, phrase in enumerate(load_system_prompt(filepath).split("\n"), start=1):
+            if phrase.strip():
+                texts.append((f"{filepath}:{line_number}", phrase.strip()))
+    return texts
+
+
+async def build_entry(source: str, text: str, language_level: str, tutor_prompt_file: str):
+    """Word list and explanations of one text at one level. None if the word spotter failed."""
+    words = await _request_word_spotter(LEXICOGRAPHER_PROMPT_FILE, text, language_level)
+    if words is None:
+        logger.error(f"Word spotter failed for {source} ({language_level}); entry skipped")
+        return None
+
+    explanations = await asyncio.gather(*[
+        _request_tutor_explanation(_BUILD_USER_ID, tutor_prompt_file, word, text, language_level)
+        for word in words
+    ])
+    text_explanation = await _request_tutor_explanation(_BUILD_USER_ID, tutor_prompt_file, text, text, language_level)
+    for word, explanation in zip(words, explanations):
+        if explanation is None:
+            logger.warning(f"No explanation for '{word}' in {source} ({language_level}); it will be explained at runtime")
+
+    return {
+        "source": source,
+        "level": language_level,
+        "words": words,
+        "explanations": {
+            normalise_text(word): explanation
+            for word, explanation in zip(words, explanations) if explanation is not None
+        },
+        "text_explanation": text_explanation,
+    }
+
+
+async def build_index() -> dict:
+    """Builds the complete index for all static texts and levels."""
+    tutor_prompt_file = CHARACTER_DATA["tutor"]["prompt_file"]
+    texts = collect_static_texts()
+    jobs = [(source, text, level) for source, text in texts for level in LANGUAGE_LEVELS]
+    logger.info(f"Indexing {len(texts)} static texts at {len(LANGUAGE_LEVELS)} levels")
+
+    results = await asyncio.gather(*[build_entry(source, text, level, tutor_prompt_file) for source, text, level in jobs])
+    entries = {
+        text_key(text, level): entry
+        for (source, text, level), entry in zip(jobs, results) if entry is not None
+    }
+    return {
+        "prompt_versions": {
+            "lexicographer": get_prompt_version(LEXICOGRAPHER_PROMPT_FILE),
+            "tutor": get_prompt_version(tutor_prompt_file),
+        },
+        "entries": dict(sorted(entries.items())),
+    }
+
+
+async def main():
+    try:
+        index = await build_index()
+    finally:
+        await llm_gateway.aclose()
+    with open(os.path.join(_BASE_DIR, WORD_INDEX_PATH), "w", encoding="utf-8") as index_file:
+        json.dump(index, index_file, ensure_ascii=False, indent=1)
+    print(f"Wrote {len(index['entries'])} entries to {WORD_INDEX_PATH}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
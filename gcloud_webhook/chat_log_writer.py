@@ -0,0 +1,226 @@
+"""
+Append-only chat-history logging for Google Cloud Storage.
+
+`utils.log_message` only appends a line to an in-memory buffer. A background
+task flushes the buffers every few seconds, writing each player's new lines as
+a separate chunk object next to their transcript:
+
+    user_logs/chat_history_42.txt.chunks/<time>-<instance>-<seq>.txt
+
+Nothing is ever downloaded or rewritten on the request path, and concurrent
+instances cannot overwrite each other's lines. The compaction job
+(`python chat_log_writer.py --compact`) later merges the chunks into the
+single `chat_history_42.txt` transcript with GCS compose.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from config import GCS_BUCKET_NAME, CHAT_LOG_FLUSH_INTERVAL, CHAT_LOG_MAX_BUFFERED, CHAT_LOG_MAX_RETAINED
+from metrics import gcs_operation
+
+logger = logging.getLogger(__name__)
+
+# Suffix of the "directory" holding the pending chunks of a transcript
+CHUNK_DIR_SUFFIX = ".chunks/"
+# GCS compose accepts at most 32 source objects per call
+MAX_COMPOSE_SOURCES = 32
+LOG_PREFIXES = ("user_logs/", "participant_logs/")
+LOG_CONTENT_TYPE = "text/plain; charset=utf-8"
+
+
+class ChatLogWriter:
+    """Buffers chat-history lines in memory and flushes them to GCS as chunk objects."""
+
+    def __init__(self, flush_interval: float = CHAT_LOG_FLUSH_INTERVAL, max_buffered: int = CHAT_LOG_MAX_BUFFERED,
+                 max_retained: int = CHAT_LOG_MAX_RETAINED):
+        self.storage_client = None
+        self.bucket = None
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.max_retained = max_retained
+        self._buffers: Dict[str, List[str]] = {}
+        self._buffered_count = 0
+        self._instance_id = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        if not GCS_BUCKET_NAME:
+            logger.warning("GCS_BUCKET_NAME is not set. Cloud logging is disabled.")
+
+    def _get_bucket(self):
+        """Lazy initialization of storage client and bucket."""
+        if self.storage_client is None and GCS_BUCKET_NAME:
+            try:
+                # Deferred import: the SDK is only loaded once storage is used (see startup.py)
+                from google.cloud import storage
+                self.storage_client = storage.Client()
+                self.bucket = self.storage_client.bucket(GCS_BUCKET_NAME)
+            except Exception as e:
+                logger.error(f"Failed to initialize GCS bucket '{GCS_BUCKET_NAME}': {e}")
+                self.bucket = None
+        return self.bucket
+
+    def append(self, blob_name: str, line: str):
+        """Queues one log line for the given transcript. Never touches the network."""
+        self._buffers.setdefault(blob_name, []).append(line)
+        self._buffered_count += 1
+        if self._buffered_count >= self.max_buffered and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        """Starts the background flush loop. Must be called from the running event loop."""
+        if self._flush_task is None or self._flush_task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._run())
+            logger.info(f"Chat log writer started (flush every {self.flush_interval}s)")
+
+    async def stop(self):
+        """Stops the flush loop and writes out everything still buffered."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Chat log flush failed: {e}")
+
+    async def flush(self):
+        """Writes every buffered transcript as one new chunk object."""
+        if not self._buffers:
+            return
+        pending, self._buffers = self._buffers, {}
+        self._buffered_count = 0
+
+        bucket = self._get_bucket()
+        if not bucket:
+            return
+
+        failed = []
+        for blob_name, lines in pending.items():
+            chunk_name = self._next_chunk_name(blob_name)
+            try:
+                await asyncio.to_thread(self._upload_chunk, bucket, chunk_name, "".join(lines))
+            except Exception as e:
+                logger.error(f"Failed to write log chunk {chunk_name}: {e}")
+                # Keep the lines so the next flush retries them, ahead of anything newer
+                self._buffers[blob_name] = lines + self._buffers.get(blob_name, [])
+                self._buffered_count += len(lines)
+                failed.append(blob_name)
+
+        if self._buffered_count > self.max_retained:
+            self._drop_oldest(self._buffered_count - self.max_retained, failed)
+
+    def _drop_oldest(self, count: int, failed: List[str]):
+        """Drops `count` lines while storage keeps failing: the retried ones first, each transcript from its start."""
+        dropped = 0
+        for blob_name in failed + [name for name in self._buffers if name not in failed]:
+            lines = self._buffers.get(blob_name)
+            if not lines:
+                continue
+            take = min(count - dropped, len(lines))
+            del lines[:take]
+            if not lines:
+                del self._buffers[blob_name]
+            dropped += take
+            if dropped >= count:
+                break
+        self._buffered_count -= dropped
+        logger.warning(f"Chat log buffer over {self.max_retained} lines while uploads fail: dropped the {dropped} oldest")
+
+    def _next_chunk_name(self, blob_name: str) -> str:
+        self._sequence += 1
+        return f"{blob_name}{CHUNK_DIR_SUFFIX}{time.time_ns():020d}-{self._instance_id}-{self._sequence:06d}.txt"
+
+    @staticmethod
+    def _upload_chunk(bucket, chunk_name: str, content: str):
+        with gcs_operation("chat_log", "upload_chunk"):
+            bucket.blob(chunk_name).upload_from_string(content, content_type=LOG_CONTENT_TYPE)
+
+    def compact(self, blob_name: str) -> int:
+        """Merges all pending chunks of a transcript into it. Returns the number of chunks merged."""
+        bucket = self._get_bucket()
+        if not bucket:
+            return 0
+
+        chunks = sorted(
+            bucket.list_blobs(prefix=f"{blob_name}{CHUNK_DIR_SUFFIX}"),
+            key=lambda blob: blob.name,
+        )
+        if not chunks:
+            return 0
+
+        transcript = bucket.blob(blob_name)
+        transcript.content_type = LOG_CONTENT_TYPE
+        has_transcript = transcript.exists()
+
+        merged = 0
+        while merged < len(chunks):
+            room = MAX_COMPOSE_SOURCES - 1 if has_transcript else MAX_COMPOSE_SOURCES
+            batch = chunks[merged:merged + room]
+            sources = ([transcript] if has_transcript else []) + batch
+            with gcs_operation("chat_log", "compose"):
+                transcript.compose(sources)
+            has_transcript = True
+            for chunk in batch:
+                try:
+                    chunk.delete()
+                except Exception as e:
+                    logger.warning(f"Could not delete merged log chunk {chunk.name}: {e}")
+            merged += len(batch)
+
+        logger.info(f"Compacted {merged} log chunks into {blob_name}")
+        return merged
+
+    def compact_all(self) -> int:
+        """Compaction job: merges the pending chunks of every transcript in the bucket."""
+        bucket = self._get_bucket()
+        if not bucket:
+            logger.warning("Cannot compact chat logs: No storage bucket configured")
+            return 0
+
+        transcripts = set()
+        for prefix in LOG_PREFIXES:
+            for blob in bucket.list_blobs(prefix=prefix):
+                if CHUNK_DIR_SUFFIX in blob.name:
+                    transcripts.add(blob.name.split(CHUNK_DIR_SUFFIX, 1)[0])
+
+        total = 0
+        for blob_name in sorted(transcripts):
+            try:
+                total += self.compact(blob_name)
+            except Exception as e:
+                logger.error(f"Failed to compact chat log {blob_name}: {e}")
+        return total
+
+
+# Global instance
+chat_log_writer = ChatLogWriter()
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if "--compact" not in sys.argv:
+        print("Usage: python chat_log_writer.py --compact")
+        sys.exit(1)
+    merged_chunks = chat_log_writer.compact_all()
+    print(f"Merged {merged_chunks} chunks")
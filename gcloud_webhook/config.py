@@ -1,30 +1,37 @@
 import os
-import sys
-from google.cloud import secretmanager
+from startup import startup_timer, SecretLoader
+from session_store import SessionStore, set_session_backend
+from session_backend import create_backend
+
+startup_timer.checkpoint("imports before config")
+
+# --- Secrets ---
+# Set to false to read secrets from environment variables only (local runs, load tests); skips the Secret Manager lookup
+SECRET_MANAGER_ENABLED = os.getenv("SECRET_MANAGER_ENABLED", "true").lower() == "true"
+# Seconds per Secret Manager request
+SECRET_FETCH_TIMEOUT = float(os.getenv("SECRET_FETCH_TIMEOUT", "10"))
+
+# Global instance: one Secret Manager client for all secrets, values cached for the process lifetime
+secret_loader = SecretLoader(os.getenv('GOOGLE_CLOUD_PROJECT', 'the-chicago-formula'), SECRET_MANAGER_ENABLED, SECRET_FETCH_TIMEOUT)
 
 def get_secret(secret_name: str, default_env: str = None) -> str:
     """Safely retrieves secrets from Google Secret Manager or environment variables."""
-    try:
-        # Try Google Secret Manager first
-        client = secretmanager.SecretManagerServiceClient()
-        project_id = os.getenv('GOOGLE_CLOUD_PROJECT', 'the-chicago-formula')
-        name = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
-        response = client.access_secret_version(request={"name": name})
-        secret_value = response.payload.data.decode("UTF-8").strip()
-        return secret_value
-    except Exception as e:
-        # Fallback to environment variables for local development
-        if default_env:
-            value = os.getenv(default_env)
-            if value:
-                print(f"WARNING: Using environment variable for {secret_name}. Secret Manager failed: {e}", file=sys.stderr)
-                return value.strip() if value else None
-        return None
+    return secret_loader.get(secret_name, default_env)
 
 # --- API Configuration ---
-TELEGRAM_TOKEN = get_secret("telegram-bot-token", "TELEGRAM_TOKEN")
-GROQ_API_KEY = get_secret("groq-api-key", "GROQ_API_KEY")
-GCS_BUCKET_NAME = get_secret("gcs-bucket-name", "GCS_BUCKET_NAME")
+# Fetched concurrently at import time
+_secrets = secret_loader.load_all({
+    "telegram-bot-token": "TELEGRAM_TOKEN",
+    "groq-api-key": "GROQ_API_KEY",
+    "gcs-bucket-name": "GCS_BUCKET_NAME",
+})
+TELEGRAM_TOKEN = _secrets["telegram-bot-token"]
+GROQ_API_KEY = _secrets["groq-api-key"]
+GCS_BUCKET_NAME = _secrets["gcs-bucket-name"]
+startup_timer.checkpoint("secrets")
+
+# Alternative Bot API server, e.g. a local stand-in for load tests (default: api.telegram.org)
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL")
 
 # Remove debug prints for security
 if not TELEGRAM_TOKEN:
@@ -36,6 +43,133 @@ if not GROQ_API_KEY:
 if not GCS_BUCKET_NAME:
     raise ValueError("GCS_BUCKET_NAME not found in Secret Manager or environment variables")
 
+# --- LLM Gateway ---
+# Default model for all chat completions
+LLM_DEFAULT_MODEL = "llama-3.3-70b-versatile"
+# Maximum number of completions one instance runs at the same time
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Per-call timeout in seconds (time spent waiting for a free slot is not counted)
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+
+# --- Rate Limiting ---
+# Share of a model's per-minute token budget each priority class must leave to the classes above it
+RATE_LIMIT_RESERVES = {"interactive": 0.0, "director": 0.05, "explanation": 0.15, "background": 0.35}
+# Longest a call of each class waits for quota before it is shed (background work gives way first)
+RATE_LIMIT_MAX_WAIT = {"interactive": LLM_TIMEOUT_SECONDS, "director": 15.0, "explanation": 8.0, "background": 3.0}
+# Tokens reserved for the answer of a call until the provider reports the real usage
+RATE_LIMIT_COMPLETION_ESTIMATE = int(os.getenv("RATE_LIMIT_COMPLETION_ESTIMATE", "300"))
+
+# --- Streaming & Prefetching Replies ---
+# Show private and reply-to character answers sentence by sentence while they are generated
+STREAMING_REPLIES_ENABLED = os.getenv("STREAMING_REPLIES_ENABLED", "true").lower() == "true"
+# Minimum seconds between two edits of a message that is being streamed (Telegram rate-limits edits)
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+# Generate all replies of a predefined (keyword-matched) scene concurrently instead of one after another
+SCENE_PREFETCH_ENABLED = os.getenv("SCENE_PREFETCH_ENABLED", "true").lower() == "true"
+
+# --- Chat Log Writer ---
+# Seconds between background flushes of buffered chat-history lines
+CHAT_LOG_FLUSH_INTERVAL = float(os.getenv("CHAT_LOG_FLUSH_INTERVAL", "5"))
+# Flush early once this many lines are buffered
+CHAT_LOG_MAX_BUFFERED = int(os.getenv("CHAT_LOG_MAX_BUFFERED", "500"))
+# Lines kept for retry while uploads fail; beyond this the oldest are dropped
+CHAT_LOG_MAX_RETAINED = int(os.getenv("CHAT_LOG_MAX_RETAINED", "20000"))
+
+# --- Game State Persistence ---
+# Saves requested within this many seconds are coalesced into one upload
+GAME_STATE_SAVE_DELAY = float(os.getenv("GAME_STATE_SAVE_DELAY", "2"))
+
+# --- Session Store Limits ---
+# Idle sessions are evicted after this many seconds (evicted game states are reloaded from storage)
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(6 * 60 * 60)))
+# Maximum number of players kept in memory per store
+SESSION_MAX_USERS = int(os.getenv("SESSION_MAX_USERS", "2000"))
+# Maximum number of cached messages available to the "Explain" buttons
+MESSAGE_CACHE_MAX_ENTRIES = int(os.getenv("MESSAGE_CACHE_MAX_ENTRIES", "50000"))
+MESSAGE_CACHE_TTL_SECONDS = float(os.getenv("MESSAGE_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+# Approximate memory budget per store in bytes
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# --- Shared Session Backend ---
+# Where the session stores are shared between instances (see session_backend.py):
+# "local" (process memory only), "memory" (in-process backend, for tests) or "redis"
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "local").lower()
+# Redis-compatible server for SESSION_BACKEND=redis, e.g. a Memorystore instance on the VPC connector
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SESSION_KEY_PREFIX = os.getenv("SESSION_KEY_PREFIX", "glossa:")
+
+# --- Explanation Cache ---
+# Tutor explanations and word-spotter results kept in memory (all entries are also stored in GCS)
+EXPLANATION_CACHE_MAX_ENTRIES = int(os.getenv("EXPLANATION_CACHE_MAX_ENTRIES", "5000"))
+
+# --- Update Queue ---
+# Maximum number of Telegram updates processed concurrently (one player's updates always run one at a time)
+UPDATE_QUEUE_CONCURRENCY = int(os.getenv("UPDATE_QUEUE_CONCURRENCY", "32"))
+# Updates waiting or in progress beyond this are refused with 503 so Telegram retries later
+UPDATE_QUEUE_MAX_PENDING = int(os.getenv("UPDATE_QUEUE_MAX_PENDING", "1000"))
+# Seconds to wait for queued updates to finish on shutdown
+UPDATE_QUEUE_DRAIN_TIMEOUT = float(os.getenv("UPDATE_QUEUE_DRAIN_TIMEOUT", "20"))
+
+# --- Update Deduplication ---
+# Number of recent update_ids remembered to drop Telegram redeliveries
+UPDATE_DEDUP_WINDOW = int(os.getenv("UPDATE_DEDUP_WINDOW", "10000"))
+# Also claim update_ids in GCS so redeliveries to another instance are dropped (one extra write per update)
+UPDATE_DEDUP_SHARED = os.getenv("UPDATE_DEDUP_SHARED", "false").lower() == "true"
+
+# --- Tracing ---
+# Write per-stage latency spans of every update to TRACE_FILE (see tracing.py, summarise with trace_report.py)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_FILE = os.getenv("TRACE_FILE", "/tmp/glossa_traces.jsonl")
+# Fraction of updates traced
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+# Finished spans are appended to the file in batches of this many, or at least this often (seconds)
+TRACE_FLUSH_SPANS = int(os.getenv("TRACE_FLUSH_SPANS", "200"))
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "5"))
+
+# --- Metrics ---
+# If set, /metrics requires "Authorization: Bearer <token>" (the endpoint is public otherwise)
+METRICS_AUTH_TOKEN = os.getenv("METRICS_AUTH_TOKEN", "")
+
+# --- Conversation History ---
+# Estimated tokens of conversation history (a character's view + notes) sent with each dialogue call
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1200"))
+# Estimated tokens of turns kept per player before the oldest are condensed into notes
+HISTORY_STORE_TOKEN_LIMIT = int(os.getenv("HISTORY_STORE_TOKEN_LIMIT", "6000"))
+# Small model that condenses turns dropped from the store into notes (see Model Routing)
+HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", "llama-3.1-8b-instant")
+
+# --- Model Routing ---
+# Small, fast model for simple JSON classification tasks
+LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "llama-3.1-8b-instant")
+# Models tried in order for each task; the next one is used when a call fails or its answer does not parse
+MODEL_ROUTES = {
+    "dialogue": [LLM_DEFAULT_MODEL],
+    "director": [LLM_DEFAULT_MODEL],
+    "tutor_analysis": [LLM_SMALL_MODEL, LLM_DEFAULT_MODEL],
+    "tutor_explanation": [LLM_DEFAULT_MODEL],
+    "tutor_summary": [LLM_DEFAULT_MODEL],
+    "word_spotter": [LLM_SMALL_MODEL, LLM_DEFAULT_MODEL],
+    "history_summary": [HISTORY_SUMMARY_MODEL, LLM_DEFAULT_MODEL],
+}
+# Rate-limit priority class of each route (interactive > director > explanation > background)
+ROUTE_PRIORITIES = {
+    "dialogue": "interactive",
+    "director": "director",
+    "tutor_explanation": "explanation",
+    "tutor_summary": "explanation",
+    "word_spotter": "explanation",
+    "tutor_analysis": "background",
+    "history_summary": "background",
+}
+# USD per million (prompt, completion) tokens, for the per-route cost counters
+MODEL_PRICES = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+}
+
+# --- Prompt Table ---
+# Seconds between checks for edited prompt files (changed prompts are rebuilt without a restart)
+PROMPT_RELOAD_INTERVAL = float(os.getenv("PROMPT_RELOAD_INTERVAL", "5"))
 
 # --- Game Constants ---
 # Total number of clues to be examined to unlock the final accusation
@@ -56,6 +190,10 @@ CHARACTER_DATA = {
 }
 
 # --- Global State Variables ---
-GAME_STATE = {}
-user_histories = {}
-message_cache = {}
+# Bounded, evicting stores; GAME_STATE rehydrates from GameStateManager on a miss (see game_state_manager.py)
+GAME_STATE = SessionStore("game_state", SESSION_MAX_USERS, SESSION_TTL_SECONDS, SESSION_MAX_BYTES, user_key=int)
+user_histories = SessionStore("user_histories", SESSION_MAX_USERS, SESSION_TTL_SECONDS, SESSION_MAX_BYTES, user_key=str)
+message_cache = SessionStore("message_cache", MESSAGE_CACHE_MAX_ENTRIES, MESSAGE_CACHE_TTL_SECONDS, SESSION_MAX_BYTES)
+# With a shared backend all three follow the player across instances
+session_backend = create_backend(SESSION_BACKEND, REDIS_URL, SESSION_KEY_PREFIX)
+set_session_backend(session_backend)
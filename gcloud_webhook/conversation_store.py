@@ -0,0 +1,235 @@
+"""
+Structured, token-budgeted conversation history for dialogue calls.
+
+Every exchange of a game (the detective's message and a character's answer) is
+stored as a structured turn: who spoke, who was addressed, the topic, whether it
+happened in the common room or in private, and which characters witnessed it.
+A dialogue call for a character sends only that character's view - the turns
+it witnessed or was addressed in - newest first up to HISTORY_TOKEN_BUDGET
+estimated tokens. Prompts stay small and a character cannot "know" what was
+said in someone else's private talk. The narrator sees everything.
+
+When a player's store grows beyond HISTORY_STORE_TOKEN_LIMIT, the oldest turns
+are condensed in the background by a cheap model: public turns into shared
+notes, private turns into notes of the character who was there.
+
+A player's record in `user_histories` is
+    {"turns": [turn, ...], "summaries": {"public": str, <character>: str}, "evicted": [turn, ...],
+     "generation": str}
+`generation` identifies one game's record across instances (it changes when the
+history is cleared), so a background summary still lands on the record after
+the session backend replaced the local copy; finished summaries are flushed to
+the backend straight away. Records in older formats (plain message lists, or
+{"entries", "summary"}) are converted on first use.
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Dict, List, Optional
+
+from config import user_histories, SUSPECT_KEYS, HISTORY_TOKEN_BUDGET, HISTORY_STORE_TOKEN_LIMIT
+from model_router import model_router
+
+logger = logging.getLogger(__name__)
+
+# Sees every turn regardless of where it happened
+OMNISCIENT_CHARACTERS = ("narrator",)
+
+SUMMARY_INSTRUCTIONS = (
+    "You keep notes for a murder-mystery game. Merge the existing notes and the new conversation "
+    "turns into updated notes of at most 120 words. Keep concrete facts: who said what, times, "
+    "places, alibis, objects, accusations and contradictions. Write plain sentences, no lists."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a message (about four characters per token plus message overhead)."""
+    return len(text) // 4 + 4
+
+
+def _make_turn(user_content: str, assistant_content: str, speaker: Optional[str] = None,
+               topic: str = "None", visibility: str = "public", witnesses: Optional[List[str]] = None) -> dict:
+    return {
+        "speaker": speaker,
+        "addressee": speaker,
+        "topic": topic,
+        "visibility": visibility,
+        "witnesses": list(witnesses if witnesses is not None else SUSPECT_KEYS),
+        "user": user_content,
+        "assistant": assistant_content,
+        "tokens": estimate_tokens(user_content) + estimate_tokens(assistant_content),
+    }
+
+
+def _new_record(turns: List[dict], summary: str = "") -> dict:
+    return {"turns": turns, "summaries": {"public": summary}, "evicted": [], "generation": uuid.uuid4().hex}
+
+
+def _convert_legacy_messages(messages: List[dict]) -> List[dict]:
+    """Pairs up an old flat user/assistant message list into public turns."""
+    turns = []
+    for index in range(0, len(messages) - 1, 2):
+        turns.append(_make_turn(messages[index]["content"], messages[index + 1]["content"]))
+    return turns
+
+
+class ConversationStore:
+    """Per-player store of structured turns with per-character, token-budgeted views."""
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, store_token_limit: int = HISTORY_STORE_TOKEN_LIMIT):
+        self.token_budget = token_budget
+        self.store_token_limit = store_token_limit
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
+
+    def _get_record(self, user_id: int) -> dict:
+        history_key = str(user_id)
+        record = user_histories.get(history_key)
+        if record is None or isinstance(record, list) or "turns" not in record:
+            if isinstance(record, list):
+                turns, summary = _convert_legacy_messages(record), ""
+            elif record is not None:
+                turns, summary = _convert_legacy_messages(record.get("entries", [])), record.get("summary", "")
+            else:
+                turns, summary = [], ""
+            record = _new_record(turns, summary)
+            user_histories[history_key] = record
+        elif "generation" not in record:
+            record["generation"] = uuid.uuid4().hex
+        return record
+
+    @staticmethod
+    def _can_see(turn: dict, character_key: Optional[str]) -> bool:
+        if character_key is None or character_key in OMNISCIENT_CHARACTERS:
+            return True
+        return character_key in turn["witnesses"] or character_key == turn["addressee"]
+
+    def build_context(self, user_id: int, character_key: Optional[str] = None) -> List[dict]:
+        """Chat messages for the history part of a request: the character's notes and the turns it saw."""
+        record = self._get_record(user_id)
+
+        notes = [record["summaries"].get("public", "")]
+        if character_key and character_key not in OMNISCIENT_CHARACTERS:
+            notes.append(record["summaries"].get(character_key, ""))
+        notes = "\n".join(note for note in notes if note)
+
+        budget = self.token_budget - (estimate_tokens(notes) if notes else 0)
+        visible_turns = []
+        # A plain scan is enough: the stored turns are capped by store_token_limit (a few dozen at most)
+        # and the scan stops once the budget is full
+        for turn in reversed(record["turns"]):
+            if not self._can_see(turn, character_key):
+                continue
+            # Always keep the newest visible turn, then fill the budget
+            if visible_turns and turn["tokens"] > budget:
+                break
+            budget -= turn["tokens"]
+            visible_turns.append(turn)
+
+        messages = []
+        if notes:
+            messages.append({"role": "system", "content": f"Notes on the earlier conversation in this game:\n{notes}"})
+        for turn in reversed(visible_turns):
+            messages.append({"role": "user", "content": turn["user"]})
+            messages.append({"role": "assistant", "content": turn["assistant"]})
+        return messages
+
+    def record_turn(self, user_id: int, user_content: str, assistant_content: str, speaker: Optional[str] = None):
+        """Stores one exchange with where it happened and who witnessed it (taken from the game state)."""
+        from config import GAME_STATE  # Local import to avoid circular dependency
+        state = GAME_STATE.get(user_id, {})
+        topic = state.get("topic_memory", {}).get("topic", "None")
+
+        if state.get("mode") == "private" and speaker not in OMNISCIENT_CHARACTERS:
+            # Only the character taken aside (and whoever answered) hears a private talk
+            present = state.get("current_character") or speaker
+            witnesses = sorted({present, speaker} - {None})
+            turn = _make_turn(user_content, assistant_content, speaker, topic, "private", witnesses)
+        else:
+            turn = _make_turn(user_content, assistant_content, speaker, topic, "public", SUSPECT_KEYS)
+
+        record = self._get_record(user_id)
+        record["turns"].append(turn)
+
+        total = sum(stored_turn["tokens"] for stored_turn in record["turns"])
+        # Evict the oldest turns, but always keep the newest one
+        while total > self.store_token_limit and len(record["turns"]) > 1:
+            evicted = record["turns"].pop(0)
+            total -= evicted["tokens"]
+            record["evicted"].append(evicted)
+
+        if record["evicted"]:
+            self._schedule_summary(user_id)
+
+    def clear(self, user_id: int):
+        """Forgets the turns and notes of a player."""
+        history_key = str(user_id)
+        task = self._summary_tasks.pop(history_key, None)
+        if task is not None:
+            task.cancel()
+        user_histories[history_key] = _new_record([])
+
+    def _schedule_summary(self, user_id: int):
+        history_key = str(user_id)
+        task = self._summary_tasks.get(history_key)
+        if task is not None and not task.done():
+            # The running task picks up the new evictions before it finishes
+            return
+        try:
+            self._summary_tasks[history_key] = asyncio.create_task(self._summarise(user_id))
+        except RuntimeError:
+            # No running event loop; the turns are summarised with the next eviction
+            pass
+
+    async def _summarise(self, user_id: int):
+        history_key = str(user_id)
+        try:
+            while True:
+                record = self._get_record(user_id)
+                generation = record["generation"]
+                evicted, record["evicted"] = record["evicted"], []
+                if not evicted:
+                    # Publish the notes now; the player's next update may be served by another instance
+                    await user_histories.flush([history_key])
+                    return
+
+                # Public turns go into the shared notes, private ones into the notes of the character present
+                groups: Dict[str, List[dict]] = {}
+                for turn in evicted:
+                    audience = "public" if turn["visibility"] == "public" else (turn["addressee"] or "public")
+                    groups.setdefault(audience, []).append(turn)
+
+                for audience, turns in groups.items():
+                    summary = await self._condense(user_id, record["summaries"].get(audience, ""), turns)
+                    # The record may have been cleared, evicted from memory or refreshed from the backend meanwhile
+                    record = user_histories.get(history_key)
+                    if record is None or record.get("generation") != generation:
+                        return
+                    if summary:
+                        record["summaries"][audience] = summary
+        finally:
+            if self._summary_tasks.get(history_key) is asyncio.current_task():
+                del self._summary_tasks[history_key]
+
+    async def _condense(self, user_id: int, notes: str, turns: List[dict]) -> str:
+        """Merges turns into existing notes with the summary model. Returns "" on failure."""
+        # The topic detected when a turn was recorded lets the notes keep facts together
+        transcript = "\n".join(
+            (f"(Topic: {turn['topic']})\n" if turn.get("topic", "None") != "None" else "")
+            + f"{turn['user']}\n{turn['assistant']}"
+            for turn in turns
+        )
+        messages = [
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": f"Existing notes:\n{notes or '(none)'}\n\nNew conversation turns:\n{transcript}"},
+        ]
+        try:
+            result = await model_router.chat("history_summary", messages, temperature=0.2)
+            return result.text.strip()
+        except Exception as e:
+            logger.warning(f"User {user_id}: History summarisation failed, {len(turns)} old turns dropped: {e}")
+            return ""
+
+
+# Global instance
+conversation_store = ConversationStore()
@@ -0,0 +1,146 @@
+"""
+Shared cache for tutor explanations and word-spotter results.
+
+Entries are content-addressed: the key is a hash of the normalised input text,
+the learner's language level, the version (content hash) of the prompt and the
+models of the route that produced the answer, so editing a prompt or changing
+MODEL_ROUTES automatically invalidates old answers.
+
+Lookups go through two tiers - an in-process LRU and JSON objects in Google
+Cloud Storage shared by all instances - before the LLM is called. Concurrent
+requests for the same key wait for the single computation already in flight
+instead of all calling the model (stampede protection).
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import GCS_BUCKET_NAME, EXPLANATION_CACHE_MAX_ENTRIES
+from tracing import tracer
+from metrics import gcs_operation
+
+logger = logging.getLogger(__name__)
+
+
+def normalise_text(text: str) -> str:
+    """Normalises text for cache keys: Unicode NFKC, collapsed whitespace, case-folded."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split()).casefold()
+
+
+class ExplanationCache:
+    """Two-tier (memory + GCS) cache with in-flight request coalescing."""
+
+    def __init__(self, max_entries: int = EXPLANATION_CACHE_MAX_ENTRIES):
+        self.storage_client = None
+        self.bucket = None
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.stats = {"memory_hits": 0, "storage_hits": 0, "coalesced": 0, "misses": 0}
+
+    def _get_bucket(self):
+        """Lazy initialization of storage client and bucket."""
+        if self.storage_client is None and GCS_BUCKET_NAME:
+            try:
+                # Deferred import: the SDK is only loaded once storage is used (see startup.py)
+                from google.cloud import storage
+                self.storage_client = storage.Client()
+                self.bucket = self.storage_client.bucket(GCS_BUCKET_NAME)
+            except Exception as e:
+                logger.error(f"Failed to initialize GCS bucket '{GCS_BUCKET_NAME}': {e}")
+                self.bucket = None
+        return self.bucket
+
+    @staticmethod
+    def make_key(kind: str, prompt_version: str, models: str, language_level: str, *texts: str) -> str:
+        """Builds the content address of an entry."""
+        material = "\x1f".join([kind, prompt_version, models, language_level.upper()] + [normalise_text(t) for t in texts])
+        return f"{kind}/{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+    def _remember(self, key: str, value: Any):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_storage(self, key: str) -> Optional[Any]:
+        bucket = self._get_bucket()
+        if not bucket:
+            return None
+        blob = bucket.blob(f"explanation_cache/{key}.json")
+        with gcs_operation("explanation_cache", "exists"):
+            if not blob.exists():
+                return None
+        with gcs_operation("explanation_cache", "load"):
+            content = blob.download_as_text(encoding="utf-8")
+        return json.loads(content)
+
+    def _write_storage(self, key: str, value: Any):
+        bucket = self._get_bucket()
+        if not bucket:
+            return
+        with gcs_operation("explanation_cache", "save"):
+            bucket.blob(f"explanation_cache/{key}.json").upload_from_string(
+                json.dumps(value, ensure_ascii=False),
+                content_type="application/json; charset=utf-8"
+            )
+
+    async def _persist(self, key: str, value: Any):
+        try:
+            await asyncio.to_thread(self._write_storage, key, value)
+        except Exception as e:
+            logger.warning(f"Failed to persist explanation cache entry {key}: {e}")
+
+    @tracer.traced("explanation_cache")
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        """
+        Returns the cached value for key, or computes it once and caches it.
+
+        `compute` returns None for failures; those results are passed on but not cached.
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            tracer.set_attributes(cache="memory")
+            return copy.deepcopy(self._memory[key])
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.stats["coalesced"] += 1
+            tracer.set_attributes(cache="coalesced")
+            return copy.deepcopy(await asyncio.shield(in_flight))
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        value = None
+        try:
+            try:
+                value = await asyncio.to_thread(self._read_storage, key)
+            except Exception as e:
+                logger.warning(f"Failed to read explanation cache entry {key}: {e}")
+
+            if value is not None:
+                self.stats["storage_hits"] += 1
+                tracer.set_attributes(cache="storage")
+                self._remember(key, value)
+            else:
+                self.stats["misses"] += 1
+                tracer.set_attributes(cache="miss")
+                value = await compute()
+                if value is not None:
+                    self._remember(key, value)
+                    asyncio.create_task(self._persist(key, value))
+        finally:
+            self._in_flight.pop(key, None)
+            future.set_result(value)
+        return copy.deepcopy(value)
+
+
+# Global instance
+explanation_cache = ExplanationCache()
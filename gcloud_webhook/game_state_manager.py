@@ -1,19 +1,33 @@
+import asyncio
 import json
 import datetime
 import logging
-from typing import Dict, Any, Optional
-from google.cloud import storage
-from config import GCS_BUCKET_NAME
+from typing import Dict, Any, Optional, Set
+from config import GCS_BUCKET_NAME, GAME_STATE_SAVE_DELAY, GAME_STATE
 import pytz
 
+from tracing import tracer
+from metrics import gcs_operation
+
 logger = logging.getLogger(__name__)
 
 class GameStateManager:
-    """Manages persistent storage and retrieval of game state for users."""
+    """Manages persistent storage and retrieval of game state for users.
+
+    Saves requested during a turn go through `mark_dirty`, which coalesces them
+    into a single write-behind upload per user after `save_delay` seconds.
+    `flush_all` writes out everything still pending (on shutdown/instance stop).
+    """
     
-    def __init__(self):
+    def __init__(self, save_delay: float = GAME_STATE_SAVE_DELAY):
         self.storage_client = None
         self.bucket = None
+        self.save_delay = save_delay
+        self._dirty: Dict[int, Dict[str, Any]] = {}
+        self._pending_writes: Dict[int, asyncio.Task] = {}
+        # Users whose write-behind task is uploading right now (its state is no longer in _dirty)
+        self._uploading: Set[int] = set()
+        self._flushing = False
         
         if not GCS_BUCKET_NAME:
             logger.warning("GCS_BUCKET_NAME is not set. Game state persistence is disabled.")
@@ -22,6 +36,8 @@ class GameStateManager:
         """Lazy initialization of storage client and bucket."""
         if self.storage_client is None and GCS_BUCKET_NAME:
             try:
+                # Deferred import: the SDK is only loaded once storage is used (see startup.py)
+                from google.cloud import storage
                 self.storage_client = storage.Client()
                 self.bucket = self.storage_client.bucket(GCS_BUCKET_NAME)
             except Exception as e:
@@ -33,8 +49,9 @@ class GameStateManager:
         """Get the blob name for storing user's game state."""
         return f"game_states/user_{user_id}_state.json"
     
+    @tracer.traced("gcs.save_game_state")
     async def save_game_state(self, user_id: int, state: Dict[str, Any]) -> bool:
-        """Save the current game state for a user to persistent storage."""
+        """Save the current game state for a user to persistent storage immediately."""
         bucket = self._get_bucket()
         if not bucket:
             logger.warning(f"Cannot save game state for user {user_id}: No storage bucket configured")
@@ -52,13 +69,17 @@ class GameStateManager:
             blob_name = self._get_state_blob_name(user_id)
             blob = bucket.blob(blob_name)
             
-            # Convert sets to lists for JSON serialization
+            # Convert sets to lists for JSON serialization.
+            # Serialise on the event loop so the snapshot is consistent, upload in a worker thread.
             serializable_state = self._prepare_state_for_storage(data)
+            payload = json.dumps(serializable_state, ensure_ascii=False, separators=(",", ":"))
             
-            blob.upload_from_string(
-                json.dumps(serializable_state, indent=2, ensure_ascii=False),
-                content_type="application/json; charset=utf-8"
-            )
+            with gcs_operation("game_state", "save"):
+                await asyncio.to_thread(
+                    blob.upload_from_string,
+                    payload,
+                    content_type="application/json; charset=utf-8"
+                )
             
             logger.info(f"Successfully saved game state for user {user_id}")
             return True
@@ -66,9 +87,60 @@ class GameStateManager:
         except Exception as e:
             logger.error(f"Failed to save game state for user {user_id}: {e}")
             return False
+
+    def mark_dirty(self, user_id: int, state: Dict[str, Any]):
+        """Marks a user's state as changed; all changes within the save window become one upload."""
+        self._dirty[user_id] = state
+        if user_id not in self._pending_writes:
+            self._pending_writes[user_id] = asyncio.create_task(self._write_behind(user_id))
+
+    async def _write_behind(self, user_id: int):
+        """Uploads a user's dirty state after the save window, repeating while it keeps changing."""
+        try:
+            while user_id in self._dirty and not self._flushing:
+                await asyncio.sleep(self.save_delay)
+                # Marked before the pop, so flush_all/delete know this state is in flight
+                self._uploading.add(user_id)
+                try:
+                    state = self._dirty.pop(user_id, None)
+                    if state is not None:
+                        await self.save_game_state(user_id, state)
+                finally:
+                    self._uploading.discard(user_id)
+        finally:
+            if self._pending_writes.get(user_id) is asyncio.current_task():
+                del self._pending_writes[user_id]
+
+    async def flush_all(self):
+        """Writes out every pending dirty state right away (server shutdown / instance stop)."""
+        self._flushing = True
+        try:
+            pending = list(self._pending_writes.items())
+            for user_id, task in pending:
+                # A task still in its save window has not taken its state yet; one that is uploading must finish
+                if user_id not in self._uploading:
+                    # Removed here: a task cancelled before it started never runs its cleanup
+                    if self._pending_writes.get(user_id) is task:
+                        del self._pending_writes[user_id]
+                    task.cancel()
+            await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+            dirty, self._dirty = self._dirty, {}
+            if dirty:
+                logger.info(f"Flushing {len(dirty)} pending game state(s)")
+                await asyncio.gather(*(self.save_game_state(user_id, state) for user_id, state in dirty.items()))
+        finally:
+            self._flushing = False
     
+    @tracer.traced("gcs.load_game_state")
     async def load_game_state(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Load the saved game state for a user from persistent storage."""
+        # A state waiting for its write-behind upload is newer than the stored one
+        if user_id in self._dirty:
+            tracer.set_attributes(source="write_behind")
+            return {"state": self._dirty[user_id], "user_id": user_id}
+        tracer.set_attributes(source="gcs")
+
         bucket = self._get_bucket()
         if not bucket:
             logger.warning(f"Cannot load game state for user {user_id}: No storage bucket configured")
@@ -78,12 +150,16 @@ class GameStateManager:
             blob_name = self._get_state_blob_name(user_id)
             blob = bucket.blob(blob_name)
             
-            if not blob.exists():
+            with gcs_operation("game_state", "exists"):
+                exists = await asyncio.to_thread(blob.exists)
+            if not exists:
                 logger.info(f"No saved game state found for user {user_id}")
+                tracer.set_attributes(found=False)
                 return None
             
             # Download and parse the state
-            content = blob.download_as_text(encoding="utf-8")
+            with gcs_operation("game_state", "load"):
+                content = await asyncio.to_thread(blob.download_as_text, encoding="utf-8")
             saved_data = json.loads(content)
             
             # Convert lists back to sets where appropriate
@@ -96,8 +172,30 @@ class GameStateManager:
             logger.error(f"Failed to load game state for user {user_id}: {e}")
             return None
     
+    async def load_session_state(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Loads just the game state dict of a user, ready to be put back into GAME_STATE."""
+        saved_state_data = await self.load_game_state(user_id)
+        if not saved_state_data or not saved_state_data.get("state"):
+            return None
+        saved_state = saved_state_data["state"]
+        # Ensure game_completed flag is set if it doesn't exist
+        if "game_completed" not in saved_state:
+            saved_state["game_completed"] = False
+        return saved_state
+    
     async def delete_game_state(self, user_id: int) -> bool:
         """Delete the saved game state for a user (e.g., when game is completed)."""
+        # Drop any pending write-behind save so it cannot resurrect the deleted state
+        self._dirty.pop(user_id, None)
+        pending_write = self._pending_writes.get(user_id)
+        if pending_write:
+            if user_id in self._uploading:
+                # Let the running upload land first; the task ends since nothing is dirty any more
+                await asyncio.gather(pending_write, return_exceptions=True)
+            else:
+                del self._pending_writes[user_id]
+                pending_write.cancel()
+
         bucket = self._get_bucket()
         if not bucket:
             logger.warning(f"Cannot delete game state for user {user_id}: No storage bucket configured")
@@ -107,8 +205,11 @@ class GameStateManager:
             blob_name = self._get_state_blob_name(user_id)
             blob = bucket.blob(blob_name)
             
-            if blob.exists():
-                blob.delete()
+            with gcs_operation("game_state", "exists"):
+                exists = blob.exists()
+            if exists:
+                with gcs_operation("game_state", "delete"):
+                    blob.delete()
                 logger.info(f"Successfully deleted game state for user {user_id}")
             else:
                 logger.info(f"No game state to delete for user {user_id}")
@@ -172,3 +273,6 @@ class GameStateManager:
 
 # Global instance
 game_state_manager = GameStateManager()
+
+# Evicted or never-loaded game states are transparently reloaded from storage
+GAME_STATE.set_loader(game_state_manager.load_session_state)
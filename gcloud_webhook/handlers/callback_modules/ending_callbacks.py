@@ -8,7 +8,6 @@ This module handles all game conclusion actions including:
 - Final report generation and cleanup
 """
 
-import asyncio
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
@@ -17,6 +16,7 @@ from config import GAME_STATE
 from utils import load_system_prompt
 from game_state_manager import game_state_manager
 from progress_manager import progress_manager
+from tracing import tracer
 from ..game_utils import save_user_game_state, get_participant_code
 from ..commands import restart_command_handler
 from ..reports import generate_final_english_report
@@ -150,7 +150,7 @@ async def handle_reveal_custom_action(update: Update, context: ContextTypes.DEFA
                 )
                 # Remove button from previous message
                 await query.edit_message_reply_markup(reply_markup=None)
-                await asyncio.sleep(2)  # Pause before next message
+                await tracer.sleep(2, "ending")  # Pause before next message
                 
                 # Automatically show next message
                 next_step = current_step + 1
@@ -26,6 +26,9 @@ async def handle_explain_action(update: Update, context: ContextTypes.DEFAULT_TY
     query = update.callback_query
     state = GAME_STATE[user_id]
     sub_action = parts[1]
+    if sub_action in ("init", "word", "all"):
+        # The message may have been cached by another instance: read it through from the session backend
+        await message_cache.get_or_load(int(parts[2]))
     
     if sub_action == "init":
         original_message_id = int(parts[2])
@@ -34,7 +37,7 @@ async def handle_explain_action(update: Update, context: ContextTypes.DEFAULT_TY
         # Log the explain action initiation
         log_message(user_id, "user_action", f"Clicked 'Explain' button for message: {original_text[:100]}...", get_participant_code(user_id))
         
-        words_to_explain = await ask_word_spotter(original_text)
+        words_to_explain = await ask_word_spotter(original_text, state.get("current_language_level", "B1"))
         keyboard = []
         for word in words_to_explain:
             keyboard.append([InlineKeyboardButton(f"'{word}'", callback_data=f"explain__word__{original_message_id}__{word}")])
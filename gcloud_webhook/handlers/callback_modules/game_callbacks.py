@@ -10,13 +10,13 @@ This module handles all main game interaction actions including:
 """
 
 import logging
-import os
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from config import GAME_STATE, CHARACTER_DATA, SUSPECT_KEYS, message_cache
 from ai_services import ask_for_dialogue
 from utils import load_system_prompt, log_message, create_explain_button, combine_character_prompt, save_message_to_cache
+from media_registry import media_registry
 from ..game_utils import (
     get_participant_code, 
     save_user_game_state, 
@@ -26,7 +26,6 @@ from ..game_utils import (
 )
 
 logger = logging.getLogger(__name__)
-_BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 async def handle_guide_action(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, parts: list):
@@ -40,13 +39,13 @@ async def handle_guide_action(update: Update, context: ContextTypes.DEFAULT_TYPE
         # Send the detective guide image
         try:
             guide_path = "images/detective_guide.png"
-            with open(guide_path, "rb") as photo:
-                await context.bot.send_photo(
-                    chat_id=user_id,
-                    photo=photo,
-                    caption="💡 **Detective Guide**\n\nHere are some ideas to get your investigation started!\n\n💬 **Pro tip**: People reveal more in private conversations than in group settings!",
-                    parse_mode='Markdown'
-                )
+            await media_registry.send_photo(
+                context.bot,
+                user_id,
+                guide_path,
+                caption="💡 **Detective Guide**\n\nHere are some ideas to get your investigation started!\n\n💬 **Pro tip**: People reveal more in private conversations than in group settings!",
+                parse_mode='Markdown'
+            )
         except FileNotFoundError:
             # Fallback if image not found
             await context.bot.send_message(
@@ -77,10 +76,9 @@ async def handle_clue_action(update: Update, context: ContextTypes.DEFAULT_TYPE,
     # Save state when clue is examined
     await save_user_game_state(user_id)
 
-    image_filepath = os.path.join(_BASE_DIR, f"images/clue{clue_id}.png")
+    image_filepath = f"images/clue{clue_id}.png"
     try:
-        with open(image_filepath, 'rb') as photo:
-            await context.bot.send_photo(chat_id=user_id, photo=photo)
+        await media_registry.send_photo(context.bot, user_id, image_filepath)
     except (OSError, IOError, FileNotFoundError) as e:
         print(f"[WARNING] Could not load clue image {image_filepath}: {e}")
         # Continue without the image if it can't be loaded
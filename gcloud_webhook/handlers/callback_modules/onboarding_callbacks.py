@@ -7,13 +7,14 @@ This module handles all onboarding-related actions including:
 - Case introduction sequence
 """
 
-import asyncio
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from config import GAME_STATE
 from utils import load_system_prompt
+from tracing import tracer
+from media_registry import media_registry
 from ..game_utils import save_user_game_state
 
 logger = logging.getLogger(__name__)
@@ -147,14 +148,14 @@ async def handle_language_action(update: Update, context: ContextTypes.DEFAULT_T
             photo_path = "images/aric-cheng-7Bv9MrBan9s-unsplash.jpg"
             logger.info(f"User {user_id}: Attempting to send photo from {photo_path}")
             
-            with open(photo_path, "rb") as photo:
-                await context.bot.send_photo(
-                    chat_id=user_id,
-                    photo=photo,
-                    caption=atmospheric_text,
-                    parse_mode='Markdown',
-                    reply_markup=InlineKeyboardMarkup(keyboard)
-                )
+            await media_registry.send_photo(
+                context.bot,
+                user_id,
+                photo_path,
+                caption=atmospheric_text,
+                parse_mode='Markdown',
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
             logger.info(f"User {user_id}: Atmospheric photo sent successfully")
         except FileNotFoundError:
             logger.error(f"User {user_id}: Photo file not found at {photo_path}")
@@ -215,7 +216,7 @@ async def handle_language_action(update: Update, context: ContextTypes.DEFAULT_T
             text="🔄 Adjusting text difficulty...",
             parse_mode='Markdown'
         )
-        await asyncio.sleep(1.5)
+        await tracer.sleep(1.5, "onboarding")
 
         # Determine text and keyboard for the new level
         if new_level == "A2":
@@ -309,13 +310,13 @@ async def handle_case_intro_action(update: Update, context: ContextTypes.DEFAULT
             photo_path = "images/suspects.png"
             logger.info(f"User {user_id}: Attempting to send photo from {photo_path}")
             
-            with open(photo_path, "rb") as photo:
-                await context.bot.send_photo(
-                    chat_id=user_id,
-                    photo=photo,
-                    caption=suspects_text,
-                    parse_mode='Markdown'
-                )
+            await media_registry.send_photo(
+                context.bot,
+                user_id,
+                photo_path,
+                caption=suspects_text,
+                parse_mode='Markdown'
+            )
             logger.info(f"User {user_id}: Suspects photo sent successfully")
         
         except FileNotFoundError:
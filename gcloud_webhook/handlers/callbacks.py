@@ -11,7 +11,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from config import GAME_STATE
-from game_state_manager import game_state_manager
+from tracing import tracer
 
 
 # Import all specialized callback handlers
@@ -57,6 +57,7 @@ ACTION_HANDLERS = {
 }
 
 
+@tracer.traced()
 async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Main callback dispatcher that routes button presses to appropriate handlers.
@@ -68,6 +69,7 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
     user_id = query.from_user.id
     parts = query.data.split("__")
     action_type = parts[0]
+    tracer.set_attributes(user_id=user_id, action=action_type, session_cache="hit" if user_id in GAME_STATE else "miss")
     
     logger.info(f"User {user_id}: Button callback received - action: {action_type}, data: {query.data}")
     
@@ -75,16 +77,11 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
     if user_id not in GAME_STATE:
         await query.answer("🔄 Restoring your game...")
         
-        saved_state_data = await game_state_manager.load_game_state(user_id)
+        with tracer.span("game_state.restore") as span:
+            restored_state = await GAME_STATE.get_or_load(user_id)
+            span.set_attribute("found", bool(restored_state))
         
-        if saved_state_data and saved_state_data.get("state"):
-            saved_state = saved_state_data["state"]
-            # Ensure required fields exist
-            if "game_completed" not in saved_state:
-                saved_state["game_completed"] = False
-
-            GAME_STATE[user_id] = saved_state
-            
+        if restored_state:
             logger.info(f"User {user_id}: Automatically restored game state from saved data in button callback")
             
             # Check if post-test message should be scheduled for restored game
@@ -104,7 +101,8 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
     handler = ACTION_HANDLERS.get(action_type)
     if handler:
         try:
-            result = await handler(update, context, user_id, parts)
+            with tracer.span(f"callback.{action_type}"):
+                result = await handler(update, context, user_id, parts)
             # Some handlers return True to indicate special handling (like restarts)
             if result is True:
                 return
@@ -199,13 +199,9 @@ async def update_keyboard_handler(update: Update, context: ContextTypes.DEFAULT_
     
     # Check if user has game state, if not try to restore from saved state
     if user_id not in GAME_STATE:
-        saved_state_data = await game_state_manager.load_game_state(user_id)
+        restored_state = await GAME_STATE.get_or_load(user_id)
         
-        if saved_state_data and saved_state_data.get("state"):
-            saved_state = saved_state_data["state"]
-            if "game_completed" not in saved_state:
-                saved_state["game_completed"] = False
-            GAME_STATE[user_id] = saved_state
+        if restored_state:
             logger.info(f"User {user_id}: Restored game state for keyboard update")
             
 
@@ -247,17 +243,9 @@ async def show_main_menu_handler(update: Update, context: ContextTypes.DEFAULT_T
         # Send immediate response to prevent user from leaving
         typing_message = await update.message.reply_text("🔄 Restoring your game...")
         
-        saved_state_data = await game_state_manager.load_game_state(user_id)
+        restored_state = await GAME_STATE.get_or_load(user_id)
         
-        if saved_state_data and saved_state_data.get("state"):
-            # User has an existing game - restore it silently
-            saved_state = saved_state_data["state"]
-            # Ensure game_completed flag is set if it doesn't exist
-            if "game_completed" not in saved_state:
-                saved_state["game_completed"] = False
-
-            GAME_STATE[user_id] = saved_state
-            
+        if restored_state:
             # Delete the typing message
             try:
                 await context.bot.delete_message(chat_id=user_id, message_id=typing_message.message_id)
@@ -309,17 +297,9 @@ async def show_language_learning_menu_handler(update: Update, context: ContextTy
         # Send immediate response to prevent user from leaving
         typing_message = await update.message.reply_text("🔄 Restoring your game...")
         
-        saved_state_data = await game_state_manager.load_game_state(user_id)
+        restored_state = await GAME_STATE.get_or_load(user_id)
         
-        if saved_state_data and saved_state_data.get("state"):
-            # User has an existing game - restore it silently
-            saved_state = saved_state_data["state"]
-            # Ensure game_completed flag is set if it doesn't exist
-            if "game_completed" not in saved_state:
-                saved_state["game_completed"] = False
-
-            GAME_STATE[user_id] = saved_state
-            
+        if restored_state:
             # Delete the typing message
             try:
                 await context.bot.delete_message(chat_id=user_id, message_id=typing_message.message_id)
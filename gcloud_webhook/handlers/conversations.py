@@ -8,19 +8,95 @@ accusations, scene actions, and director decisions.
 import asyncio
 import json
 import logging
+import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
-from config import GAME_STATE, CHARACTER_DATA, message_cache
-from ai_services import ask_for_dialogue, ask_director
+from config import GAME_STATE, CHARACTER_DATA, message_cache, STREAMING_REPLIES_ENABLED, STREAM_EDIT_INTERVAL, SCENE_PREFETCH_ENABLED
+from ai_services import ask_for_dialogue, ask_for_dialogue_stream, ask_director, generate_dialogue, record_dialogue_turn
 from utils import load_system_prompt, log_message, create_explain_button, combine_character_prompt, save_message_to_cache, get_character_from_message_id
 from progress_manager import progress_manager
+from tracing import tracer
+from metrics import director_decisions
 
 # Import utility functions
 from .game_utils import get_participant_code, save_user_game_state
 
 logger = logging.getLogger(__name__)
 
+# Minimum pause in seconds between two consecutive messages of a scene
+SCENE_ACTION_GAP = 4
+
+
+@tracer.traced("character_reply")
+async def send_character_reply(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, char_key: str, context_trigger: str, system_prompt: str):
+    """
+    Generates a character's answer to the player's message and sends it with an explain button.
+
+    With STREAMING_REPLIES_ENABLED the answer appears sentence by sentence while it is being
+    generated (one message, edited at most every STREAM_EDIT_INTERVAL seconds).
+    Returns the reply text, or None if the character produced nothing.
+    """
+    char_data = CHARACTER_DATA[char_key]
+    header = f"{char_data['emoji']} *{char_data['full_name']}:* "
+    streamed = {"message": None, "edited_at": 0.0}
+
+    async def show_partial(partial_text: str):
+        now = time.monotonic()
+        try:
+            if streamed["message"] is None:
+                streamed["message"] = await update.message.reply_text(header + partial_text, parse_mode='Markdown')
+            elif now - streamed["edited_at"] >= STREAM_EDIT_INTERVAL:
+                await context.bot.edit_message_text(
+                    chat_id=streamed["message"].chat_id,
+                    message_id=streamed["message"].message_id,
+                    text=header + partial_text,
+                    parse_mode='Markdown'
+                )
+            else:
+                return
+            streamed["edited_at"] = now
+        except BadRequest as e:
+            # Partial Markdown may be unbalanced; the final edit shows the complete text
+            logger.debug(f"User {user_id}: Skipped streamed update: {e}")
+
+    if STREAMING_REPLIES_ENABLED:
+        reply_text = await ask_for_dialogue_stream(user_id, context_trigger, system_prompt, char_key, on_partial=show_partial)
+    else:
+        reply_text = await ask_for_dialogue(user_id, context_trigger, system_prompt, char_key)
+    if not reply_text:
+        return None
+
+    reply_message = streamed["message"]
+    if reply_message is None:
+        reply_message = await update.message.reply_text(header + reply_text, parse_mode='Markdown')
+        keyboard = InlineKeyboardMarkup(create_explain_button(reply_message.message_id))
+        try:
+            await context.bot.edit_message_reply_markup(chat_id=reply_message.chat_id, message_id=reply_message.message_id, reply_markup=keyboard)
+        except Exception as edit_error:
+            logger.warning(f"User {user_id}: Failed to add explain button to message {reply_message.message_id}: {edit_error}")
+    else:
+        # Replace the streamed text with the final reply and add the explain button in the same edit
+        keyboard = InlineKeyboardMarkup(create_explain_button(reply_message.message_id))
+        try:
+            await context.bot.edit_message_text(
+                chat_id=reply_message.chat_id, message_id=reply_message.message_id,
+                text=header + reply_text, parse_mode='Markdown', reply_markup=keyboard
+            )
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                await context.bot.edit_message_reply_markup(chat_id=reply_message.chat_id, message_id=reply_message.message_id, reply_markup=keyboard)
+            else:
+                logger.warning(f"User {user_id}: Final streamed edit failed, sending without Markdown: {e}")
+                await context.bot.edit_message_text(
+                    chat_id=reply_message.chat_id, message_id=reply_message.message_id,
+                    text=f"{char_data['emoji']} {char_data['full_name']}: {reply_text}", reply_markup=keyboard
+                )
+
+    save_message_to_cache(reply_message.message_id, reply_text, char_key)
+    return reply_text
+
 
 async def handle_private_character_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, user_text: str, reply_info=None):
     """Handles private conversations directly with a specific character, bypassing the Director AI."""
@@ -48,21 +124,9 @@ async def handle_private_character_conversation(update: Update, context: Context
     logger.info(f"User {user_id}: Direct character conversation with '{char_key}'")
     
     try:
-        reply_text = await ask_for_dialogue(user_id, context_trigger, system_prompt, char_key)
+        reply_text = await send_character_reply(update, context, user_id, char_key, context_trigger, system_prompt)
         
         if reply_text:
-            formatted_reply = f"{char_data['emoji']} *{char_data['full_name']}:* {reply_text}"
-            reply_message = await update.message.reply_text(formatted_reply, parse_mode='Markdown')
-            
-            # Add explain button
-            keyboard = create_explain_button(reply_message.message_id)
-            save_message_to_cache(reply_message.message_id, reply_text, char_key)
-            await context.bot.edit_message_reply_markup(
-                chat_id=reply_message.chat_id, 
-                message_id=reply_message.message_id, 
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
-            
             # Log the character's response
             log_message(user_id, f"character_{char_key}", reply_text, get_participant_code(user_id))
             
@@ -103,7 +167,7 @@ async def handle_accusation_direct(update: Update, context: ContextTypes.DEFAULT
         # Correct accusation - player wins
         outro_text = load_system_prompt("game_texts/outro_win.txt")
         
-        await asyncio.sleep(1)  # Brief pause for drama
+        await tracer.sleep(1, "accusation")  # Brief pause for drama
         
         # Create inline keyboard with find out more and final report buttons
         keyboard = [
@@ -136,12 +200,12 @@ async def handle_accusation_direct(update: Update, context: ContextTypes.DEFAULT
             # 1 attempt left (this is already correct in the files)
             pass  # Text already says "I have **1 more attempt** left."
         
-        await asyncio.sleep(1)  # Brief pause for drama
+        await tracer.sleep(1, "accusation")  # Brief pause for drama
         await update.callback_query.message.reply_text(defense_text, parse_mode='Markdown')
         
         if state["accusation_attempts"] >= 2:
             # Second wrong attempt - show game over after defense
-            await asyncio.sleep(3)  # Longer pause to let player read the defense
+            await tracer.sleep(3, "accusation")  # Longer pause to let player read the defense
             
             outro_text = load_system_prompt("game_texts/outro_lose.txt")
             
@@ -163,7 +227,7 @@ async def handle_accusation_direct(update: Update, context: ContextTypes.DEFAULT
             
         else:
             # First wrong attempt - show options for second chance
-            await asyncio.sleep(2)  # Pause to let player read the defense
+            await tracer.sleep(2, "accusation")  # Pause to let player read the defense
             
             # Create keyboard with options for second attempt
             keyboard = [
@@ -181,11 +245,71 @@ async def handle_accusation_direct(update: Update, context: ContextTypes.DEFAULT
             await save_user_game_state(user_id)
 
 
+def _get_scene_action_dialogue(user_id: int, scene_action: dict):
+    """Returns (character_key, trigger_message, system_prompt) of a character action, or None for other actions."""
+    action = scene_action.get("action")
+    data = scene_action.get("data", {})
+
+    if action not in ["character_reply", "character_reaction"]:
+        return None
+
+    char_key = data.get("character_key")
+    trigger_msg = data.get("trigger_message")
+    if char_key not in CHARACTER_DATA or not trigger_msg:
+        return None
+
+    # Get current language level from user's game state
+    current_language_level = GAME_STATE[user_id].get("current_language_level", "B1")
+    system_prompt = combine_character_prompt(char_key, current_language_level)
+    return char_key, trigger_msg, system_prompt
+
+
+async def generate_scene_action(user_id: int, scene_action: dict):
+    """Generates the dialogue for a character action of a scene. Returns None for actions without dialogue."""
+    dialogue = _get_scene_action_dialogue(user_id, scene_action)
+    if dialogue is None:
+        return None
+    char_key, trigger_msg, system_prompt = dialogue
+    logger.info(f"User {user_id}: Generating reply for character '{char_key}'.")
+    return await ask_for_dialogue(user_id, trigger_msg, system_prompt, char_key)
+
+
+async def prefetch_scene_action(user_id: int, scene_action: dict):
+    """
+    Generates the dialogue for a character action without writing the conversation history.
+
+    Returns (reply_text, history_turn): history_turn is the (trigger, reply, character_key)
+    to record when the reply is delivered, or None if nothing should be recorded.
+    """
+    dialogue = _get_scene_action_dialogue(user_id, scene_action)
+    if dialogue is None:
+        return None, None
+    char_key, trigger_msg, system_prompt = dialogue
+    logger.info(f"User {user_id}: Prefetching reply for character '{char_key}'.")
+    try:
+        reply_text = await generate_dialogue(user_id, trigger_msg, system_prompt, char_key)
+    except Exception as e:
+        logger.error(f"User {user_id}: Prefetch for character '{char_key}' failed: {e}")
+        log_message(user_id, "dialogue_error", f"prefetch_scene_action failed: {e}", None)
+        return "Sorry, a server error occurred.", None
+    if not reply_text:
+        return "I'm not sure how to respond to that.", None
+    return reply_text, (trigger_msg, reply_text, char_key)
+
+
 async def execute_scene_action(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, scene_action: dict):
     """Executes a single action from a scene (e.g., character reply, character reaction)."""
+    reply_text = await generate_scene_action(user_id, scene_action)
+    await deliver_scene_action(update, context, user_id, scene_action, reply_text)
+
+
+@tracer.traced("scene.deliver")
+async def deliver_scene_action(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, scene_action: dict, reply_text):
+    """Sends an already generated scene action to the player and updates the topic memory."""
     action = scene_action.get("action")
     data = scene_action.get("data", {})
     state = GAME_STATE[user_id]
+    tracer.set_attributes(scene_action=action, character=data.get("character_key"))
 
     if action == "director_note":
         # Handle director narrative/guidance message
@@ -207,12 +331,7 @@ async def execute_scene_action(update: Update, context: ContextTypes.DEFAULT_TYP
         char_key = data.get("character_key")
         trigger_msg = data.get("trigger_message")
         if char_key in CHARACTER_DATA and trigger_msg:
-            logger.info(f"User {user_id}: Generating reply for character '{char_key}'.")
             char_data = CHARACTER_DATA[char_key]
-            # Get current language level from user's game state
-            current_language_level = state.get("current_language_level", "B1")
-            system_prompt = combine_character_prompt(char_key, current_language_level)
-            reply_text = await ask_for_dialogue(user_id, trigger_msg, system_prompt, char_key)
             
             if reply_text:
                 logger.info(f"User {user_id}: Character '{char_key}' generated reply: '{reply_text[:100]}...'")
@@ -282,6 +401,7 @@ async def execute_scene_action(update: Update, context: ContextTypes.DEFAULT_TYP
                 state["topic_memory"]["spoken"].append(char_key)
 
 
+@tracer.traced("director")
 async def process_director_decision(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, user_text: str):
     """Gets a decision from the director and executes the resulting scene for PUBLIC conversations only."""
     state = GAME_STATE[user_id]
@@ -299,7 +419,14 @@ async def process_director_decision(update: Update, context: ContextTypes.DEFAUL
     logger.info(f"User {user_id}: Context for director: {context_for_director}")
     logger.info(f"User {user_id}: User text: {user_text}")
     
-    director_decision = await ask_director(user_id, context_for_director, user_text)
+    with tracer.span("director.decide") as span:
+        director_decision = await ask_director(user_id, context_for_director, user_text)
+        span.set_attributes(predefined=bool(director_decision.get("predefined")),
+                            scene_actions=len(director_decision.get("scene", [])))
+    if director_decision.get("predefined"):
+        director_decisions.inc("predefined")
+    else:
+        director_decisions.inc("llm" if director_decision.get("scene") else "empty")
     logger.info(f"User {user_id}: Director decision received: {director_decision}")
 
     scene = director_decision.get("scene", [])
@@ -324,12 +451,75 @@ async def process_director_decision(update: Update, context: ContextTypes.DEFAUL
         return
 
     logger.info(f"User {user_id}: Executing scene with {len(scene)} actions: {[action.get('action') for action in scene]}")
-    for i, scene_action in enumerate(scene):
-        if i > 0:
-            await asyncio.sleep(4)
-        logger.info(f"User {user_id}: Executing scene action {i+1}/{len(scene)}: {scene_action.get('action')}")
-        logger.info(f"User {user_id}: Scene action data: {scene_action.get('data', {})}")
-        await execute_scene_action(update, context, user_id, scene_action)
+    if director_decision.get("predefined") and SCENE_PREFETCH_ENABLED:
+        await run_prefetched_scene(update, context, user_id, scene)
+    else:
+        await run_scene_pipeline(update, context, user_id, scene)
+
+
+@tracer.traced("scene.pipeline")
+async def run_scene_pipeline(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, scene: list):
+    """
+    Executes scene actions in order, generating action N+1 while action N is being delivered.
+
+    Generation stays sequential (action N+1 starts only after action N's reply is in the
+    conversation history), but it overlaps with the delivery of N and the dramatic pause.
+    SCENE_ACTION_GAP is therefore a minimum gap between messages, not extra latency.
+    """
+    loop = asyncio.get_running_loop()
+    generation = asyncio.create_task(generate_scene_action(user_id, scene[0]))
+    last_delivery_time = None
+    try:
+        for i, scene_action in enumerate(scene):
+            reply_text = await generation
+            if i + 1 < len(scene):
+                generation = asyncio.create_task(generate_scene_action(user_id, scene[i + 1]))
+
+            if last_delivery_time is not None:
+                remaining_gap = SCENE_ACTION_GAP - (loop.time() - last_delivery_time)
+                if remaining_gap > 0:
+                    await tracer.sleep(remaining_gap, "scene_gap")
+
+            logger.info(f"User {user_id}: Executing scene action {i+1}/{len(scene)}: {scene_action.get('action')}")
+            logger.info(f"User {user_id}: Scene action data: {scene_action.get('data', {})}")
+            await deliver_scene_action(update, context, user_id, scene_action, reply_text)
+            last_delivery_time = loop.time()
+    finally:
+        if not generation.done():
+            generation.cancel()
+
+
+@tracer.traced("scene.prefetched")
+async def run_prefetched_scene(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, scene: list):
+    """
+    Executes a predefined scene whose character replies are all generated concurrently up front.
+
+    The triggers of predefined scenes are fixed, so every reply can start at once; the scene
+    then costs about one LLM latency instead of one per character. Replies are delivered (and
+    recorded in the conversation history) in scene order with the usual SCENE_ACTION_GAP.
+    Unlike run_scene_pipeline, a character does not see the earlier replies of the same scene.
+    """
+    loop = asyncio.get_running_loop()
+    generations = [asyncio.create_task(prefetch_scene_action(user_id, scene_action)) for scene_action in scene]
+    last_delivery_time = None
+    try:
+        for i, scene_action in enumerate(scene):
+            reply_text, history_turn = await generations[i]
+
+            if last_delivery_time is not None:
+                remaining_gap = SCENE_ACTION_GAP - (loop.time() - last_delivery_time)
+                if remaining_gap > 0:
+                    await tracer.sleep(remaining_gap, "scene_gap")
+
+            logger.info(f"User {user_id}: Executing prefetched scene action {i+1}/{len(scene)}: {scene_action.get('action')}")
+            if history_turn:
+                record_dialogue_turn(user_id, *history_turn)
+            await deliver_scene_action(update, context, user_id, scene_action, reply_text)
+            last_delivery_time = loop.time()
+    finally:
+        for generation in generations:
+            if not generation.done():
+                generation.cancel()
 
 
 async def handle_character_reply_response(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, user_text: str, character_key: str, reply_info: dict):
@@ -355,24 +545,9 @@ async def handle_character_reply_response(update: Update, context: ContextTypes.
     logger.info(f"User {user_id}: Character '{character_key}' responding to reply")
     
     try:
-        reply_text = await ask_for_dialogue(user_id, context_trigger, system_prompt, character_key)
+        reply_text = await send_character_reply(update, context, user_id, character_key, context_trigger, system_prompt)
         
         if reply_text:
-            formatted_reply = f"{char_data['emoji']} *{char_data['full_name']}:* {reply_text}"
-            reply_message = await update.message.reply_text(formatted_reply, parse_mode='Markdown')
-            
-            # Add explain button
-            keyboard = create_explain_button(reply_message.message_id)
-            save_message_to_cache(reply_message.message_id, reply_text, character_key)
-            try:
-                await context.bot.edit_message_reply_markup(
-                    chat_id=reply_message.chat_id, 
-                    message_id=reply_message.message_id, 
-                    reply_markup=InlineKeyboardMarkup(keyboard)
-                )
-            except Exception as edit_error:
-                logger.warning(f"User {user_id}: Failed to add explain button to character reply message {reply_message.message_id}: {edit_error}")
-            
             # Log the character's response
             log_message(user_id, f"character_{character_key}_reply", reply_text, get_participant_code(user_id))
             
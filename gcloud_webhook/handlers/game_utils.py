@@ -40,9 +40,9 @@ def get_random_common_space_phrase():
 
 
 async def save_user_game_state(user_id: int):
-    """Save the current game state for a user to persistent storage."""
+    """Marks the user's game state for saving; repeated calls within a turn become one upload."""
     if user_id in GAME_STATE:
-        await game_state_manager.save_game_state(user_id, GAME_STATE[user_id])
+        game_state_manager.mark_dirty(user_id, GAME_STATE[user_id])
 
 
 async def check_and_unlock_accuse(user_id: int, context: ContextTypes.DEFAULT_TYPE):
@@ -13,7 +13,7 @@ from telegram.constants import ChatAction
 
 from config import GAME_STATE
 from utils import load_system_prompt, log_message, get_character_from_message_id
-from game_state_manager import game_state_manager
+from tracing import tracer
 
 # Import handlers from other modules
 from .commands import start_command_handler
@@ -27,6 +27,7 @@ from .game_utils import (
 logger = logging.getLogger(__name__)
 
 
+@tracer.traced()
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Orchestrates responses by calling helper functions."""
     # Этот логгер теперь должен сработать в любом случае
@@ -35,6 +36,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await context.bot.send_chat_action(chat_id=update.effective_chat.id, action=ChatAction.TYPING)
     user_id = update.message.from_user.id
     user_text = update.message.text
+    tracer.set_attributes(user_id=user_id, action="message", session_cache="hit" if user_id in GAME_STATE else "miss")
     
     # Check if this message is a reply to another message
     reply_info = None
@@ -61,17 +63,11 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         typing_message = await update.message.reply_text("🔄 Restoring your game...")
         
         # Check if user has saved game state and restore it automatically
-        saved_state_data = await game_state_manager.load_game_state(user_id)
+        with tracer.span("game_state.restore") as span:
+            restored_state = await GAME_STATE.get_or_load(user_id)
+            span.set_attribute("found", bool(restored_state))
         
-        if saved_state_data and saved_state_data.get("state"):
-            # User has an existing game - restore it silently and continue
-            saved_state = saved_state_data["state"]
-            # Ensure game_completed flag is set if it doesn't exist
-            if "game_completed" not in saved_state:
-                saved_state["game_completed"] = False
-
-            GAME_STATE[user_id] = saved_state
-            
+        if restored_state:
             # Delete the typing message
             try:
                 await context.bot.delete_message(chat_id=user_id, message_id=typing_message.message_id)
@@ -104,6 +100,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Check if waiting for participant code
     if state.get("waiting_for_participant_code"):
+        tracer.set_attributes(route="participant_code")
         # Validate participant code format (e.g., AN0842) or TEST for testers
         is_valid_regular_code = (len(user_text) == 6 and user_text[:2].isalpha() and 
                                 user_text[2:4].isdigit() and user_text[4:6].isdigit())
@@ -139,6 +136,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
     if state.get("waiting_for_word"):
+        tracer.set_attributes(route="word_explanation")
         await send_tutor_explanation(update, context, user_text)
         state["waiting_for_word"] = False
         logger.info(f"--- handle_message END for user {user_id} (word explained) ---")
@@ -149,6 +147,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         character_key = get_character_from_message_id(reply_info['replied_to_message_id'])
         if character_key:
             logger.info(f"User {user_id}: Detected reply to character '{character_key}' message")
+            tracer.set_attributes(route="character_reply", character=character_key)
             # Handle reply to character directly, bypassing normal flow
             if await handle_character_reply_response(update, context, user_id, user_text, character_key, reply_info):
                 logger.info(f"--- handle_message END for user {user_id} (character reply handled) ---")
@@ -164,6 +163,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if state.get("mode") == "private":
         char_key = state.get("current_character")
+        tracer.set_attributes(route="private", character=char_key)
         if char_key and char_key not in state.get("suspects_interrogated", set()):
             state["suspects_interrogated"].add(char_key)
             await check_and_unlock_accuse(user_id, context)
@@ -179,6 +179,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
     else:
         # Public mode - use Director AI for scene orchestration
+        tracer.set_attributes(route="public")
         logger.info(f"User {user_id}: Processing public conversation via Director AI")
         await process_director_decision(update, context, user_id, user_text)
     
@@ -5,7 +5,6 @@ This module contains functions for generating and displaying user progress repor
 including language learning progress and final reports.
 """
 
-import asyncio
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
@@ -14,8 +13,8 @@ from telegram.constants import ChatAction
 from config import GAME_STATE
 from ai_services import ask_tutor_for_final_summary
 from utils import log_message, split_long_message
-from game_state_manager import game_state_manager
 from progress_manager import progress_manager
+from tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -56,17 +55,9 @@ async def progress_report_handler(update: Update, context: ContextTypes.DEFAULT_
         else:
             typing_message = await context.bot.send_message(chat_id=user_id, text="🔄 Restoring your game...")
         
-        saved_state_data = await game_state_manager.load_game_state(user_id)
+        restored_state = await GAME_STATE.get_or_load(user_id)
         
-        if saved_state_data and saved_state_data.get("state"):
-            # User has an existing game - restore it silently
-            saved_state = saved_state_data["state"]
-            # Ensure game_completed flag is set if it doesn't exist
-            if "game_completed" not in saved_state:
-                saved_state["game_completed"] = False
-
-            GAME_STATE[user_id] = saved_state
-            
+        if restored_state:
             # Delete the typing message
             try:
                 await context.bot.delete_message(chat_id=user_id, message_id=typing_message.message_id)
@@ -130,7 +121,7 @@ async def progress_report_handler(update: Update, context: ContextTypes.DEFAULT_
     message_chunks = split_long_message(report)
     for i, chunk in enumerate(message_chunks):
         if i > 0:
-            await asyncio.sleep(1)
+            await tracer.sleep(1, "message_chunks")
         
         await send_message(chunk, parse_mode='HTML')
     
@@ -205,5 +196,5 @@ async def generate_final_english_report(update: Update, context: ContextTypes.DE
     message_chunks = split_long_message(report)
     for i, chunk in enumerate(message_chunks):
         if i > 0:
-            await asyncio.sleep(1)
+            await tracer.sleep(1, "message_chunks")
         await context.bot.send_message(chat_id=user_id, text=chunk, parse_mode='HTML')
@@ -5,7 +5,6 @@ This module contains functions related to language learning assistance,
 text analysis, and tutoring functionality.
 """
 
-import asyncio
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
@@ -14,6 +13,7 @@ from config import CHARACTER_DATA, GAME_STATE
 from ai_services import ask_tutor_for_analysis, ask_tutor_for_explanation
 from utils import log_message, split_long_message
 from progress_manager import progress_manager
+from tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +39,8 @@ async def send_tutor_explanation(update: Update, context: ContextTypes.DEFAULT_T
     user_id = update.effective_user.id
     tutor_data = CHARACTER_DATA["tutor"]
 
-    explanation_data = await ask_tutor_for_explanation(user_id, text_to_explain, original_message)
+    language_level = GAME_STATE.get(user_id, {}).get("current_language_level", "B1")
+    explanation_data = await ask_tutor_for_explanation(user_id, text_to_explain, original_message, language_level)
     
     definition = explanation_data.get("definition")
     examples = explanation_data.get("examples", [])
@@ -61,7 +62,7 @@ async def send_tutor_explanation(update: Update, context: ContextTypes.DEFAULT_T
     message_chunks = split_long_message(formatted_reply)
     for i, chunk in enumerate(message_chunks):
         if i > 0:
-            await asyncio.sleep(1)
+            await tracer.sleep(1, "message_chunks")
         await context.bot.send_message(chat_id=user_id, text=chunk, parse_mode='Markdown')
     
     # Use progress manager instead of local file system
@@ -0,0 +1,166 @@
+"""
+Async LLM gateway for all Groq chat completions.
+
+Every AI call in the bot goes through the single `llm_gateway` instance below.
+It owns one pooled HTTP/2 connection to Groq, limits how many completions a
+process runs at the same time and applies a timeout to each call, so a slow
+completion for one player never blocks the event loop for everyone else.
+Calls are admitted by the rate limiter (see rate_limiter.py) according to
+their priority class, and every response's rate-limit headers are fed back to it.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from config import GROQ_API_KEY, LLM_DEFAULT_MODEL, LLM_MAX_CONCURRENCY, LLM_TIMEOUT_SECONDS, RATE_LIMIT_COMPLETION_ESTIMATE
+from rate_limiter import rate_limiter
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LLMResult:
+    """The text of a chat completion plus the bookkeeping callers may need."""
+    text: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency: float = 0.0
+
+
+# Classes that wait out a 429 and try once more instead of failing the player's request
+_RETRY_ON_RATE_LIMIT = ("interactive", "director")
+
+
+def estimate_request_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Tokens a call will use against the rate limit: the prompt (about four characters per token) plus the answer."""
+    return sum(len(message.get("content") or "") for message in messages) // 4 + RATE_LIMIT_COMPLETION_ESTIMATE
+
+
+class LLMGateway:
+    """Shared async client for chat completions with a per-process concurrency limit."""
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT_SECONDS):
+        self.client = None
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _get_client(self):
+        """Lazy initialization of the pooled HTTP/2 client."""
+        if self.client is None:
+            # Deferred import: the SDK is only loaded with the first completion (see startup.py)
+            from groq import AsyncGroq
+            http_client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+            )
+            self.client = AsyncGroq(api_key=GROQ_API_KEY, http_client=http_client, max_retries=1)
+        return self.client
+
+    async def _admit(self, model: str, messages: List[Dict[str, Any]], priority: str):
+        """Waits for rate-limit quota (before taking a concurrency slot, so waiting calls don't hold one)."""
+        with tracer.span("llm.admission", model=model):
+            await rate_limiter.acquire(model, estimate_request_tokens(messages), priority)
+
+    async def _create(self, **request):
+        """Creates an admitted completion and returns the parsed response (or stream), feeding its headers to the rate limiter."""
+        from groq import RateLimitError
+        model = request["model"]
+        try:
+            raw_response = await self._get_client().chat.completions.with_raw_response.create(**request)
+        except RateLimitError as e:
+            rate_limiter.update_from_headers(model, e.response.headers, throttled=True)
+            raise
+        rate_limiter.update_from_headers(model, raw_response.headers)
+        return await raw_response.parse()
+
+    @staticmethod
+    def _retries_after(error: Exception, attempt: int, priority: str) -> bool:
+        """Whether a call that failed with `error` is admitted again and retried (once, after a 429)."""
+        from groq import RateLimitError
+        return isinstance(error, RateLimitError) and not attempt and priority in _RETRY_ON_RATE_LIMIT
+
+    async def chat(self, messages: List[Dict[str, Any]], model: str = LLM_DEFAULT_MODEL,
+                   temperature: float = 0.7, timeout: Optional[float] = None,
+                   priority: str = "interactive") -> LLMResult:
+        """Runs one chat completion and returns its text. Raises on API errors, timeouts and RateLimitShed."""
+        for attempt in range(2):
+            # A retry gives its concurrency slot back while it waits for quota again
+            await self._admit(model, messages, priority)
+            async with self._semaphore:
+                started = time.monotonic()
+                try:
+                    completion = await self._create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        timeout=timeout or self.timeout,
+                    )
+                except Exception as e:
+                    if self._retries_after(e, attempt, priority):
+                        continue
+                    raise
+                latency = time.monotonic() - started
+            break
+
+        usage = completion.usage
+        return LLMResult(
+            text=completion.choices[0].message.content or "",
+            model=model,
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            latency=latency,
+        )
+
+    async def stream_chat(self, messages: List[Dict[str, Any]], model: str = LLM_DEFAULT_MODEL,
+                          temperature: float = 0.7, timeout: Optional[float] = None,
+                          priority: str = "interactive") -> AsyncIterator[str]:
+        """Runs one streamed chat completion and yields its text deltas. Raises on API errors, timeouts and RateLimitShed."""
+        for attempt in range(2):
+            # A retry gives its concurrency slot back while it waits for quota again
+            await self._admit(model, messages, priority)
+            async with self._semaphore:
+                try:
+                    stream = await self._create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        timeout=timeout or self.timeout,
+                        stream=True,
+                    )
+                except Exception as e:
+                    if self._retries_after(e, attempt, priority):
+                        continue
+                    raise
+                try:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            yield delta
+                finally:
+                    await stream.close()
+            return
+
+    async def aclose(self):
+        """Closes the pooled connection (called on server shutdown)."""
+        if self.client is not None:
+            try:
+                await self.client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close LLM gateway client cleanly: {e}")
+            self.client = None
+
+
+# Global instance
+llm_gateway = LLMGateway()
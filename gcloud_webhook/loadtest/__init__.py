@@ -0,0 +1,17 @@
+"""
+End-to-end load tests for the webhook.
+
+`python -m loadtest.run` (from gcloud_webhook/) boots `main.app` against local
+stand-ins for every external service and replays scripted player journeys:
+
+- fake_telegram: Bot API server that records sendMessage / editMessage* /
+  sendPhoto calls and keeps the inline keyboards so journeys can click them
+- fake_groq: chat completions endpoint with configurable latency and answer
+  length distributions (plain and streamed) and rate-limit headers
+- fake_gcs: in-memory subset of the Cloud Storage JSON API
+  (used through STORAGE_EMULATOR_HOST)
+- journeys: scripted player journeys (onboarding -> clues -> private talks ->
+  accusation)
+
+The report lists p50/p95/p99 latency per handler, throughput and memory use.
+"""
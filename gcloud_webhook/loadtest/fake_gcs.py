@@ -0,0 +1,171 @@
+"""
+In-memory fake of the Cloud Storage JSON API for load tests.
+
+Implements what the bot uses through google-cloud-storage: object metadata
+(exists), media download, multipart upload (with ifGenerationMatch), delete,
+list by prefix and compose. google-cloud-storage talks to it when
+STORAGE_EMULATOR_HOST=http://127.0.0.1:8083.
+
+Usage: python -m loadtest.fake_gcs --port 8083 [--latency 0.02]
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+
+class FakeGCS:
+    """Objects kept in memory as (content, metadata) per bucket and name."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.objects: Dict[Tuple[str, str], Tuple[bytes, dict]] = {}
+        self._generation = int(time.time() * 1000)
+
+    async def _delay(self, operation: str):
+        self.calls[operation] += 1
+        if self.latency:
+            await asyncio.sleep(random.expovariate(1 / self.latency))
+
+    def _store(self, bucket: str, name: str, content: bytes, content_type: str) -> dict:
+        self._generation += 1
+        metadata = {
+            "kind": "storage#object",
+            "id": f"{bucket}/{name}/{self._generation}",
+            "name": name,
+            "bucket": bucket,
+            "generation": str(self._generation),
+            "metageneration": "1",
+            "contentType": content_type,
+            "size": str(len(content)),
+            "md5Hash": base64.b64encode(hashlib.md5(content).digest()).decode(),
+            "updated": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        }
+        self.objects[(bucket, name)] = (content, metadata)
+        return metadata
+
+    @staticmethod
+    def _not_found():
+        return JSONResponse({"error": {"code": 404, "message": "No such object"}}, status_code=404)
+
+    @staticmethod
+    def _precondition_failed():
+        return JSONResponse({"error": {"code": 412, "message": "Precondition failed"}}, status_code=412)
+
+    async def get_object(self, request: Request):
+        bucket, name = request.path_params["bucket"], request.path_params["name"]
+        if name.endswith("/compose") and request.method == "POST":
+            return await self.compose(request, bucket, name[:-len("/compose")])
+        if request.method == "DELETE":
+            await self._delay("delete")
+            return Response(status_code=204) if self.objects.pop((bucket, name), None) else self._not_found()
+
+        stored = self.objects.get((bucket, name))
+        if request.query_params.get("alt") == "media":
+            await self._delay("download")
+            if stored is None:
+                return self._not_found()
+            content, metadata = stored
+            return Response(content, media_type=metadata["contentType"],
+                            headers={"x-goog-generation": metadata["generation"]})
+        await self._delay("metadata")
+        return JSONResponse(stored[1]) if stored else self._not_found()
+
+    async def download(self, request: Request):
+        return await self.get_object(request)
+
+    async def list_objects(self, request: Request):
+        await self._delay("list")
+        bucket = request.path_params["bucket"]
+        prefix = request.query_params.get("prefix", "")
+        items = [metadata for (object_bucket, name), (_, metadata) in sorted(self.objects.items())
+                 if object_bucket == bucket and name.startswith(prefix)]
+        return JSONResponse({"kind": "storage#objects", "items": items})
+
+    async def upload(self, request: Request):
+        await self._delay("upload")
+        bucket = request.path_params["bucket"]
+        body = await request.body()
+        content_type = request.headers.get("content-type", "")
+        name = request.query_params.get("name")
+        object_type = "application/octet-stream"
+
+        if request.query_params.get("uploadType") == "multipart":
+            # multipart/related: a JSON metadata part followed by the media part
+            boundary = content_type.split("boundary=", 1)[1].strip('"').encode()
+            parts = [part for part in body.split(b"--" + boundary) if part.strip() not in (b"", b"--")]
+            metadata_part, media_part = parts[0], parts[1]
+            metadata = json.loads(metadata_part.split(b"\r\n\r\n", 1)[1].strip())
+            media_headers, content = media_part.split(b"\r\n\r\n", 1)
+            content = content[:-2] if content.endswith(b"\r\n") else content
+            name = metadata.get("name", name)
+            object_type = metadata.get("contentType") or object_type
+            for header in media_headers.decode().split("\r\n"):
+                if header.lower().startswith("content-type:") and not metadata.get("contentType"):
+                    object_type = header.split(":", 1)[1].strip()
+        else:
+            content = body
+            object_type = content_type or object_type
+
+        generation_match = request.query_params.get("ifGenerationMatch")
+        if generation_match is not None:
+            existing = self.objects.get((bucket, name))
+            current = existing[1]["generation"] if existing else "0"
+            if generation_match != current:
+                return self._precondition_failed()
+        return JSONResponse(self._store(bucket, name, content, object_type))
+
+    async def compose(self, request: Request, bucket: str, destination: str):
+        await self._delay("compose")
+        body = await request.json()
+        sources = [self.objects.get((bucket, source["name"])) for source in body.get("sourceObjects", [])]
+        if any(source is None for source in sources):
+            return self._not_found()
+        content_type = body.get("destination", {}).get("contentType") or sources[0][1]["contentType"]
+        return JSONResponse(self._store(bucket, destination, b"".join(source[0] for source in sources), content_type))
+
+    async def get_bucket(self, request: Request):
+        await self._delay("bucket")
+        return JSONResponse({"kind": "storage#bucket", "name": request.path_params["bucket"], "id": request.path_params["bucket"]})
+
+    async def stats(self, request: Request):
+        return JSONResponse({"calls": dict(self.calls), "objects": len(self.objects),
+                             "bytes": sum(len(content) for content, _ in self.objects.values())})
+
+    async def health(self, request: Request):
+        return JSONResponse({"ok": True})
+
+
+def create_app(latency: float = 0.0) -> Starlette:
+    fake = FakeGCS(latency)
+    return Starlette(routes=[
+        Route("/_loadtest/health", fake.health),
+        Route("/_loadtest/stats", fake.stats),
+        Route("/upload/storage/v1/b/{bucket}/o", fake.upload, methods=["POST"]),
+        Route("/download/storage/v1/b/{bucket}/o/{name:path}", fake.download),
+        Route("/storage/v1/b/{bucket}/o", fake.list_objects),
+        Route("/storage/v1/b/{bucket}/o/{name:path}", fake.get_object, methods=["GET", "DELETE", "POST"]),
+        Route("/storage/v1/b/{bucket}", fake.get_bucket),
+    ])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8083)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean seconds per storage request")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency), host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,179 @@
+"""
+Fake Groq chat completions endpoint for load tests.
+
+Recognises which task a request belongs to (director, tutor, word spotter,
+history notes or character dialogue) and answers in that task's format. Each
+answer takes a lognormally distributed time (--latency-median/--latency-sigma)
+and has a lognormally distributed length (--tokens-median); streamed answers
+are spread over that time. Responses carry x-ratelimit-* headers for a
+per-model tokens-per-minute budget (--tpm), and with --enforce-limits a
+request beyond the budget gets a 429 like the real API.
+
+Usage: python -m loadtest.fake_groq --port 8082 [--latency-median 0.8]
+The bot talks to it when GROQ_BASE_URL=http://127.0.0.1:8082.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from collections import Counter, deque
+from typing import Dict, List
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+CHARACTER_KEYS = ["tim", "pauline", "fiona", "ronnie"]
+_WORDS = ("I was in the kitchen when the music stopped and someone shouted about the card game "
+          "nobody saw Alex after nine but the door to the hallway was open all evening").split()
+_TEXT_WORDS = re.compile(r"[A-Za-z]{6,}")
+
+
+class FakeGroq:
+    """Answers chat completions with task-shaped content after a simulated delay."""
+
+    def __init__(self, latency_median: float = 0.8, latency_sigma: float = 0.4, tokens_median: int = 60,
+                 tokens_per_minute: int = 300000, enforce_limits: bool = False):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.tokens_median = tokens_median
+        self.tokens_per_minute = tokens_per_minute
+        self.enforce_limits = enforce_limits
+        self.calls = Counter()
+        self.throttled = 0
+        # (time, tokens) of the last minute per model
+        self._usage: Dict[str, deque] = {}
+
+    def _latency(self) -> float:
+        return random.lognormvariate(math.log(self.latency_median), self.latency_sigma) if self.latency_median > 0 else 0.0
+
+    def _sentence_text(self, tokens: int) -> str:
+        words = [random.choice(_WORDS) for _ in range(max(3, int(tokens * 0.75)))]
+        text = ""
+        for index, word in enumerate(words):
+            text += (" " if index else "") + (word.capitalize() if not text or text.endswith(".") else word)
+            if index % 12 == 11:
+                text += "."
+        return text.rstrip(".") + "."
+
+    def _answer(self, messages: List[dict], tokens: int):
+        """(task, content) for a request."""
+        system = messages[0].get("content", "") if messages else ""
+        user = messages[-1].get("content", "") if messages else ""
+        if user.startswith('Context: "'):
+            speakers = random.sample(CHARACTER_KEYS, random.randint(1, 2))
+            scene = [{"action": "character_reply",
+                      "data": {"character_key": key, "trigger_message": "The detective asks about the evening. Answer in character."}}
+                     for key in speakers]
+            return "director", json.dumps({"scene": scene, "new_topic": "The evening"})
+        if user.startswith("Analyze this text:"):
+            improvement = random.random() < 0.3
+            return "tutor_analysis", json.dumps({"improvement_needed": improvement,
+                                                 "feedback": "Use the past simple here." if improvement else ""})
+        if user.startswith("Please explain the meaning of"):
+            return "tutor_explanation", json.dumps({"definition": self._sentence_text(20),
+                                                    "examples": [self._sentence_text(10)]})
+        if user.startswith("Generate final learning summary"):
+            return "tutor_summary", json.dumps({"summary": self._sentence_text(tokens)})
+        if "JSON array of strings" in system:
+            words = sorted(set(_TEXT_WORDS.findall(user)), key=len, reverse=True)[:3]
+            return "word_spotter", json.dumps(words)
+        if system.startswith("You keep notes"):
+            return "history_summary", self._sentence_text(tokens)
+        return "dialogue", self._sentence_text(tokens)
+
+    def _rate_limit(self, model: str, tokens: int):
+        """(allowed, headers) for a request of `tokens` against the model's per-minute budget."""
+        now = time.monotonic()
+        usage = self._usage.setdefault(model, deque())
+        while usage and now - usage[0][0] > 60:
+            usage.popleft()
+        used = sum(entry[1] for entry in usage)
+        allowed = not self.enforce_limits or used + tokens <= self.tokens_per_minute
+        if allowed:
+            usage.append((now, tokens))
+            used += tokens
+        reset = 60 - (now - usage[0][0]) if usage else 0.0
+        headers = {
+            "x-ratelimit-limit-tokens": str(self.tokens_per_minute),
+            "x-ratelimit-remaining-tokens": str(max(0, self.tokens_per_minute - used)),
+            "x-ratelimit-reset-tokens": f"{reset:.2f}s",
+            "x-ratelimit-limit-requests": "1000000",
+            "x-ratelimit-remaining-requests": "999999",
+        }
+        if not allowed:
+            headers["retry-after"] = str(max(1, math.ceil(reset)))
+        return allowed, headers
+
+    async def completions(self, request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "unknown")
+        completion_tokens = max(5, int(random.lognormvariate(math.log(self.tokens_median), 0.5)))
+        task, content = self._answer(messages, completion_tokens)
+        prompt_tokens = sum(len(message.get("content") or "") for message in messages) // 4
+        self.calls[task] += 1
+
+        allowed, headers = self._rate_limit(model, prompt_tokens + completion_tokens)
+        if not allowed:
+            self.throttled += 1
+            return JSONResponse({"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+                                status_code=429, headers=headers)
+
+        latency = self._latency()
+        if body.get("stream"):
+            return StreamingResponse(self._stream(model, content, latency), media_type="text/event-stream", headers=headers)
+
+        await asyncio.sleep(latency)
+        return JSONResponse({
+            "id": f"chatcmpl-{random.getrandbits(48):x}", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }, headers=headers)
+
+    async def _stream(self, model: str, content: str, latency: float):
+        # About a fifth of the time passes before the first token, the rest is spread over the words
+        pieces = re.findall(r"\S+\s*", content)
+        await asyncio.sleep(latency * 0.2)
+        for piece in pieces:
+            chunk = {"id": "chatcmpl-stream", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(latency * 0.8 / max(1, len(pieces)))
+        yield "data: [DONE]\n\n"
+
+    async def stats(self, request: Request):
+        return JSONResponse({"calls": dict(self.calls), "throttled": self.throttled})
+
+    async def health(self, request: Request):
+        return JSONResponse({"ok": True})
+
+
+def create_app(**options) -> Starlette:
+    fake = FakeGroq(**options)
+    return Starlette(routes=[
+        Route("/_loadtest/health", fake.health),
+        Route("/_loadtest/stats", fake.stats),
+        Route("/openai/v1/chat/completions", fake.completions, methods=["POST"]),
+    ])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--latency-median", type=float, default=0.8, help="median seconds per completion")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="lognormal sigma of the completion time")
+    parser.add_argument("--tokens-median", type=int, default=60, help="median completion length in tokens")
+    parser.add_argument("--tpm", type=int, default=300000, help="tokens per minute per model")
+    parser.add_argument("--enforce-limits", action="store_true", help="answer 429 beyond the per-minute budget")
+    args = parser.parse_args()
+    app = create_app(latency_median=args.latency_median, latency_sigma=args.latency_sigma, tokens_median=args.tokens_median,
+                     tokens_per_minute=args.tpm, enforce_limits=args.enforce_limits)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
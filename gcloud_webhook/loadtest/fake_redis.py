@@ -0,0 +1,130 @@
+"""
+Minimal Redis-compatible (RESP2) server for load tests.
+
+Implements what RedisBackend (session_backend.py) and redis-py's connection
+setup use: PING, SELECT, CLIENT, GET, MGET, SET (with EX/PX), DEL, EXISTS,
+FLUSHALL, DBSIZE and INFO (command counts and key count). Keys expire
+lazily on access.
+
+Usage: python -m loadtest.fake_redis --port 6390 [--latency 0.001]
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+
+class FakeRedis:
+    """Values kept in memory as (value, expires_at or 0) per key."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.values: Dict[bytes, Tuple[bytes, float]] = {}
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        item = self.values.get(key)
+        if item is None:
+            return None
+        if item[1] and item[1] <= time.monotonic():
+            del self.values[key]
+            return None
+        return item[0]
+
+    def execute(self, command: List[bytes]):
+        """Returns the reply of one command (bytes/str for strings, int, list, None or an Exception)."""
+        name = command[0].upper().decode()
+        args = command[1:]
+        self.calls[name] += 1
+        if name == "PING":
+            return "PONG"
+        if name in ("SELECT", "CLIENT"):
+            return "OK"
+        if name == "GET":
+            return self._get(args[0])
+        if name == "MGET":
+            return [self._get(key) for key in args]
+        if name == "SET":
+            expires_at = 0.0
+            options = [option.upper() for option in args[2:]]
+            if b"EX" in options:
+                expires_at = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+            elif b"PX" in options:
+                expires_at = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+            self.values[args[0]] = (args[1], expires_at)
+            return "OK"
+        if name == "DEL":
+            return sum(self.values.pop(key, None) is not None for key in args)
+        if name == "EXISTS":
+            return sum(self._get(key) is not None for key in args)
+        if name == "FLUSHALL":
+            self.values.clear()
+            return "OK"
+        if name == "DBSIZE":
+            return len(self.values)
+        if name == "INFO":
+            lines = [f"keys:{len(self.values)}"] + [f"calls_{command}:{count}" for command, count in sorted(self.calls.items())]
+            return "\r\n".join(lines).encode()
+        return ValueError(f"unknown command '{name}'")
+
+
+def _encode(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return f"-ERR {reply}\r\n".encode()
+    if isinstance(reply, str):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(_encode(item) for item in reply)
+
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command (e.g. typed into telnet)
+        return line.strip().split()
+    command = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        command.append((await reader.readexactly(length + 2))[:-2])
+    return command
+
+
+def make_handler(redis: FakeRedis):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                command = await _read_command(reader)
+                if command is None:
+                    break
+                if redis.latency:
+                    await asyncio.sleep(redis.latency)
+                writer.write(_encode(redis.execute(command)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+
+async def serve(port: int, latency: float):
+    server = await asyncio.start_server(make_handler(FakeRedis(latency)), "127.0.0.1", port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every command")
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.latency))
@@ -0,0 +1,161 @@
+"""
+Fake Telegram Bot API server for load tests.
+
+Answers every Bot API method the bot uses with a plausible result, counts the
+calls per method and remembers each chat's messages with their inline
+keyboards. Journeys "click" a button through GET /_loadtest/button, which
+returns the newest message of a chat carrying a button whose callback_data
+starts with a prefix.
+
+Usage: python -m loadtest.fake_telegram --port 8081 [--latency 0.05]
+The bot talks to it when TELEGRAM_API_BASE_URL=http://127.0.0.1:8081.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from email import policy
+from email.parser import BytesParser
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+BOT_USER = {"id": 100000001, "is_bot": True, "first_name": "Glossa Load Test", "username": "glossa_loadtest_bot"}
+
+# Methods whose result is the sent or edited message
+MESSAGE_METHODS = {
+    "sendMessage", "sendPhoto", "sendDocument", "sendAudio", "sendVoice", "sendVideo", "sendAnimation",
+    "editMessageText", "editMessageCaption", "editMessageReplyMarkup", "editMessageMedia",
+}
+
+
+class FakeTelegram:
+    """State of the fake Bot API: messages per chat and call counters."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.chats: Dict[int, Dict[int, dict]] = {}
+        self._next_message_id = 1
+
+    async def _params(self, request: Request) -> Dict[str, Any]:
+        content_type = request.headers.get("content-type", "")
+        body = await request.body()
+        if "application/json" in content_type:
+            return json.loads(body or b"{}")
+        params = {}
+        if content_type.startswith("multipart/form-data"):
+            # Parsed with the standard library (Starlette's form parser needs python-multipart)
+            message = BytesParser(policy=policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+            for part in message.iter_parts():
+                key = part.get_param("name", header="content-disposition")
+                if part.get_filename():
+                    params[key] = f"uploaded:{part.get_filename()}"
+                else:
+                    params[key] = part.get_payload(decode=True).decode("utf-8")
+        else:
+            params = dict(parse_qsl(body.decode("utf-8")))
+        # PTB sends nested objects (reply_markup, entities...) as JSON strings
+        for key in ("reply_markup", "entities", "caption_entities", "link_preview_options", "reply_parameters"):
+            if isinstance(params.get(key), str):
+                try:
+                    params[key] = json.loads(params[key])
+                except ValueError:
+                    pass
+        return params
+
+    def _message(self, chat_id: int, message_id: Optional[int], params: Dict[str, Any], method: str) -> dict:
+        chat = self.chats.setdefault(chat_id, {})
+        if method.startswith("send") or message_id not in chat:
+            if method.startswith("send"):
+                message_id = self._next_message_id
+                self._next_message_id += 1
+            chat[message_id] = {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private", "first_name": "Player"},
+                "from": BOT_USER,
+            }
+        message = chat[message_id]
+
+        if "text" in params:
+            message["text"] = params["text"]
+        if "caption" in params:
+            message["caption"] = params["caption"]
+        if method == "sendPhoto":
+            photo = str(params.get("photo", ""))
+            file_id = f"photo-{message_id}" if photo.startswith("uploaded:") else photo
+            message["photo"] = [{"file_id": file_id, "file_unique_id": f"u{message_id}", "width": 800, "height": 600}]
+        # Like Telegram, sending or editing without reply_markup leaves no inline keyboard
+        markup = params.get("reply_markup")
+        if isinstance(markup, dict) and "inline_keyboard" in markup:
+            message["reply_markup"] = markup
+        else:
+            message.pop("reply_markup", None)
+        return message
+
+    async def handle(self, request: Request):
+        method = request.path_params["method"]
+        params = await self._params(request)
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(random.expovariate(1 / self.latency))
+
+        if method == "getMe":
+            return self._ok(BOT_USER)
+        if method in MESSAGE_METHODS:
+            chat_id = int(params.get("chat_id", 0))
+            message_id = params.get("message_id")
+            return self._ok(self._message(chat_id, int(message_id) if message_id else None, params, method))
+        if method == "deleteMessage":
+            self.chats.get(int(params.get("chat_id", 0)), {}).pop(int(params.get("message_id", 0)), None)
+        return self._ok(True)
+
+    @staticmethod
+    def _ok(result):
+        return JSONResponse({"ok": True, "result": result})
+
+    async def button(self, request: Request):
+        """Newest message of a chat with a button whose callback_data starts with `prefix`."""
+        chat_id = int(request.query_params["chat_id"])
+        prefix = request.query_params.get("prefix", "")
+        for message in reversed(list(self.chats.get(chat_id, {}).values())):
+            for row in message.get("reply_markup", {}).get("inline_keyboard", []):
+                for button in row:
+                    if button.get("callback_data", "").startswith(prefix):
+                        return JSONResponse({"message": message, "callback_data": button["callback_data"]})
+        return JSONResponse({"error": "no such button"}, status_code=404)
+
+    async def stats(self, request: Request):
+        return JSONResponse({"calls": dict(self.calls), "chats": len(self.chats),
+                             "messages": sum(len(messages) for messages in self.chats.values())})
+
+    async def health(self, request: Request):
+        return JSONResponse({"ok": True})
+
+
+def create_app(latency: float = 0.0) -> Starlette:
+    fake = FakeTelegram(latency)
+    return Starlette(routes=[
+        Route("/_loadtest/health", fake.health),
+        Route("/_loadtest/button", fake.button),
+        Route("/_loadtest/stats", fake.stats),
+        Route("/bot{token}/{method}", fake.handle, methods=["GET", "POST"]),
+    ])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean seconds per Bot API call")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency), host="127.0.0.1", port=args.port, log_level="warning")
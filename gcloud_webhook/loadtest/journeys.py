@@ -0,0 +1,97 @@
+"""
+Scripted player journeys for the load test.
+
+A journey is a list of steps a simulated player performs in order: send a
+command or a text message, or click the newest inline button whose
+callback_data starts with a prefix (as the fake Telegram server has it).
+Optional steps are skipped when the button is not there (e.g. the accusation
+warning only appears for players who have not seen enough).
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+
+@dataclass(frozen=True)
+class Step:
+    kind: str  # "command", "text" or "click"
+    value: str  # command/text to send, or callback_data prefix to click
+    optional: bool = False
+
+    @property
+    def label(self) -> str:
+        """Handler name the step's latency is reported under."""
+        if self.kind == "command":
+            return f"command {self.value.split()[0]}"
+        if self.kind == "click":
+            return f"button {self.value.split('__')[0]}"
+        return "text message"
+
+
+def command(value: str) -> Step:
+    return Step("command", value)
+
+
+def text(value: str) -> Step:
+    return Step("text", value)
+
+
+def click(prefix: str, optional: bool = False) -> Step:
+    return Step("click", prefix, optional)
+
+
+GAME_MENU = "🔍 Game Menu"
+
+ONBOARDING = [
+    command("/start"),
+    click("onboarding__step2"),
+    click("onboarding__step4"),
+    text("TEST"),
+    click("onboarding__step5"),
+    click("language__perfect"),
+    click("case_intro__begin"),
+    click("case_intro__situation"),
+    click("case_intro__suspects"),
+    click("case_intro__how_to_play"),
+]
+
+CLUES = [
+    step
+    for clue_id in range(1, 5)
+    for step in (text(GAME_MENU), click("menu__evidence"), click(f"clue__{clue_id}"))
+]
+
+PUBLIC_TALK = [
+    text("Hello everyone, I am the detective. Where were you at nine o'clock?"),
+    text("Who was the last person to see Alex?"),
+    click("explain__init"),
+    click("explain__all"),
+]
+
+PRIVATE_TALKS = [
+    step
+    for character in ("tim", "fiona")
+    for step in (
+        text(GAME_MENU), click("menu__talk"), click(f"talk__{character}"),
+        text("What did you do after the card game?"),
+        text("Did you hear anything strange that night?"),
+    )
+] + [text(GAME_MENU), click("menu__talk"), click("mode__public")]
+
+ACCUSATION = [
+    text(GAME_MENU),
+    click("accuse__init"),
+    click("accuse__force", optional=True),
+    click("accuse__confirm__tim"),
+    click("reveal_custom__start", optional=True),
+    click("final__report", optional=True),
+]
+
+JOURNEYS: Dict[str, List[Step]] = {
+    # The whole game: onboarding -> clues -> public and private talks -> accusation
+    "full_game": ONBOARDING + CLUES + PUBLIC_TALK + PRIVATE_TALKS + ACCUSATION,
+    # A player who mostly chats with the suspects (LLM-heavy)
+    "talker": ONBOARDING + PUBLIC_TALK + PRIVATE_TALKS + PUBLIC_TALK,
+    # Onboarding only (no LLM calls): measures the bot's own overhead
+    "onboarding": ONBOARDING,
+}
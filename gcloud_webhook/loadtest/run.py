@@ -0,0 +1,406 @@
+"""
+Runs a load test of the webhook against local fake services.
+
+Starts fake Telegram, Groq and Cloud Storage servers (and, with
+--session-backend redis, a fake Redis) as subprocesses, boots
+`main.app` in this process (pointed at the fakes through environment
+variables), then lets --players simulated players walk a scripted journey,
+at most --concurrency at a time. Every step posts an update to the webhook
+and waits until the update queue has handled it, so the measured latency is
+what a player sees. Prints p50/p95/p99 per handler, throughput and memory.
+--instance-hop drops a player's in-process sessions after every step, as if
+the next update landed on another instance, to check the shared session
+backend.
+
+Usage (from gcloud_webhook/):
+    python -m loadtest.run --players 200 --concurrency 50 --journey full_game
+    python -m loadtest.run --players 50 --groq-latency 1.5 --json report.json
+    python -m loadtest.run --players 20 --session-backend redis --instance-hop
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from loadtest.journeys import JOURNEYS, Step
+
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOADTEST_TOKEN = "123456789:LOADTEST-token"
+# Simulated players get ids from here upwards
+FIRST_USER_ID = 900000000
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _rss_bytes() -> int:
+    """Current resident memory of this process."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class FakeServices:
+    """The fake Telegram, Groq and GCS servers (and Redis), each in its own process."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.ports = {"telegram": _free_port(), "groq": _free_port(), "gcs": _free_port()}
+        self.redis_port = _free_port() if args.session_backend == "redis" else None
+        self.processes: List[subprocess.Popen] = []
+
+    def url(self, service: str) -> str:
+        return f"http://127.0.0.1:{self.ports[service]}"
+
+    async def start(self):
+        commands = {
+            "telegram": ["--latency", str(self.args.telegram_latency)],
+            "groq": ["--latency-median", str(self.args.groq_latency), "--latency-sigma", str(self.args.groq_sigma),
+                     "--tokens-median", str(self.args.groq_tokens), "--tpm", str(self.args.groq_tpm)]
+                    + (["--enforce-limits"] if self.args.groq_enforce_limits else []),
+            "gcs": ["--latency", str(self.args.gcs_latency)],
+        }
+        for service, options in commands.items():
+            self.processes.append(subprocess.Popen(
+                [sys.executable, "-m", f"loadtest.fake_{service}", "--port", str(self.ports[service]), *options],
+                cwd=_BASE_DIR,
+            ))
+        async with httpx.AsyncClient() as client:
+            for service in self.ports:
+                for _ in range(100):
+                    try:
+                        await client.get(f"{self.url(service)}/_loadtest/health")
+                        break
+                    except httpx.TransportError:
+                        await asyncio.sleep(0.1)
+                else:
+                    raise RuntimeError(f"Fake {service} server did not start")
+        if self.redis_port:
+            await self._start_redis()
+
+    async def _start_redis(self):
+        self.processes.append(subprocess.Popen(
+            [sys.executable, "-m", "loadtest.fake_redis", "--port", str(self.redis_port)], cwd=_BASE_DIR))
+        for _ in range(100):
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", self.redis_port)
+                writer.close()
+                return
+            except OSError:
+                await asyncio.sleep(0.1)
+        raise RuntimeError("Fake redis server did not start")
+
+    def configure_environment(self):
+        """Points the bot at the fakes; must run before config is imported."""
+        os.environ.update({
+            "TELEGRAM_TOKEN": LOADTEST_TOKEN,
+            "GROQ_API_KEY": "loadtest",
+            "GCS_BUCKET_NAME": "loadtest",
+            "GOOGLE_CLOUD_PROJECT": "loadtest",
+            "SECRET_MANAGER_ENABLED": "false",
+            "TELEGRAM_API_BASE_URL": self.url("telegram"),
+            "GROQ_BASE_URL": self.url("groq"),
+            "STORAGE_EMULATOR_HOST": self.url("gcs"),
+            "SESSION_BACKEND": self.args.session_backend,
+        })
+        if self.redis_port:
+            os.environ["REDIS_URL"] = f"redis://127.0.0.1:{self.redis_port}/0"
+
+    async def stats(self) -> dict:
+        async with httpx.AsyncClient() as client:
+            return {service: (await client.get(f"{self.url(service)}/_loadtest/stats")).json() for service in self.ports}
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class LoadTest:
+    """Drives simulated players through the webhook and collects latencies."""
+
+    def __init__(self, args: argparse.Namespace, services: FakeServices):
+        self.args = args
+        self.services = services
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.completed_journeys = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_update_id = 1
+        self._next_message_id = 10_000_000
+        self._memory_samples: List[int] = []
+
+    def _on_update_handled(self, update, seconds: float, failed: bool):
+        future = self._pending.pop(update.update_id, None)
+        if future is not None and not future.done():
+            future.set_result(failed)
+
+    def _user(self, user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": "Player", "language_code": "en"}
+
+    async def _build_update(self, client: httpx.AsyncClient, user_id: int, step: Step) -> Optional[dict]:
+        update = {"update_id": self._next_update_id}
+        self._next_update_id += 1
+        if step.kind == "click":
+            response = await client.get(f"{self.services.url('telegram')}/_loadtest/button",
+                                        params={"chat_id": user_id, "prefix": step.value})
+            if response.status_code == 404:
+                return None
+            button = response.json()
+            update["callback_query"] = {
+                "id": str(update["update_id"]), "from": self._user(user_id), "chat_instance": str(user_id),
+                "message": button["message"], "data": button["callback_data"],
+            }
+            return update
+
+        self._next_message_id += 1
+        message = {
+            "message_id": self._next_message_id, "date": int(time.time()), "from": self._user(user_id),
+            "chat": {"id": user_id, "type": "private", "first_name": "Player"}, "text": step.value,
+        }
+        if step.kind == "command":
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(step.value.split()[0])}]
+        update["message"] = message
+        return update
+
+    async def _run_step(self, client: httpx.AsyncClient, webhook_url: str, user_id: int, step: Step) -> bool:
+        update = await self._build_update(client, user_id, step)
+        if update is None:
+            if not step.optional:
+                self.errors[f"{step.label}: button missing"] += 1
+            return step.optional
+
+        handled = asyncio.get_running_loop().create_future()
+        self._pending[update["update_id"]] = handled
+        started = time.monotonic()
+        try:
+            response = await client.post(webhook_url, json=update)
+        except httpx.TransportError as e:
+            self._pending.pop(update["update_id"], None)
+            self.errors[f"{step.label}: {type(e).__name__}"] += 1
+            return False
+        if response.status_code != 200:
+            self._pending.pop(update["update_id"], None)
+            self.errors[f"{step.label}: HTTP {response.status_code}"] += 1
+            return False
+        try:
+            failed = await asyncio.wait_for(handled, self.args.step_timeout)
+        except asyncio.TimeoutError:
+            self._pending.pop(update["update_id"], None)
+            self.errors[f"{step.label}: timeout"] += 1
+            return False
+        self.latencies[step.label].append(time.monotonic() - started)
+        if failed:
+            self.errors[f"{step.label}: handler failed"] += 1
+        return True
+
+    def _hop_instance(self, user_id: int):
+        """Forgets the player's in-process sessions, as if their next update reached a fresh instance."""
+        from config import GAME_STATE, user_histories, message_cache
+        GAME_STATE.clear_local([user_id])
+        user_histories.clear_local([str(user_id)])
+        # Message ids are not per player; cached messages are immutable, so dropping them all is safe
+        message_cache.clear_local()
+
+    async def _player(self, client: httpx.AsyncClient, webhook_url: str, user_id: int, journey: List[Step],
+                      slots: asyncio.Semaphore):
+        async with slots:
+            for step in journey:
+                if not await self._run_step(client, webhook_url, user_id, step):
+                    return
+                if self.args.instance_hop:
+                    self._hop_instance(user_id)
+                if self.args.think_time:
+                    await asyncio.sleep(random.expovariate(1 / self.args.think_time))
+            self.completed_journeys += 1
+
+    async def _sample_memory(self):
+        while True:
+            self._memory_samples.append(_rss_bytes())
+            await asyncio.sleep(0.5)
+
+    async def run(self, webhook_url: str) -> float:
+        from update_queue import update_queue  # Imported after the environment points at the fakes
+        update_queue.add_observer(self._on_update_handled)
+
+        journey = JOURNEYS[self.args.journey]
+        slots = asyncio.Semaphore(self.args.concurrency)
+        sampler = asyncio.create_task(self._sample_memory())
+        limits = httpx.Limits(max_connections=self.args.concurrency * 2, max_keepalive_connections=self.args.concurrency * 2)
+        started = time.monotonic()
+        try:
+            async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+                players = []
+                for index in range(self.args.players):
+                    players.append(asyncio.create_task(
+                        self._player(client, webhook_url, FIRST_USER_ID + index, journey, slots)))
+                    if self.args.ramp_up:
+                        await asyncio.sleep(self.args.ramp_up / self.args.players)
+                await asyncio.gather(*players)
+        finally:
+            sampler.cancel()
+        return time.monotonic() - started
+
+    def report(self, duration: float, service_stats: dict, memory_before: int) -> dict:
+        from config import GAME_STATE, user_histories, message_cache
+        from model_router import model_router
+        from rate_limiter import rate_limiter
+        from update_queue import update_queue
+        from startup import startup_timer
+        from session_store import all_store_metrics
+
+        handlers = {}
+        for label, values in sorted(self.latencies.items()):
+            values.sort()
+            handlers[label] = {
+                "count": len(values),
+                "p50": _percentile(values, 0.50), "p95": _percentile(values, 0.95),
+                "p99": _percentile(values, 0.99), "max": values[-1],
+            }
+        steps = sum(len(values) for values in self.latencies.values())
+        return {
+            "journey": self.args.journey, "players": self.args.players, "concurrency": self.args.concurrency,
+            "session_backend": self.args.session_backend, "instance_hop": self.args.instance_hop,
+            "duration_seconds": duration,
+            "completed_journeys": self.completed_journeys,
+            "throughput_updates_per_second": steps / duration if duration else 0.0,
+            "handlers": handlers,
+            "errors": dict(self.errors),
+            "memory": {
+                "rss_before_mb": memory_before / 2**20,
+                "rss_peak_mb": max(self._memory_samples, default=memory_before) / 2**20,
+                "rss_after_mb": _rss_bytes() / 2**20,
+                "sessions": {"game_state": len(GAME_STATE), "user_histories": len(user_histories),
+                             "message_cache": len(message_cache)},
+            },
+            "update_queue": update_queue.metrics(),
+            "llm_routes": model_router.metrics(),
+            "rate_limiter": rate_limiter.metrics(),
+            "fake_services": service_stats,
+            "cold_start": startup_timer.metrics(),
+            "session_stores": all_store_metrics(),
+        }
+
+
+def print_report(report: dict):
+    print(f"\n=== Load test: {report['players']} players x '{report['journey']}' journey, "
+          f"concurrency {report['concurrency']} ===")
+    print(f"Duration {report['duration_seconds']:.1f}s, {report['completed_journeys']} journeys completed, "
+          f"{report['throughput_updates_per_second']:.1f} updates/s")
+    print(f"\n{'handler':<28}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for label, stats in report["handlers"].items():
+        print(f"{label:<28}{stats['count']:>7}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}{stats['max']:>9.3f}")
+    memory = report["memory"]
+    print(f"\nMemory: RSS {memory['rss_before_mb']:.0f} MB before, {memory['rss_peak_mb']:.0f} MB peak, "
+          f"{memory['rss_after_mb']:.0f} MB after; sessions {memory['sessions']}")
+    cold_start = report["cold_start"]
+    if cold_start["ready_seconds"] is not None:
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in cold_start["phases"].items())
+        print(f"Cold start: ready after {cold_start['ready_seconds']:.2f}s ({phases})")
+    if report["session_backend"] != "local":
+        for store in report["session_stores"]:
+            print(f"Session store {store['name']}: {store['hits']} hits, {store['misses']} misses, "
+                  f"{store['backend_reads']} backend reads, {store['backend_writes']} writes, "
+                  f"{store['backend_errors']} errors")
+    print(f"Fake Groq calls: {report['fake_services']['groq']['calls']} (throttled {report['fake_services']['groq']['throttled']})")
+    print(f"Fake Telegram calls: {report['fake_services']['telegram']['calls']}")
+    shed = {key[len("shed_"):]: count for key, count in report["rate_limiter"].items() if key.startswith("shed_") and count}
+    if shed:
+        print(f"LLM calls shed by the rate limiter: {shed}")
+    if report["errors"]:
+        print(f"Errors: {report['errors']}")
+
+
+async def main(args: argparse.Namespace) -> dict:
+    services = FakeServices(args)
+    await services.start()
+    services.configure_environment()
+    try:
+        sys.path.insert(0, _BASE_DIR)
+        import uvicorn
+        import main as bot_main  # Reads the configuration above
+
+        logging.getLogger().setLevel(args.log_level)
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(bot_main.app, host="127.0.0.1", port=port, log_level="warning"))
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            if server_task.done():
+                raise RuntimeError("The bot failed to start (see the log above)")
+            await asyncio.sleep(0.05)
+
+        load_test = LoadTest(args, services)
+        memory_before = _rss_bytes()
+        # The handlers print a lot of debug output; keep it out of the report unless asked for
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            duration = await load_test.run(f"http://127.0.0.1:{port}/{LOADTEST_TOKEN}")
+        report = load_test.report(duration, await services.stats(), memory_before)
+
+        server.should_exit = True
+        await server_task
+        return report
+    finally:
+        services.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=50, help="number of simulated players")
+    parser.add_argument("--concurrency", type=int, default=20, help="players active at the same time")
+    parser.add_argument("--journey", choices=sorted(JOURNEYS), default="full_game")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds a player pauses between steps")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds over which players start")
+    parser.add_argument("--step-timeout", type=float, default=120.0, help="seconds before a step counts as timed out")
+    parser.add_argument("--groq-latency", type=float, default=0.8, help="median seconds per completion")
+    parser.add_argument("--groq-sigma", type=float, default=0.4, help="lognormal sigma of the completion time")
+    parser.add_argument("--groq-tokens", type=int, default=60, help="median completion length in tokens")
+    parser.add_argument("--groq-tpm", type=int, default=300000, help="fake tokens-per-minute limit per model")
+    parser.add_argument("--groq-enforce-limits", action="store_true", help="fake Groq answers 429 beyond --groq-tpm")
+    parser.add_argument("--telegram-latency", type=float, default=0.05, help="mean seconds per Bot API call")
+    parser.add_argument("--gcs-latency", type=float, default=0.02, help="mean seconds per storage request")
+    parser.add_argument("--session-backend", choices=("local", "memory", "redis"), default="local",
+                        help="SESSION_BACKEND of the bot (redis starts a fake Redis server)")
+    parser.add_argument("--instance-hop", action="store_true",
+                        help="drop each player's in-process sessions after every step (simulates other instances)")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own output")
+    parser.add_argument("--json", help="also write the full report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=1)
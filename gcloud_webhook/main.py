@@ -1,4 +1,6 @@
 # main.py
+# Первым импортом: отсчёт холодного старта начинается здесь
+from startup import startup_timer, preload_modules
 import asyncio
 import json # Добавляем импорт json для логгирования
 from starlette.applications import Starlette
@@ -14,10 +16,20 @@ from telegram.ext import (
 )
 import logging
 import uvicorn
-import traceback # Добавляем импорт traceback
 
-from config import TELEGRAM_TOKEN
+from config import TELEGRAM_TOKEN, TELEGRAM_API_BASE_URL, METRICS_AUTH_TOKEN, session_backend
+from session_store import flush_sessions
 from privacy_config import sanitize_log_data
+from llm_gateway import llm_gateway
+from chat_log_writer import chat_log_writer
+from game_state_manager import game_state_manager
+from word_index import word_index
+from prompt_table import prompt_table
+from update_queue import update_queue
+from update_dedup import update_dedup
+from telegram_request import TelegramRequest
+from tracing import tracer
+from metrics import registry
 from handlers import (
     start_command_handler,
     restart_command_handler,
@@ -28,6 +40,7 @@ from handlers import (
     button_callback_handler,
     handle_message,
 )
+startup_timer.checkpoint("imports")
 
 # Настраиваем логирование
 logging.basicConfig(
@@ -48,8 +61,14 @@ async def startup_event():
     global ptb_app
     if ptb_app is None:
         logger.info("Server startup: Initializing Telegram Bot Application...")
+        startup_timer.checkpoint("server start")
         
-        ptb_app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+        # Свой транспорт запросов к Bot API: каждый вызов попадает в трассировку
+        builder = ApplicationBuilder().token(TELEGRAM_TOKEN).request(TelegramRequest(connection_pool_size=256))
+        if TELEGRAM_API_BASE_URL:
+            # Другой сервер Bot API (например, заглушка для нагрузочных тестов)
+            builder = builder.base_url(f"{TELEGRAM_API_BASE_URL}/bot").base_file_url(f"{TELEGRAM_API_BASE_URL}/file/bot")
+        ptb_app = builder.build()
 
         ptb_app.add_handler(CommandHandler("start", start_command_handler))
         ptb_app.add_handler(CommandHandler("restart", restart_command_handler))
@@ -64,46 +83,104 @@ async def startup_event():
         ptb_app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
         
         await ptb_app.initialize()
+        chat_log_writer.start()
+        update_queue.start(ptb_app.process_update)
+        startup_timer.checkpoint("bot initialize")
+        # Собираем промпты персонажей для всех уровней заранее
+        prompt_table.build()
+        startup_timer.checkpoint("prompt table")
+        # Предвычисленные объяснения для статических текстов (файла может не быть)
+        word_index.load()
+        startup_timer.checkpoint("word index")
         
         logger.info("Bot application initialized successfully on startup.")
+        startup_timer.mark_ready()
+        # Тяжёлые SDK (GCS, Groq) подгружаем в фоне, чтобы не платить за них в первом запросе
+        asyncio.get_running_loop().run_in_executor(None, preload_modules)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Закрывает общие соединения при остановке сервера.
+    """
+    await update_queue.drain()
+    await game_state_manager.flush_all()
+    await chat_log_writer.stop()
+    await llm_gateway.aclose()
+    await flush_sessions()
+    if session_backend:
+        await session_backend.aclose()
+    tracer.flush()
 
 @app.route('/_ah/start')
 async def health_check(request: Request):
     """Отвечает на проверку готовности от Google App Engine."""
     return PlainTextResponse('OK')
 
+@app.route('/_ah/stop')
+async def instance_stop(request: Request):
+    """Сохраняет отложенные состояния игр перед остановкой инстанса App Engine."""
+    await update_queue.drain()
+    await game_state_manager.flush_all()
+    await chat_log_writer.flush()
+    await flush_sessions()
+    tracer.flush()
+    return PlainTextResponse('OK')
+
+@app.route('/metrics')
+async def metrics_endpoint(request: Request):
+    """Отдаёт метрики бота в текстовом формате Prometheus."""
+    if METRICS_AUTH_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_AUTH_TOKEN}":
+        return PlainTextResponse('unauthorized', status_code=401)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.route(f"/{TELEGRAM_TOKEN}", methods=['POST'])
 async def webhook(request: Request):
-    """Принимает обновления от Telegram и обрабатывает их."""
+    """Принимает обновления от Telegram и ставит их в очередь на обработку."""
     if ptb_app is None:
         logger.error("FATAL: Bot application is not initialized. Webhook cannot process update.")
         return PlainTextResponse('error: bot not initialized', status_code=500)
 
     try:
-        update_data = await request.json()
-        
-        # Log only essential info without personal data
-        sanitized_data = sanitize_log_data(update_data)
-        
-        if 'message' in sanitized_data:
-            user_id = sanitized_data.get('user_id', 'unknown')
-            message_type = 'text' if 'text' in sanitized_data['message'] else 'other'
-            logger.info(f"Received {message_type} message from user {user_id}")
-        elif 'callback_query' in sanitized_data:
-            user_id = sanitized_data.get('user_id', 'unknown')
-            logger.info(f"Received callback query from user {user_id}")
-        else:
-            logger.info("Received update (type not recognized)")
-        
-        update = Update.de_json(update_data, ptb_app.bot)
-        
-        # --- ГЛАВНОЕ ИЗМЕНЕНИЕ: ЛОВИМ ОШИБКУ ЗДЕСЬ ---
-        try:
-            await ptb_app.process_update(update)
-        except Exception:
-            # Выводим в лог полную, детальную трассировку ошибки
-            logger.error("!!! CAUGHT EXCEPTION in process_update !!!")
-            logger.error(traceback.format_exc())
+        # Корневой спан трассировки обновления; обработка в очереди становится его потомком
+        with tracer.span("webhook") as span:
+            update_data = await request.json()
+            
+            # Повторные доставки того же update_id отбрасываем до разбора обновления
+            update_id = update_data.get('update_id')
+            span.set_attribute("update_id", update_id)
+            with tracer.span("update_dedup.claim"):
+                is_new = update_id is None or await update_dedup.claim(update_id)
+            if not is_new:
+                span.set_attribute("duplicate", True)
+                return PlainTextResponse('ok')
+            
+            # Log only essential info without personal data
+            with tracer.span("sanitize_log_data"):
+                sanitized_data = sanitize_log_data(update_data)
+            
+            if 'message' in sanitized_data:
+                user_id = sanitized_data.get('user_id', 'unknown')
+                message_type = 'text' if 'text' in sanitized_data['message'] else 'other'
+                logger.info(f"Received {message_type} message from user {user_id}")
+                span.set_attributes(user_id=user_id, action="message")
+            elif 'callback_query' in sanitized_data:
+                user_id = sanitized_data.get('user_id', 'unknown')
+                logger.info(f"Received callback query from user {user_id}")
+                span.set_attributes(user_id=user_id, action="callback")
+            else:
+                logger.info("Received update (type not recognized)")
+            
+            with tracer.span("Update.de_json"):
+                update = Update.de_json(update_data, ptb_app.bot)
+            
+            # Ставим обновление в очередь и сразу отвечаем Telegram; обработка идёт в фоне.
+            # Если очередь переполнена, отвечаем 503 - Telegram повторит доставку позже.
+            if not update_queue.submit(update):
+                # Разрешаем повторную доставку этого обновления
+                await update_dedup.release(update.update_id)
+                span.set_attribute("rejected", True)
+                return PlainTextResponse('busy', status_code=503)
             
     except Exception as e:
         logger.error(f"Error in webhook BEFORE processing update: {e}", exc_info=True)
@@ -0,0 +1,147 @@
+"""
+Telegram file_id registry for the images in images/.
+
+The first time an image is sent it is uploaded as a file and Telegram returns a
+`file_id` for it. The registry remembers that id (keyed by the image path and a
+hash of its content) and stores the mapping in Google Cloud Storage, so every
+later send - on any instance - just references the id instead of uploading
+megabytes again. If Telegram rejects a remembered id, the image is re-uploaded
+and the new id replaces the stale one.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+from telegram import Bot, Message
+from telegram.error import BadRequest
+
+from config import GCS_BUCKET_NAME
+from metrics import gcs_operation
+
+logger = logging.getLogger(__name__)
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class MediaRegistry:
+    """Uploads each image asset once and reuses its Telegram file_id afterwards."""
+
+    def __init__(self):
+        self.storage_client = None
+        self.bucket = None
+        self._file_ids: Dict[str, str] = {}
+        self._content_hashes: Dict[str, str] = {}
+        self._loaded_for_bot: Optional[str] = None
+        self._load_lock = asyncio.Lock()
+        # hits: sent by file_id; misses: uploaded (first send, or after a stale file_id)
+        self.stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def _get_bucket(self):
+        """Lazy initialization of storage client and bucket."""
+        if self.storage_client is None and GCS_BUCKET_NAME:
+            try:
+                # Deferred import: the SDK is only loaded once storage is used (see startup.py)
+                from google.cloud import storage
+                self.storage_client = storage.Client()
+                self.bucket = self.storage_client.bucket(GCS_BUCKET_NAME)
+            except Exception as e:
+                logger.error(f"Failed to initialize GCS bucket '{GCS_BUCKET_NAME}': {e}")
+                self.bucket = None
+        return self.bucket
+
+    @staticmethod
+    def _bot_key(bot: Bot) -> str:
+        # file_ids are only valid for the bot that received them
+        return bot.token.split(":", 1)[0]
+
+    def _get_registry_blob_name(self, bot: Bot) -> str:
+        return f"media_registry/bot_{self._bot_key(bot)}_file_ids.json"
+
+    def _asset_key(self, image_path: str) -> str:
+        """Key of an asset: its path plus a content hash, so a changed image gets a fresh upload."""
+        absolute_path = os.path.join(_BASE_DIR, image_path)
+        content_hash = self._content_hashes.get(absolute_path)
+        if content_hash is None:
+            with open(absolute_path, "rb") as image_file:
+                content_hash = hashlib.sha256(image_file.read()).hexdigest()[:16]
+            self._content_hashes[absolute_path] = content_hash
+        return f"{os.path.relpath(absolute_path, _BASE_DIR)}:{content_hash}"
+
+    async def _ensure_loaded(self, bot: Bot):
+        """Loads the persisted file_id mapping once per process."""
+        bot_key = self._bot_key(bot)
+        if self._loaded_for_bot == bot_key:
+            return
+        async with self._load_lock:
+            if self._loaded_for_bot == bot_key:
+                return
+            self._file_ids = {}
+            bucket = self._get_bucket()
+            if bucket:
+                try:
+                    blob = bucket.blob(self._get_registry_blob_name(bot))
+                    with gcs_operation("media_registry", "exists"):
+                        exists = await asyncio.to_thread(blob.exists)
+                    if exists:
+                        with gcs_operation("media_registry", "load"):
+                            content = await asyncio.to_thread(blob.download_as_text, encoding="utf-8")
+                        self._file_ids = json.loads(content)
+                        logger.info(f"Loaded {len(self._file_ids)} Telegram file_ids from media registry")
+                except Exception as e:
+                    logger.error(f"Failed to load media registry: {e}")
+            self._loaded_for_bot = bot_key
+
+    async def _persist(self, bot: Bot):
+        bucket = self._get_bucket()
+        if not bucket:
+            return
+        try:
+            blob = bucket.blob(self._get_registry_blob_name(bot))
+            with gcs_operation("media_registry", "save"):
+                await asyncio.to_thread(
+                    blob.upload_from_string,
+                    json.dumps(self._file_ids, ensure_ascii=False),
+                    content_type="application/json; charset=utf-8"
+                )
+        except Exception as e:
+            logger.error(f"Failed to save media registry: {e}")
+
+    async def send_photo(self, bot: Bot, chat_id: int, image_path: str, **kwargs) -> Message:
+        """
+        Sends an image from the bot's directory, reusing its Telegram file_id when known.
+
+        `image_path` is relative to the bot's directory (e.g. "images/clue2.png").
+        Raises FileNotFoundError if the image does not exist, like open() would.
+        """
+        await self._ensure_loaded(bot)
+        asset_key = self._asset_key(image_path)
+
+        file_id = self._file_ids.get(asset_key)
+        if file_id:
+            try:
+                message = await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+                self.stats["hits"] += 1
+                return message
+            except BadRequest as e:
+                if "file" not in str(e).lower():
+                    raise
+                self.stats["stale"] += 1
+                logger.warning(f"Stale Telegram file_id for {asset_key}, uploading again: {e}")
+                self._file_ids.pop(asset_key, None)
+
+        with open(os.path.join(_BASE_DIR, image_path), "rb") as photo:
+            message = await bot.send_photo(chat_id=chat_id, photo=photo, **kwargs)
+        self.stats["misses"] += 1
+
+        if message and message.photo:
+            # The largest size comes last; sending its id reproduces the original photo
+            self._file_ids[asset_key] = message.photo[-1].file_id
+            await self._persist(bot)
+        return message
+
+
+# Global instance
+media_registry = MediaRegistry()
@@ -0,0 +1,286 @@
+"""
+Prometheus metrics of the bot, served at /metrics.
+
+Events the other modules do not count themselves are recorded here as they
+happen: validation failures, director decisions (predefined scene or LLM),
+GCS operations per manager, Telegram API requests and errors, and LLM call
+latencies. Everything that already keeps counters (model router, rate
+limiter, update queue, session stores, caches) is read at scrape time by
+collectors, so a scrape always shows current values without double
+bookkeeping.
+
+`registry.render()` returns the Prometheus text exposition format (0.0.4);
+no client library is needed. The module only uses the standard library so
+any module can import it.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers Telegram/GCS round trips up to slow LLM completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (name, type, help, [(labels, value), ...]) as produced by collectors
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """A monotonically increasing value per combination of label values."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        key = tuple(str(value) for value in label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name + "_total", dict(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Bucketed observations (with sum and count) per combination of label values."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        key = tuple(str(label) for label in label_values)
+        with self._lock:
+            # Per bucket count (not cumulative), then sum and count
+            counts = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            counts[-2] += value
+            counts[-1] += 1
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield self.name + "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield self.name + "_bucket", {**labels, "le": "+Inf"}, counts[-1]
+            yield self.name + "_sum", labels, counts[-2]
+            yield self.name + "_count", labels, counts[-1]
+
+
+class MetricsRegistry:
+    """The bot's metrics and scrape-time collectors, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """Registers collector() -> [(name, type, help, [(labels, value), ...]), ...], called on each scrape."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+                continue
+            for name, metric_type, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                sample_name = name + "_total" if metric_type == "counter" else name
+                for labels, value in samples:
+                    lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Global instance
+registry = MetricsRegistry()
+
+llm_latency = registry.histogram(
+    "glossa_llm_call_duration_seconds", "Latency of LLM calls by route (role) and model.", ["route", "model"])
+validation_failures = registry.counter(
+    "glossa_ai_validation_failures", "AI responses rejected by the response validator, by reason.", ["reason"])
+director_decisions = registry.counter(
+    "glossa_director_decisions", "Public-scene decisions by source (predefined scene, LLM director, or empty after a failed call).", ["source"])
+gcs_operations = registry.counter(
+    "glossa_gcs_operations", "Cloud Storage operations by manager, operation and outcome.", ["manager", "operation", "outcome"])
+gcs_latency = registry.histogram(
+    "glossa_gcs_operation_duration_seconds", "Latency of Cloud Storage operations by manager.", ["manager", "operation"])
+telegram_requests = registry.counter(
+    "glossa_telegram_requests", "Telegram Bot API requests by method and outcome (ok, error, network_error).",
+    ["method", "outcome"])
+telegram_errors = registry.counter(
+    "glossa_telegram_api_errors", "Telegram Bot API error responses by method and HTTP status (0 for network errors).",
+    ["method", "status"])
+telegram_latency = registry.histogram(
+    "glossa_telegram_request_duration_seconds", "Latency of Telegram Bot API requests by method.", ["method"])
+
+
+@contextmanager
+def gcs_operation(manager: str, operation: str) -> Iterator[None]:
+    """Counts and times one Cloud Storage operation of a manager; exceptions count as errors."""
+    started = time.monotonic()
+    try:
+        yield
+    except Exception:
+        gcs_operations.inc(manager, operation, "error")
+        raise
+    else:
+        gcs_operations.inc(manager, operation, "ok")
+    finally:
+        gcs_latency.observe(time.monotonic() - started, manager, operation)
+
+
+def _family(name: str, metric_type: str, documentation: str, samples) -> MetricFamily:
+    return name, metric_type, documentation, [(labels, value) for labels, value in samples if value is not None]
+
+
+def collect_llm_metrics() -> Iterator[MetricFamily]:
+    """Calls, tokens and cost per route and model (model_router.py) and rate-limiter counters."""
+    # Local import to avoid circular dependency
+    from model_router import model_router
+    from rate_limiter import rate_limiter, PRIORITY_CLASSES
+
+    routes = []
+    for key, stats in model_router.metrics().items():
+        route, model = key.split("/", 1)
+        routes.append(({"route": route, "model": model}, stats))
+    outcomes = ("errors", "parse_failures", "shed")
+    yield _family("glossa_llm_calls", "counter", "LLM calls by route (role), model and outcome.", [
+        ({**labels, "outcome": outcome}, stats["calls"] - sum(stats[other] for other in outcomes) if outcome == "ok" else stats[outcome])
+        for labels, stats in routes for outcome in ("ok",) + outcomes
+    ])
+    yield _family("glossa_llm_tokens", "counter", "LLM tokens by route, model and direction (in = prompt, out = completion).", [
+        ({**labels, "direction": direction}, stats[key])
+        for labels, stats in routes for direction, key in (("in", "prompt_tokens"), ("out", "completion_tokens"))
+    ])
+    yield _family("glossa_llm_cost_usd", "counter", "Estimated LLM cost in USD by route and model.",
+                  [(labels, stats["cost_usd"]) for labels, stats in routes])
+
+    limiter = rate_limiter.metrics()
+    yield _family("glossa_rate_limiter_admitted", "counter", "LLM calls admitted by the rate limiter, by priority class.",
+                  [({"priority": priority}, limiter[f"admitted_{priority}"]) for priority in PRIORITY_CLASSES])
+    yield _family("glossa_rate_limiter_shed", "counter", "LLM calls shed by the rate limiter, by priority class.",
+                  [({"priority": priority}, limiter[f"shed_{priority}"]) for priority in PRIORITY_CLASSES])
+    yield _family("glossa_rate_limiter_throttled", "counter", "429 responses received from the LLM provider.",
+                  [({}, limiter["throttled"])])
+    yield _family("glossa_rate_limiter_remaining_tokens", "gauge", "Tokens left in the current rate-limit window, by model.",
+                  [({"model": model}, bucket["tokens"]) for model, bucket in limiter["models"].items()])
+
+
+def collect_pipeline_metrics() -> Iterator[MetricFamily]:
+    """Update queue depth, deduplication, session stores and cache hit counters."""
+    # Local import to avoid circular dependency
+    from update_queue import update_queue
+    from update_dedup import update_dedup
+    from session_store import all_store_metrics
+    from explanation_cache import explanation_cache
+    from media_registry import media_registry
+
+    queue = update_queue.metrics()
+    yield _family("glossa_update_queue_depth", "gauge", "Updates waiting for a slot (queued) or being handled (in_flight).",
+                  [({"state": "queued"}, queue["queued"]), ({"state": "in_flight"}, queue["in_flight"])])
+    yield _family("glossa_updates", "counter", "Updates by outcome (enqueued, processed, failed, rejected with 503).",
+                  [({"outcome": outcome}, queue[outcome]) for outcome in ("enqueued", "processed", "failed", "rejected")])
+    yield _family("glossa_user_lanes_active", "gauge", "Players with an update being handled or waiting.",
+                  [({}, queue["active_lanes"])])
+    yield _family("glossa_user_lanes_contended", "counter", "Updates that waited behind another update of the same player.",
+                  [({}, queue["contended"])])
+    dedup = update_dedup.metrics()
+    yield _family("glossa_update_duplicates", "counter", "Telegram redeliveries dropped by update deduplication.",
+                  [({}, dedup["duplicates"])])
+
+    stores = all_store_metrics()
+    yield _family("glossa_session_entries", "gauge", "Entries per session store (game_state entries are active sessions).",
+                  [({"store": store["name"]}, store["entries"]) for store in stores])
+    yield _family("glossa_session_bytes", "gauge", "Estimated size of each session store.",
+                  [({"store": store["name"]}, store["bytes"]) for store in stores])
+    yield _family("glossa_session_evictions", "counter", "Session entries dropped for size (evicted) or age (expired).",
+                  [({"store": store["name"], "reason": reason}, store[key])
+                   for store in stores for reason, key in (("size", "evictions"), ("ttl", "expirations"))])
+    yield _family("glossa_session_backend_operations", "counter",
+                  "Shared session backend reads, writes and failed operations per store.",
+                  [({"store": store["name"], "operation": operation}, store[f"backend_{operation}"])
+                   for store in stores for operation in ("reads", "writes", "errors")])
+
+    lookups = [({"cache": store["name"], "result": result}, store[result]) for store in stores for result in ("hits", "misses")]
+    lookups += [({"cache": "explanation", "result": result}, count) for result, count in explanation_cache.stats.items()]
+    lookups += [({"cache": "media_file_id", "result": result}, count) for result, count in media_registry.stats.items()]
+    yield _family("glossa_cache_lookups", "counter", "Cache lookups by cache and result.", lookups)
+
+
+def collect_startup_metrics() -> Iterator[MetricFamily]:
+    """Cold-start breakdown of this instance (startup.py)."""
+    # Local import to avoid circular dependency
+    from startup import startup_timer
+
+    startup = startup_timer.metrics()
+    yield _family("glossa_cold_start_seconds", "gauge", "Seconds spent in each startup phase of this instance.",
+                  [({"phase": phase}, seconds) for phase, seconds in startup["phases"].items()])
+    yield _family("glossa_cold_start_ready_seconds", "gauge", "Seconds from the bot's first import until the instance took traffic.",
+                  [({}, startup["ready_seconds"])])
+
+
+registry.add_collector(collect_llm_metrics)
+registry.add_collector(collect_pipeline_metrics)
+registry.add_collector(collect_startup_metrics)
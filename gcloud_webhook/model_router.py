@@ -0,0 +1,151 @@
+"""
+Per-task model selection for LLM calls.
+
+Every AI call names a route ("dialogue", "director", "tutor_analysis", ...)
+instead of a model. MODEL_ROUTES maps each route to a chain of models: simple
+JSON classification tasks run on a small, fast model and fall back to the next
+model in the chain when a call fails or its answer does not parse. Groq's rate
+limits are per model, so background analysis on the small model no longer
+competes with interactive dialogue. Each route also has a rate-limit priority
+class (ROUTE_PRIORITIES, see rate_limiter.py).
+
+Each route and model keeps call, fallback, latency, token and cost counters
+(see `metrics`).
+"""
+
+import logging
+import time
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from config import MODEL_ROUTES, MODEL_PRICES, ROUTE_PRIORITIES, LLM_DEFAULT_MODEL
+from llm_gateway import llm_gateway, LLMResult
+from rate_limiter import RateLimitShed
+from tracing import tracer
+from metrics import llm_latency
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RoutedResult:
+    """A completion of a route: the gateway result, the parsed value and how many models were skipped."""
+    result: LLMResult
+    value: Any = None
+    fallbacks: int = 0
+
+    @property
+    def text(self) -> str:
+        return self.result.text
+
+
+class ModelRouter:
+    """Runs chat completions on the model chain of a route and keeps per-route counters."""
+
+    def __init__(self, routes: Dict[str, List[str]] = MODEL_ROUTES, prices: Dict[str, Tuple[float, float]] = MODEL_PRICES,
+                 priorities: Dict[str, str] = ROUTE_PRIORITIES):
+        self.routes = routes
+        self.prices = prices
+        self.priorities = priorities
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def models_for(self, route: str) -> List[str]:
+        """The model chain of a route (the default model for unknown routes)."""
+        return self.routes.get(route) or [LLM_DEFAULT_MODEL]
+
+    def _record(self, route: str, model: str, outcome: str, latency: float = 0.0,
+                prompt_tokens: int = 0, completion_tokens: int = 0):
+        stats = self._stats.setdefault((route, model), {
+            "calls": 0, "errors": 0, "parse_failures": 0, "shed": 0, "latency_total": 0.0, "latency_max": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+        })
+        stats["calls"] += 1
+        if outcome != "ok":
+            stats[outcome] += 1
+        if latency:
+            llm_latency.observe(latency, route, model)
+        stats["latency_total"] += latency
+        stats["latency_max"] = max(stats["latency_max"], latency)
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        stats["cost_usd"] += (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+    async def chat(self, route: str, messages: List[Dict[str, Any]], temperature: float = 0.7,
+                   parse: Optional[Callable[[str], Any]] = None, timeout: Optional[float] = None) -> RoutedResult:
+        """
+        Runs a completion on the first model of the route that answers usably.
+        `parse` turns the text into a value and raises if it is unusable (e.g. broken JSON);
+        the next model is then tried. The error of the last model is raised.
+        """
+        models = self.models_for(route)
+        priority = self.priorities.get(route, "interactive")
+        with tracer.span(f"llm.{route}", priority=priority) as span:
+            for attempt, model in enumerate(models):
+                is_last = attempt == len(models) - 1
+                try:
+                    result = await llm_gateway.chat(messages, model=model, temperature=temperature, timeout=timeout,
+                                                    priority=priority)
+                except RateLimitShed:
+                    # Shedding applies to the task, not just this model
+                    self._record(route, model, "shed")
+                    raise
+                except Exception as e:
+                    self._record(route, model, "errors")
+                    if is_last:
+                        raise
+                    logger.warning(f"Route {route}: {model} failed ({e}), falling back to {models[attempt + 1]}")
+                    continue
+
+                try:
+                    value = parse(result.text) if parse else None
+                except Exception as e:
+                    self._record(route, model, "parse_failures", result.latency, result.prompt_tokens, result.completion_tokens)
+                    if is_last:
+                        raise
+                    logger.warning(f"Route {route}: unusable answer from {model} ({e}), falling back to {models[attempt + 1]}")
+                    continue
+
+                self._record(route, model, "ok", result.latency, result.prompt_tokens, result.completion_tokens)
+                span.set_attributes(model=model, fallbacks=attempt, prompt_tokens=result.prompt_tokens,
+                                    completion_tokens=result.completion_tokens)
+                return RoutedResult(result, value, attempt)
+
+    async def stream_chat(self, route: str, messages: List[Dict[str, Any]], temperature: float = 0.7,
+                          timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Streams a completion from the first model of the route (no fallback once text has been shown)."""
+        model = self.models_for(route)[0]
+        started = time.monotonic()
+        received = []
+        outcome = "errors"
+        try:
+            stream_request = llm_gateway.stream_chat(messages, model=model, temperature=temperature, timeout=timeout,
+                                                    priority=self.priorities.get(route, "interactive"))
+            async with aclosing(stream_request) as stream:
+                async for delta in stream:
+                    received.append(delta)
+                    yield delta
+            outcome = "ok"
+        finally:
+            # Streams carry no usage data; tokens are estimated at about four characters per token
+            prompt_tokens = sum(len(message.get("content", "")) for message in messages) // 4
+            completion_tokens = sum(len(delta) for delta in received) // 4
+            self._record(route, model, outcome, time.monotonic() - started, prompt_tokens, completion_tokens)
+            # Recorded afterwards: the stream is consumed piecewise, so it cannot be the active span
+            tracer.record(f"llm.{route}", time.monotonic() - started, model=model, streamed=True, outcome=outcome,
+                          prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Counters per "route/model": calls, errors, parse failures, shed calls, latency, tokens and cost."""
+        metrics = {}
+        for (route, model), stats in self._stats.items():
+            metrics[f"{route}/{model}"] = {
+                **stats,
+                "latency_avg": stats["latency_total"] / stats["calls"] if stats["calls"] else 0.0,
+            }
+        return metrics
+
+
+# Global instance
+model_router = ModelRouter()
@@ -206,38 +206,66 @@ KEYWORD_PATTERNS = {
     }
 }
 
-def detect_topic_from_keywords(message: str) -> Optional[str]:
+# Имена, по которым игрок обращается к конкретному персонажу
+CHARACTER_NAME_PATTERNS = {
+    "tim": ["tim"],
+    "pauline": ["pauline"],
+    "fiona": ["fiona"],
+    "ronnie": ["ronnie"]
+}
 
-    message_lower = message.lower()
-    
-    # Проверяем каждую тему
-    for topic_key, topic_data in KEYWORD_PATTERNS.items():
-        keywords = topic_data["keywords"]
-        
-        # Ищем совпадения ключевых слов
+def _compile_keyword_matcher(keywords_by_key: Dict[str, List[str]]):
+    """
+    Builds one word-boundary regex for all keywords and a map from keyword to the keys that own it.
+    Longer keywords come first, so "threatening card" wins over "threatening".
+    """
+    owners: Dict[str, List[str]] = {}
+    for key, keywords in keywords_by_key.items():
         for keyword in keywords:
-            if keyword.lower() in message_lower:
-                return topic_key
-    
-    return None
+            normalised = " ".join(keyword.lower().split())
+            owners.setdefault(normalised, [])
+            if key not in owners[normalised]:
+                owners[normalised].append(key)
+
+    alternatives = [
+        re.escape(keyword).replace(r"\ ", r"\s+")
+        for keyword in sorted(owners, key=len, reverse=True)
+    ]
+    # Whole words only (plural "s"/"es" allowed), so "time" no longer matches inside "sometimes"
+    pattern = re.compile(r"(?<!\w)(" + "|".join(alternatives) + r")(?:s|es)?(?!\w)", re.IGNORECASE)
+    return pattern, owners
+
+_TOPIC_MATCHER, _TOPIC_KEYWORD_OWNERS = _compile_keyword_matcher(
+    {topic_key: topic_data["keywords"] for topic_key, topic_data in KEYWORD_PATTERNS.items()}
+)
+_CHARACTER_MATCHER, _CHARACTER_NAME_OWNERS = _compile_keyword_matcher(CHARACTER_NAME_PATTERNS)
+_TOPIC_ORDER = {topic_key: index for index, topic_key in enumerate(KEYWORD_PATTERNS)}
+
+def match_topics(message: str) -> List[tuple]:
+    """
+    Finds all topics whose keywords occur in the message in a single regex pass.
+    Returns (topic_key, score) pairs, best first; the score is the number of keyword hits.
+    """
+    scores: Dict[str, int] = {}
+    for match in _TOPIC_MATCHER.finditer(message):
+        keyword = " ".join(match.group(1).lower().split())
+        for topic_key in _TOPIC_KEYWORD_OWNERS.get(keyword, []):
+            scores[topic_key] = scores.get(topic_key, 0) + 1
+    # Ties go to the topic listed first in KEYWORD_PATTERNS
+    return sorted(scores.items(), key=lambda item: (-item[1], _TOPIC_ORDER[item[0]]))
+
+def detect_topic_from_keywords(message: str) -> Optional[str]:
+
+    matches = match_topics(message)
+    return matches[0][0] if matches else None
 
 def extract_character_from_message(message: str) -> Optional[str]:
 
-    message_lower = message.lower()
-    
-    character_names = {
-        "tim": ["tim"],
-        "pauline": ["pauline"],
-        "fiona": ["fiona"],
-        "ronnie": ["ronnie"]
-    }
-    
-    for char_key, names in character_names.items():
-        for name in names:
-            if name in message_lower:
-                return char_key
-    
-    return None
+    # Первый персонаж, названный в сообщении
+    match = _CHARACTER_MATCHER.search(message)
+    if not match:
+        return None
+    return _CHARACTER_NAME_OWNERS[" ".join(match.group(1).lower().split())][0]
 
 def get_characters_who_can_respond(topic_key: str, topic_memory: Dict) -> List[str]:
 
@@ -294,9 +322,11 @@ def create_predefined_response(topic_key: str, character_keys: List[str], topic_
         
     topic_name = topic_data["topic_name"]
     
+    # Predefined scenes have fixed triggers, so their replies can be generated in advance
     return {
         "scene": scene_actions,
-        "new_topic": topic_name
+        "new_topic": topic_name,
+        "predefined": True
     }
 
 def try_predefined_response(user_id: int, message: str, topic_memory: Dict) -> Optional[Dict[str, Any]]:
@@ -2,8 +2,8 @@ import json
 import datetime
 import logging
 from typing import Dict, Any, Optional, List
-from google.cloud import storage
 from config import GCS_BUCKET_NAME
+from metrics import gcs_operation
 import pytz
 
 logger = logging.getLogger(__name__)
@@ -22,6 +22,8 @@ class ProgressManager:
         """Lazy initialization of storage client and bucket."""
         if self.storage_client is None and GCS_BUCKET_NAME:
             try:
+                # Deferred import: the SDK is only loaded once storage is used (see startup.py)
+                from google.cloud import storage
                 self.storage_client = storage.Client()
                 self.bucket = self.storage_client.bucket(GCS_BUCKET_NAME)
             except Exception as e:
@@ -110,12 +112,15 @@ class ProgressManager:
             blob_name = self._get_progress_blob_name(user_id, participant_code)
             blob = bucket.blob(blob_name)
             
-            if not blob.exists():
+            with gcs_operation("progress", "exists"):
+                exists = blob.exists()
+            if not exists:
                 logger.info(f"No progress data found for user {user_id}, creating new")
                 return {"words_learned": [], "writing_feedback": []}
             
             # Download and parse the progress data
-            content = blob.download_as_text(encoding="utf-8")
+            with gcs_operation("progress", "load"):
+                content = blob.download_as_text(encoding="utf-8")
             progress_data = json.loads(content)
             
             # Ensure the structure exists
@@ -142,10 +147,11 @@ class ProgressManager:
             blob_name = self._get_progress_blob_name(user_id, participant_code)
             blob = bucket.blob(blob_name)
             
-            blob.upload_from_string(
-                json.dumps(progress_data, indent=2, ensure_ascii=False),
-                content_type="application/json; charset=utf-8"
-            )
+            with gcs_operation("progress", "save"):
+                blob.upload_from_string(
+                    json.dumps(progress_data, indent=2, ensure_ascii=False),
+                    content_type="application/json; charset=utf-8"
+                )
             
             logger.info(f"Successfully saved progress for user {user_id}")
             return True
@@ -165,8 +171,11 @@ class ProgressManager:
             blob_name = self._get_progress_blob_name(user_id, participant_code)
             blob = bucket.blob(blob_name)
             
-            if blob.exists():
-                blob.delete()
+            with gcs_operation("progress", "exists"):
+                exists = blob.exists()
+            if exists:
+                with gcs_operation("progress", "delete"):
+                    blob.delete()
                 logger.info(f"Successfully cleared progress for user {user_id}")
             else:
                 logger.info(f"No progress to clear for user {user_id}")
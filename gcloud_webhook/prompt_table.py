@@ -0,0 +1,135 @@
+"""
+Precompiled system prompts for the game characters.
+
+Every dialogue call used to rebuild the same large strings: the character
+prompt plus the language-level requirements (combine_character_prompt), plus
+the "IMPORTANT: You are ..." identity suffix added by ask_for_dialogue.
+`PromptTable` assembles them once per character x level, keeps them as
+interned immutable strings together with a content hash (for cache keys and
+to keep the prompt prefix byte-identical for provider-side prompt caching),
+and rebuilds them when one of the prompt files changes on disk.
+"""
+
+import hashlib
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from config import PROMPT_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Characters whose prompts include the language requirements of the player's level
+GAME_CHARACTERS = ("narrator", "tim", "fiona", "pauline", "ronnie")
+LANGUAGE_LEVELS = ("A2", "B1", "B2")
+
+
+def prompt_hash(text: str) -> str:
+    """Short content hash of a prompt."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class PromptEntry:
+    """The assembled prompts of one character at one language level."""
+    character: str
+    level: str
+    text: str           # character prompt + language requirements (combine_character_prompt)
+    dialogue_text: str  # text + identity suffix (what ask_for_dialogue sends)
+    text_hash: str
+    dialogue_hash: str
+
+
+class PromptTable:
+    """Character x level prompt table with hot reload on prompt file changes."""
+
+    def __init__(self, reload_interval: float = PROMPT_RELOAD_INTERVAL):
+        self.reload_interval = reload_interval
+        self._entries: Dict[Tuple[str, str], PromptEntry] = {}
+        # (character, text) -> entry, to find the identity variant of a prompt handed out earlier
+        self._by_text: Dict[Tuple[str, str], PromptEntry] = {}
+        self._source_mtimes: Dict[str, Optional[float]] = {}
+        self._last_check = 0.0
+
+    @staticmethod
+    def _source_files(character: str, level: str) -> Tuple[str, str]:
+        return f"prompts/prompt_{character}.md", f"prompts/language_learning/{level.lower()}.md"
+
+    @staticmethod
+    def _mtime(filepath: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(os.path.join(_BASE_DIR, filepath))
+        except OSError:
+            return None
+
+    @staticmethod
+    def identity_suffix(character: str) -> str:
+        """The reminder appended to a character's prompt for dialogue calls."""
+        from config import CHARACTER_DATA  # Local import to avoid circular dependency
+        char_name = CHARACTER_DATA.get(character, {}).get("full_name", character)
+        return f"\n\nIMPORTANT: You are {char_name}. You must respond ONLY as {char_name}, speaking in first person about YOUR OWN experiences and observations. Do not speak for other characters or describe their actions."
+
+    def _build_entry(self, character: str, level: str) -> PromptEntry:
+        from utils import load_system_prompt  # Local import to avoid circular dependency
+        character_file, language_file = self._source_files(character, level)
+        character_prompt = load_system_prompt(character_file)
+        language_requirements = load_system_prompt(language_file)
+        for filepath in (character_file, language_file):
+            self._source_mtimes[filepath] = self._mtime(filepath)
+
+        # Combine them with clear separation
+        text = sys.intern(f"{character_prompt}\n\n---\n\n## Language Requirements\n{language_requirements}")
+        dialogue_text = sys.intern(text + self.identity_suffix(character))
+        entry = PromptEntry(character, level, text, dialogue_text, prompt_hash(text), prompt_hash(dialogue_text))
+        self._entries[(character, level)] = entry
+        self._by_text[(character, text)] = entry
+        return entry
+
+    def build(self):
+        """Assembles the prompts of every game character at every level (called at startup)."""
+        self._entries.clear()
+        self._by_text.clear()
+        for character in GAME_CHARACTERS:
+            for level in LANGUAGE_LEVELS:
+                self._build_entry(character, level)
+        self._last_check = time.monotonic()
+        logger.info(f"Prompt table built with {len(self._entries)} prompts")
+
+    def _reload_if_changed(self):
+        """Rebuilds the table if a prompt file changed (checked at most every reload_interval seconds)."""
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return
+        self._last_check = now
+        changed = [path for path, mtime in self._source_mtimes.items() if self._mtime(path) != mtime]
+        if not changed:
+            return
+        from utils import clear_prompt_cache  # Local import to avoid circular dependency
+        for filepath in changed:
+            clear_prompt_cache(filepath)
+        logger.info(f"Prompt files changed, rebuilding prompt table: {changed}")
+        self.build()
+
+    def get(self, character: str, level: str = "B1") -> PromptEntry:
+        """The prompts of a game character at a language level."""
+        self._reload_if_changed()
+        level = level.upper()
+        entry = self._entries.get((character, level))
+        if entry is None:
+            entry = self._build_entry(character, level)
+        return entry
+
+    def with_identity(self, system_prompt: str, character: str) -> str:
+        """Appends the identity suffix to a prompt, reusing the prebuilt string when the prompt came from the table."""
+        entry = self._by_text.get((character, system_prompt))
+        if entry is not None:
+            return entry.dialogue_text
+        return system_prompt + self.identity_suffix(character)
+
+
+# Global instance
+prompt_table = PromptTable()
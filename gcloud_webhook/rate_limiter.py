@@ -0,0 +1,195 @@
+"""
+Provider rate-limit aware scheduling of LLM calls.
+
+Groq limits every model by tokens per minute and requests per day and reports
+what is left in the `x-ratelimit-*` headers of each response (`retry-after` on
+a 429). `RateLimiter` keeps one token bucket per model that is refilled at the
+reported rate and re-synchronised from those headers after every call.
+
+Before a call, `acquire` takes the estimated tokens from the model's bucket
+according to the call's priority class:
+
+    interactive (dialogue) > director > explanation > background
+
+Lower classes must leave a share of the bucket (RATE_LIMIT_RESERVES) to the
+classes above them and never overtake a waiting call of a higher class. A call
+that would have to wait longer than its class allows (RATE_LIMIT_MAX_WAIT) is
+shed with `RateLimitShed`, so deferrable background work gives way when quota
+is tight and player-visible latency stays flat.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import Dict, Mapping, Optional
+
+from config import RATE_LIMIT_RESERVES, RATE_LIMIT_MAX_WAIT
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CLASSES = ("interactive", "director", "explanation", "background")
+
+# Groq reports reset times as e.g. "7.66s", "2m59.56s", "1h2m3s" or "120ms"
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitShed(Exception):
+    """Raised when a call is dropped because its priority class may not wait that long for quota."""
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds of a rate-limit reset header value, or None if it cannot be parsed."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class _ModelBucket:
+    """Token bucket of one model; unlimited until the provider has reported its limits."""
+
+    def __init__(self):
+        self.capacity: Optional[float] = None  # tokens per minute
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiting = {priority: 0 for priority in PRIORITY_CLASSES}
+
+    def refill(self, now: float):
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def wait_time(self, cost: float, reserve: float, now: float) -> float:
+        """Seconds until `cost` tokens can be taken while leaving `reserve` of the capacity."""
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.capacity is None:
+            return 0.0
+        floor = reserve * self.capacity
+        # A single call larger than what this class may use still gets through once the bucket is full
+        cost = min(cost, self.capacity - floor)
+        missing = cost + floor - self.tokens
+        return max(0.0, missing * 60.0 / self.capacity) if self.capacity else 0.0
+
+
+class RateLimiter:
+    """Per-model token buckets with priority classes in front of the LLM gateway."""
+
+    def __init__(self, reserves: Mapping[str, float] = RATE_LIMIT_RESERVES,
+                 max_wait: Mapping[str, float] = RATE_LIMIT_MAX_WAIT, poll_interval: float = 0.25):
+        self.reserves = reserves
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self._buckets: Dict[str, _ModelBucket] = {}
+        self._stats = {
+            **{f"admitted_{priority}": 0 for priority in PRIORITY_CLASSES},
+            **{f"shed_{priority}": 0 for priority in PRIORITY_CLASSES},
+            "delayed": 0, "wait_seconds_total": 0.0, "throttled": 0,
+        }
+
+    def _bucket(self, model: str) -> _ModelBucket:
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            bucket = self._buckets[model] = _ModelBucket()
+        return bucket
+
+    def _overtakes(self, bucket: _ModelBucket, priority: str) -> bool:
+        """True if a call of a higher class is waiting for this model."""
+        rank = PRIORITY_CLASSES.index(priority)
+        return any(bucket.waiting[higher] for higher in PRIORITY_CLASSES[:rank])
+
+    async def acquire(self, model: str, estimated_tokens: int, priority: str = "interactive"):
+        """Waits until the model has quota for a call of this class; raises RateLimitShed if that takes too long."""
+        if priority not in PRIORITY_CLASSES:
+            priority = "interactive"
+        bucket = self._bucket(model)
+        reserve = self.reserves.get(priority, 0.0)
+        started = time.monotonic()
+        deadline = started + self.max_wait.get(priority, 0.0)
+        delayed = False
+
+        while True:
+            now = time.monotonic()
+            bucket.refill(now)
+            wait = bucket.wait_time(estimated_tokens, reserve, now)
+            if wait <= 0 and not self._overtakes(bucket, priority):
+                bucket.tokens -= estimated_tokens
+                self._stats[f"admitted_{priority}"] += 1
+                if delayed:
+                    self._stats["wait_seconds_total"] += now - started
+                return
+            if now + wait > deadline:
+                self._stats[f"shed_{priority}"] += 1
+                logger.warning(f"Shedding {priority} call on {model}: quota in {wait:.1f}s, "
+                               f"waited {now - started:.1f}s of {self.max_wait.get(priority, 0.0):.0f}s")
+                raise RateLimitShed(f"{model}: no quota for a {priority} call within {self.max_wait.get(priority, 0.0):.0f}s")
+
+            if not delayed:
+                delayed = True
+                self._stats["delayed"] += 1
+            bucket.waiting[priority] += 1
+            try:
+                await asyncio.sleep(min(max(wait, 0.01), self.poll_interval))
+            finally:
+                bucket.waiting[priority] -= 1
+
+    def update_from_headers(self, model: str, headers: Mapping[str, str], throttled: bool = False):
+        """Re-synchronises a model's bucket with the rate-limit headers of a response (or 429 error)."""
+        bucket = self._bucket(model)
+        now = time.monotonic()
+        bucket.refill(now)
+        try:
+            limit_tokens = headers.get("x-ratelimit-limit-tokens")
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if limit_tokens:
+                bucket.capacity = float(limit_tokens)
+            if remaining_tokens is not None:
+                bucket.tokens = float(remaining_tokens)
+                if bucket.capacity is None:
+                    # The limit itself was not reported; assume the bucket was full a minute ago
+                    bucket.capacity = max(bucket.tokens, 1.0)
+
+            # Requests per day: once exhausted, nothing gets through until the reset
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            if remaining_requests is not None and int(float(remaining_requests)) <= 0:
+                reset = parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+                if reset:
+                    bucket.blocked_until = max(bucket.blocked_until, now + reset)
+        except ValueError as e:
+            logger.warning(f"Unreadable rate-limit headers for {model}: {e}")
+
+        if throttled:
+            self._stats["throttled"] += 1
+            retry_after = parse_reset_duration(headers.get("retry-after")) or \
+                parse_reset_duration(headers.get("x-ratelimit-reset-tokens")) or 1.0
+            bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+            logger.warning(f"Rate limited on {model}, pausing calls for {retry_after:.1f}s")
+
+    def metrics(self) -> dict:
+        """Admitted, delayed, shed and throttled counters plus the remaining tokens per model."""
+        now = time.monotonic()
+        for bucket in self._buckets.values():
+            bucket.refill(now)
+        return {
+            **self._stats,
+            "models": {
+                model: {"tokens": bucket.tokens if bucket.capacity is not None else None,
+                        "capacity": bucket.capacity,
+                        "blocked_seconds": max(0.0, bucket.blocked_until - now)}
+                for model, bucket in self._buckets.items()
+            },
+        }
+
+
+# Global instance
+rate_limiter = RateLimiter()
@@ -0,0 +1,245 @@
+"""
+Guardrail checks for AI responses.
+
+`validate_ai_response` detects corrupted model output (runaway repetition,
+code-like garbage, leaked special tokens, gibberish) and substitutes a safe
+fallback. All patterns are compiled once at import and only run when a cheap
+substring/count prefilter says they can match, and phrase repetition is counted
+with a single pass over the word 3-grams, so a check costs microseconds even
+for responses of several thousand characters.
+
+`StreamValidator` applies the same checks incrementally while a streamed
+response arrives, so a corrupted stream can be abandoned early.
+"""
+
+import re
+from collections import Counter
+from typing import Optional, Tuple
+
+from metrics import validation_failures
+
+# Telegram's message length limit
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+
+def _has_repeated_word_run(words_lower: list, run_length: int) -> bool:
+    """True if the same token occurs run_length times in a row."""
+    run = 1
+    for previous, current in zip(words_lower, words_lower[1:]):
+        run = run + 1 if current == previous else 1
+        if run >= run_length:
+            return True
+    return False
+
+
+# Patterns that indicate corrupted output. Each one has a cheap necessary condition
+# (plain substring checks and counts); the regex only runs when that condition holds.
+_CORRUPTION_CHECKS = [(re.compile(pattern, re.IGNORECASE), prefilter) for pattern, prefilter in [
+    # Excessive repetition of random words
+    (r'\b(\w+)(\s+\1){10,}',  # Same word repeated 10+ times
+     lambda text, lower, words: _has_repeated_word_run(words, 9)),
+    # Random code-like patterns
+    (r'(BuilderFactory|externalActionCode|RODUCTION|\.visitInsn){5,}',
+     lambda text, lower, words: sum(lower.count(term) for term in ('builderfactory', 'externalactioncode', 'roduction', '.visitinsn')) >= 5),
+    # Excessive dashes or special characters
+    (r'[-]{20,}',
+     lambda text, lower, words: '-' * 20 in text),
+    # Random programming terms repeated
+    (r'(PSI|MAV|Basel|Toastr|contaminants|roscope){5,}',
+     lambda text, lower, words: sum(lower.count(term) for term in ('psi', 'mav', 'basel', 'toastr', 'contaminants', 'roscope')) >= 5),
+    # Excessive parentheses or brackets
+    (r'[\(\)\[\]]{10,}',
+     lambda text, lower, words: sum(text.count(char) for char in '()[]') >= 10),
+    # Excessive quotes (new pattern for the reported issue)
+    (r'["\'"]{15,}',  # 15+ consecutive quote characters
+     lambda text, lower, words: text.count('"') + text.count("'") >= 15),
+    # Repeated test/option strings (new pattern)
+    (r'(test){8,}',  # "test" repeated 8+ times
+     lambda text, lower, words: 'test' * 8 in lower),
+    (r'(option){8,}',  # "option" repeated 8+ times
+     lambda text, lower, words: 'option' * 8 in lower),
+    # Comma-separated repeated words (new pattern)
+    (r'("[^"]*",\s*){20,}',  # 20+ comma-separated quoted items
+     lambda text, lower, words: text.count('",') >= 20),
+    # Excessive commas
+    (r'[,]{10,}',  # 10+ consecutive commas
+     lambda text, lower, words: ',' * 10 in text),
+]]
+
+# Leaked special tokens and other fragments that never occur in a healthy reply (lowercase)
+_SUSPICIOUS_FRAGMENTS = [fragment.lower() for fragment in [
+    'AssistantClass', '<|python_tag|>', '<|reserved_special_token_', '"}"}"}"}',
+    'scalablytyped', 'надлеж', 'кто-то', '...",",",",",",",",",",",",",",",",",",",",'
+]]
+
+# Phrase repetition is only checked for responses longer than this many words
+_REPETITION_MIN_WORDS = 50
+# A 3-word phrase occurring more often than this counts as runaway repetition
+_REPETITION_MAX_COUNT = 5
+# Streamed text is re-scanned with this much overlap so patterns spanning two chunks are found
+_STREAM_SCAN_OVERLAP = 512
+
+
+def get_fallback_response(character_key: str = None) -> str:
+    """Returns an appropriate fallback response for a character."""
+    if character_key:
+        # Special fallback for narrator
+        if character_key == "narrator":
+            return "We step aside to talk in private, away from the others."
+
+        # Generic fallback for other characters
+        return "I need a moment to think about that properly."
+    return "I'm having trouble processing that request right now."
+
+
+def _find_corruption_pattern(text: str, text_lower: str, words_lower: list) -> Optional[str]:
+    for pattern, prefilter in _CORRUPTION_CHECKS:
+        if prefilter(text, text_lower, words_lower) and pattern.search(text):
+            return pattern.pattern
+    return None
+
+
+def _find_suspicious_fragment(text_lower: str) -> Optional[str]:
+    for fragment in _SUSPICIOUS_FRAGMENTS:
+        if fragment in text_lower:
+            return fragment
+    return None
+
+
+def _most_repeated_trigram(words: list) -> Tuple[Optional[str], int]:
+    """The most frequent 3-word phrase and its count, in one pass."""
+    trigrams = Counter(zip(words, words[1:], words[2:]))
+    if not trigrams:
+        return None, 0
+    trigram, count = trigrams.most_common(1)[0]
+    return " ".join(trigram), count
+
+
+def validate_ai_response(response: str, character_key: str = None) -> tuple[bool, str]:
+    """
+    Validates an AI response for corruption, excessive length, and other issues.
+    Returns (is_valid, cleaned_response_or_fallback)
+    """
+    if not response or not response.strip():
+        validation_failures.inc("empty")
+        return False, "I'm not sure how to respond to that."
+
+    response = response.strip()
+
+    # Check for excessive length (Telegram limit and corruption indicator)
+    if len(response) > TELEGRAM_MAX_MESSAGE_LENGTH:
+        print(f"WARNING: AI response too long ({len(response)} chars), truncating")
+        validation_failures.inc("truncated")
+        response = response[:TELEGRAM_MAX_MESSAGE_LENGTH-50] + "..."
+        return True, response
+
+    # Check for suspiciously long responses that might indicate corruption
+    if len(response) > 2000:
+        # For longer responses, do additional corruption checks
+        char_variety = len(set(response)) - len({' ', '\n', '\t'} & set(response))
+        if char_variety < 20:  # Very low character variety suggests repetition
+            print(f"WARNING: Suspiciously long response with low character variety ({char_variety} unique chars)")
+            validation_failures.inc("low_variety")
+            return False, get_fallback_response(character_key)
+
+    response_lower = response.lower()
+    words = response.split()
+
+    # Check for corruption patterns
+    corruption_pattern = _find_corruption_pattern(response, response_lower, response_lower.split())
+    if corruption_pattern:
+        print(f"WARNING: Corrupted AI response detected (pattern: {corruption_pattern[:20]}...)")
+        print(f"Corrupted response preview: {response[:200]}...")
+        validation_failures.inc("corruption")
+        return False, get_fallback_response(character_key)
+
+    # Check for excessive repetition of any phrase
+    if len(words) > _REPETITION_MIN_WORDS:  # Only check longer responses
+        phrase, count = _most_repeated_trigram(words)
+        if count > _REPETITION_MAX_COUNT:
+            print(f"WARNING: Excessive phrase repetition detected: '{phrase}'")
+            validation_failures.inc("repetition")
+            return False, get_fallback_response(character_key)
+
+    # Check for reasonable character-to-word ratio (detect gibberish)
+    if len(words) > 10:
+        avg_word_length = len(response.replace(' ', '')) / len(words)
+        if avg_word_length > 15:  # Unusually long average word length
+            print(f"WARNING: Suspicious word length pattern (avg: {avg_word_length})")
+            validation_failures.inc("gibberish")
+            return False, get_fallback_response(character_key)
+
+    # Check for incomplete or cut-off responses that might indicate corruption
+    suspicious_fragment = _find_suspicious_fragment(response_lower)
+    if suspicious_fragment:
+        print(f"WARNING: Suspicious token/pattern detected: '{suspicious_fragment[:20]}...'")
+        validation_failures.inc("suspicious_token")
+        return False, get_fallback_response(character_key)
+
+    return True, response
+
+
+class StreamValidator:
+    """
+    Incremental corruption checks for a streamed response.
+
+    `feed` each delta as it arrives; it returns False as soon as the text so far is
+    clearly corrupted. Only the new text (plus a small overlap) is scanned and 3-gram
+    counts are updated word by word, so the total cost stays linear in the response
+    length. The complete response should still go through validate_ai_response.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.valid = True
+        self.reason: Optional[str] = None
+        self._scanned_length = 0
+        self._word_buffer = ""
+        self._word_count = 0
+        self._last_words: list = []
+        self._trigrams = Counter()
+        self._top_trigram: tuple = ()
+
+    def feed(self, delta: str) -> bool:
+        """Adds a delta of the stream; returns False once corruption is detected."""
+        if not self.valid:
+            return False
+        self.text += delta
+
+        scan_start = max(0, self._scanned_length - _STREAM_SCAN_OVERLAP)
+        window = self.text[scan_start:]
+        self._scanned_length = len(self.text)
+
+        window_lower = window.lower()
+        corruption_pattern = _find_corruption_pattern(window, window_lower, window_lower.split())
+        if corruption_pattern:
+            return self._fail(f"pattern {corruption_pattern[:20]}")
+        suspicious_fragment = _find_suspicious_fragment(window_lower)
+        if suspicious_fragment:
+            return self._fail(f"token {suspicious_fragment[:20]}")
+
+        # Count 3-grams of the words completed by this delta (the last word may still grow)
+        self._word_buffer += delta
+        words = self._word_buffer.split()
+        if words and not self._word_buffer[-1].isspace():
+            self._word_buffer = words.pop()
+        else:
+            self._word_buffer = ""
+        for word in words:
+            self._word_count += 1
+            self._last_words = (self._last_words + [word])[-3:]
+            if len(self._last_words) == 3:
+                trigram = tuple(self._last_words)
+                self._trigrams[trigram] += 1
+                if self._trigrams[trigram] > self._trigrams[self._top_trigram]:
+                    self._top_trigram = trigram
+        if self._word_count > _REPETITION_MIN_WORDS and self._trigrams[self._top_trigram] > _REPETITION_MAX_COUNT:
+            return self._fail(f"repeated phrase '{' '.join(self._top_trigram)}'")
+        return True
+
+    def _fail(self, reason: str) -> bool:
+        self.valid = False
+        self.reason = reason
+        print(f"WARNING: Streamed AI response rejected ({reason})")
+        validation_failures.inc("stream")
+        return False
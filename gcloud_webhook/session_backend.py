@@ -0,0 +1,129 @@
+"""
+Shared storage behind the session stores (GAME_STATE, user_histories, message_cache).
+
+The session stores keep their entries in process memory. With a backend they
+also write changed entries through to it after each update and read a
+player's entries back from it before each of their updates (see
+session_store.py), so any instance can serve any player: the game state,
+conversation history and message cache follow the player instead of staying
+on the instance that created them.
+
+Backends store opaque bytes per (namespace, key):
+
+- `InMemoryBackend`: a process-local dict with the same semantics, for a
+  single instance, development and tests.
+- `RedisBackend`: any Redis-compatible server (Redis, Memorystore, Valkey...).
+  Needs the optional `redis` package.
+
+Values are pickled by the session stores, so the backend must only be
+reachable by the bot's own instances.
+"""
+
+import time
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+
+class SessionBackend:
+    """Key-value storage shared by the instances. Keys are namespaced per session store."""
+
+    name = "base"
+
+    async def get_many(self, namespace: str, keys: Iterable[Hashable]) -> Dict[Hashable, bytes]:
+        """The stored values of the keys that exist."""
+        raise NotImplementedError
+
+    async def set_many(self, namespace: str, values: Dict[Hashable, bytes], ttl_seconds: float = 0):
+        """Stores values; with ttl_seconds > 0 they expire that long after the write."""
+        raise NotImplementedError
+
+    async def delete(self, namespace: str, key: Hashable):
+        raise NotImplementedError
+
+    async def get(self, namespace: str, key: Hashable) -> Optional[bytes]:
+        return (await self.get_many(namespace, [key])).get(key)
+
+    async def aclose(self):
+        pass
+
+
+class InMemoryBackend(SessionBackend):
+    """Process-local backend; shares nothing between instances."""
+
+    name = "memory"
+
+    def __init__(self):
+        # (namespace, key) -> (value, expires_at or 0)
+        self._values: Dict[Tuple[str, Hashable], Tuple[bytes, float]] = {}
+
+    async def get_many(self, namespace: str, keys: Iterable[Hashable]) -> Dict[Hashable, bytes]:
+        now = time.monotonic()
+        found = {}
+        for key in keys:
+            item = self._values.get((namespace, key))
+            if item is None:
+                continue
+            if item[1] and item[1] <= now:
+                del self._values[(namespace, key)]
+                continue
+            found[key] = item[0]
+        return found
+
+    async def set_many(self, namespace: str, values: Dict[Hashable, bytes], ttl_seconds: float = 0):
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds > 0 else 0
+        for key, value in values.items():
+            self._values[(namespace, key)] = (value, expires_at)
+
+    async def delete(self, namespace: str, key: Hashable):
+        self._values.pop((namespace, key), None)
+
+
+class RedisBackend(SessionBackend):
+    """Backend on a Redis-compatible server; one pooled connection set per process."""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "glossa:", timeout: float = 2.0):
+        try:
+            # Optional dependency, only needed for SESSION_BACKEND=redis (imported here to keep cold starts short)
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("SESSION_BACKEND=redis needs the 'redis' package (pip install redis)") from e
+        self.prefix = prefix
+        # RESP2 is what every Redis-compatible server speaks
+        self.client = redis_asyncio.Redis.from_url(url, protocol=2, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+    def _key(self, namespace: str, key: Hashable) -> str:
+        return f"{self.prefix}{namespace}:{key}"
+
+    async def get_many(self, namespace: str, keys: Iterable[Hashable]) -> Dict[Hashable, bytes]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = await self.client.mget([self._key(namespace, key) for key in keys])
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    async def set_many(self, namespace: str, values: Dict[Hashable, bytes], ttl_seconds: float = 0):
+        if not values:
+            return
+        # One round trip for all the values of a flush
+        async with self.client.pipeline(transaction=False) as pipeline:
+            for key, value in values.items():
+                pipeline.set(self._key(namespace, key), value, ex=int(ttl_seconds) if ttl_seconds > 0 else None)
+            await pipeline.execute()
+
+    async def delete(self, namespace: str, key: Hashable):
+        await self.client.delete(self._key(namespace, key))
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def create_backend(kind: str, redis_url: str = "", prefix: str = "glossa:") -> Optional[SessionBackend]:
+    """The backend named by SESSION_BACKEND ("local" for none: stores stay process-local)."""
+    if kind == "local":
+        return None
+    if kind == "memory":
+        return InMemoryBackend()
+    if kind == "redis":
+        return RedisBackend(redis_url, prefix)
+    raise ValueError(f"Unknown SESSION_BACKEND '{kind}' (expected local, memory or redis)")
@@ -0,0 +1,323 @@
+"""
+Bounded in-memory session store.
+
+`SessionStore` is a drop-in replacement for the plain module-level dicts that
+used to hold GAME_STATE, user_histories and message_cache. It keeps entries in
+least-recently-used order and evicts them when they expire (TTL), when there
+are too many of them, or when their estimated size exceeds the byte budget.
+Sizes are estimated by walking the values, so entries written or handed out
+are only re-measured every SIZE_CHECK_WRITES writes and for metrics.
+A store can be given an async loader that rehydrates a missing entry (e.g. a
+game state from GameStateManager) through `get_or_load`.
+
+With a shared backend (session_backend.py) the store is a write-through,
+read-through cache in front of it: entries written or handed out are marked
+dirty and `flush` writes those that changed to the backend (after every update
+the update queue flushes that player's entry, plus the entries written to
+stores that are not per player); `refresh` reads a player's entry back before
+their update, replacing the local copy if another instance changed it, and
+`get_or_load` asks the backend before the loader.
+"""
+
+import asyncio
+import logging
+import pickle
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Iterator, List, Optional
+
+from session_backend import SessionBackend
+
+logger = logging.getLogger(__name__)
+
+# All stores created in this process, for metrics reporting
+_STORES: List["SessionStore"] = []
+
+# Writes between two measurements of the changed entries (and checks of the byte budget)
+SIZE_CHECK_WRITES = 32
+
+
+def _estimate_size(value: Any, _depth: int = 0) -> int:
+    """Approximate deep size of a value in bytes (containers are followed a few levels deep)."""
+    size = sys.getsizeof(value)
+    if _depth >= 6:
+        return size
+    if isinstance(value, dict):
+        size += sum(_estimate_size(k, _depth + 1) + _estimate_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_estimate_size(item, _depth + 1) for item in value)
+    return size
+
+
+class SessionStore(MutableMapping):
+    """Dict-like store with LRU/TTL eviction, byte accounting and optional rehydration on a miss."""
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float, max_bytes: int,
+                 loader: Optional[Callable[[Hashable], Awaitable[Any]]] = None,
+                 user_key: Optional[Callable[[int], Hashable]] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.loader = loader
+        # Maps a user id to this store's key, for stores holding one entry per player (refreshed per update)
+        self.user_key = user_key
+        self.backend: Optional[SessionBackend] = None
+        # key -> [value, size_in_bytes, last_access_time]
+        self._entries: "OrderedDict[Hashable, list]" = OrderedDict()
+        # Keys handed out since their size was last measured (values are mutated in place)
+        self._stale_sizes = set()
+        self._total_bytes = 0
+        self._writes_since_size_check = 0
+        # Keys written or handed out since the last flush, the written ones among them, and keys deleted since then
+        self._dirty = set()
+        self._written = set()
+        self._deleted = set()
+        # key -> hash of the value as last written to or read from the backend
+        self._synced: Dict[Hashable, int] = {}
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "rehydrations": 0,
+                       "backend_reads": 0, "backend_writes": 0, "backend_errors": 0}
+        _STORES.append(self)
+
+    def set_loader(self, loader: Callable[[Hashable], Awaitable[Any]]):
+        """Registers the async function used to rehydrate missing entries."""
+        self.loader = loader
+
+    def set_backend(self, backend: Optional[SessionBackend]):
+        """Puts the store in front of a shared backend (None keeps it process-local)."""
+        self.backend = backend
+
+    def _is_expired(self, entry: list, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry[2] > self.ttl_seconds
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry[1]
+        self._stale_sizes.discard(key)
+        self._dirty.discard(key)
+        self._written.discard(key)
+        self._synced.pop(key, None)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None or self._is_expired(entry, now):
+            if entry is not None:
+                self._remove(key)
+                self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            raise KeyError(key)
+        entry[2] = now
+        self._entries.move_to_end(key)
+        self._stale_sizes.add(key)
+        if self.backend is not None:
+            self._dirty.add(key)
+        self._stats["hits"] += 1
+        return entry[0]
+
+    def __setitem__(self, key: Hashable, value: Any):
+        if key in self._entries:
+            self._remove(key)
+        # Measured with the next size check
+        self._entries[key] = [value, 0, time.monotonic()]
+        self._stale_sizes.add(key)
+        self._writes_since_size_check += 1
+        if self.backend is not None:
+            self._dirty.add(key)
+            self._written.add(key)
+            self._deleted.discard(key)
+        self._enforce_limits()
+
+    def __delitem__(self, key: Hashable):
+        if key not in self._entries:
+            raise KeyError(key)
+        self._remove(key)
+        if self.backend is not None:
+            self._deleted.add(key)
+
+    def __contains__(self, key: object) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and not self._is_expired(entry, time.monotonic())
+
+    def __iter__(self) -> Iterator[Hashable]:
+        now = time.monotonic()
+        return iter([key for key, entry in self._entries.items() if not self._is_expired(entry, now)])
+
+    def __len__(self) -> int:
+        self._drop_expired(time.monotonic())
+        return len(self._entries)
+
+    def _refresh_sizes(self):
+        """Re-measures entries that may have been mutated since they were last measured."""
+        for key in self._stale_sizes:
+            entry = self._entries.get(key)
+            if entry is not None:
+                new_size = _estimate_size(entry[0])
+                self._total_bytes += new_size - entry[1]
+                entry[1] = new_size
+        self._stale_sizes.clear()
+        self._writes_since_size_check = 0
+
+    def _drop_expired(self, now: float):
+        """Removes expired entries (the least recently used ones, at the front)."""
+        while self._entries:
+            oldest_key, oldest_entry = next(iter(self._entries.items()))
+            if not self._is_expired(oldest_entry, now):
+                break
+            self._remove(oldest_key)
+            self._stats["expirations"] += 1
+
+    def _enforce_limits(self):
+        """Drops expired entries, then least recently used ones until the store fits its limits."""
+        self._drop_expired(time.monotonic())
+
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+        if self.max_bytes > 0 and self._writes_since_size_check >= SIZE_CHECK_WRITES:
+            self._refresh_sizes()
+            # Never evict the entry that was just written
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        oldest_key = next(iter(self._entries))
+        self._remove(oldest_key)
+        self._stats["evictions"] += 1
+        logger.debug(f"Session store '{self.name}': evicted {oldest_key!r}")
+
+    async def get_or_load(self, key: Hashable) -> Any:
+        """Returns the entry for key, rehydrating it from the backend or the loader on a miss. None if unavailable."""
+        try:
+            return self[key]
+        except KeyError:
+            pass
+        if self.backend is not None:
+            await self.refresh(key)
+            if key in self:
+                return self[key]
+        if self.loader is None:
+            return None
+        value = await self.loader(key)
+        if value is None:
+            return None
+        # Another coroutine may have created the entry while we were loading
+        if key in self:
+            return self[key]
+        self[key] = value
+        self._stats["rehydrations"] += 1
+        return value
+
+    def clear_local(self, keys: Optional[List[Hashable]] = None):
+        """Drops the in-process copies of keys (all if None); the backend keeps them. Simulates another instance."""
+        for key in list(self._entries) if keys is None else keys:
+            if key in self._entries:
+                self._remove(key)
+
+    async def refresh(self, key: Hashable):
+        """Reads key from the backend and replaces the local entry if the stored value is newer."""
+        if self.backend is None:
+            return
+        try:
+            data = await self.backend.get(self.name, key)
+        except Exception as e:
+            self._stats["backend_errors"] += 1
+            logger.warning(f"Session store '{self.name}': backend read of {key!r} failed: {e}")
+            return
+        self._stats["backend_reads"] += 1
+        if data is None or (key in self and self._synced.get(key) == hash(data)):
+            # Nothing stored, or this instance wrote (or already read) the stored version
+            return
+        self[key] = pickle.loads(data)
+        self._dirty.discard(key)
+        self._synced[key] = hash(data)
+
+    async def flush(self, keys: Optional[Iterable[Hashable]] = None):
+        """Writes dirty entries (of keys, or all) whose value changed since the last sync, and deletions."""
+        if self.backend is None or not (self._dirty or self._deleted):
+            return
+        if keys is None:
+            dirty, self._dirty = self._dirty, set()
+            deleted, self._deleted = self._deleted, set()
+        else:
+            keys = set(keys)
+            dirty, deleted = self._dirty & keys, self._deleted & keys
+            self._dirty -= dirty
+            self._deleted -= deleted
+        written = self._written & dirty
+        self._written -= written
+        changed = {}
+        for key in dirty:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            try:
+                data = pickle.dumps(entry[0], protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                logger.warning(f"Session store '{self.name}': cannot serialise {key!r}: {e}")
+                continue
+            if self._synced.get(key) != hash(data):
+                changed[key] = data
+        try:
+            await self.backend.set_many(self.name, changed, self.ttl_seconds)
+            for key in deleted:
+                await self.backend.delete(self.name, key)
+        except Exception as e:
+            # Keep them dirty so the next flush retries
+            self._dirty |= dirty
+            self._written |= written
+            self._deleted |= deleted
+            self._stats["backend_errors"] += 1
+            logger.warning(f"Session store '{self.name}': backend write failed: {e}")
+            return
+        for key, data in changed.items():
+            if key in self._entries:
+                self._synced[key] = hash(data)
+        self._stats["backend_writes"] += len(changed)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Current size and eviction counters of the store."""
+        self._refresh_sizes()
+        return {
+            "name": self.name,
+            "entries": len(self),
+            "bytes": self._total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            **self._stats,
+        }
+
+
+def all_store_metrics() -> List[Dict[str, Any]]:
+    """Metrics for every session store in this process."""
+    return [store.metrics() for store in _STORES]
+
+
+def set_session_backend(backend: Optional[SessionBackend]):
+    """Puts every session store in front of the backend (None keeps them process-local)."""
+    for store in _STORES:
+        store.set_backend(backend)
+
+
+async def refresh_user_sessions(user_id: int):
+    """Reads a player's per-user entries (game state, history) from the backend before their update."""
+    await asyncio.gather(*(store.refresh(store.user_key(user_id)) for store in _STORES
+                           if store.backend is not None and store.user_key is not None))
+
+
+async def flush_user_sessions(user_id: int):
+    """
+    Writes what a player's update changed: their per-user entries, and the entries written to the other stores.
+
+    Entries of players whose updates are still running are left for their own flush, so half-applied
+    states are not published.
+    """
+    await asyncio.gather(*(store.flush([store.user_key(user_id)] if store.user_key is not None else list(store._written))
+                           for store in _STORES if store.backend is not None))
+
+
+async def flush_sessions():
+    """Writes the changed entries of every store to the backend (shutdown)."""
+    await asyncio.gather(*(store.flush() for store in _STORES if store.backend is not None))
@@ -0,0 +1,127 @@
+"""
+Cold-start support: secret loading and a timing breakdown of startup.
+
+Secrets are read through one shared Secret Manager client (creating a client
+looks up credentials, which takes seconds), fetched concurrently and cached
+for the lifetime of the process. A failed client creation is remembered too,
+so every other secret goes straight to its environment variable fallback
+instead of repeating the lookup.
+
+Heavy SDKs (google.cloud.storage, groq) are imported on first use by the
+modules that need them; `preload_modules` imports them in a worker thread
+once the bot is ready, so usually the first request does not pay for them
+either.
+
+`startup_timer` splits the time from the first import of this module to the
+bot being ready into consecutive checkpoints (imports, secrets, bot
+initialisation...), logged once at startup and exported at /metrics.
+"""
+
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# SDKs imported lazily by the bot's modules and preloaded after startup
+PRELOAD_MODULES = ("google.cloud.storage", "google.api_core.exceptions", "groq")
+
+
+class StartupTimer:
+    """Consecutive startup checkpoints, measured from the first import of this module."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: Dict[str, float] = {}
+        self.ready_seconds: Optional[float] = None
+
+    def checkpoint(self, name: str):
+        """Records the time since the previous checkpoint as phase `name`."""
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + now - self._last
+        self._last = now
+
+    def mark_ready(self):
+        """Closes the breakdown when the instance can take traffic and logs it."""
+        if self.ready_seconds is not None:
+            return
+        self.ready_seconds = time.perf_counter() - self.started
+        breakdown = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        logger.info(f"Cold start: ready after {self.ready_seconds:.2f}s ({breakdown})")
+
+    def metrics(self) -> Dict[str, object]:
+        return {"ready_seconds": self.ready_seconds, "phases": dict(self.phases)}
+
+
+class SecretLoader:
+    """Reads secrets from Secret Manager (or environment variables) with one shared client and a cache."""
+
+    def __init__(self, project_id: str, use_secret_manager: bool = True, timeout: float = 10.0):
+        self.project_id = project_id
+        self.use_secret_manager = use_secret_manager
+        self.timeout = timeout
+        self._client = None
+        self._client_error: Optional[Exception] = None
+        self._client_lock = threading.Lock()
+        self._cache: Dict[str, Optional[str]] = {}
+
+    def _get_client(self):
+        with self._client_lock:
+            if self._client is None and self._client_error is None:
+                try:
+                    # Deferred import: only needed when Secret Manager is used
+                    from google.cloud import secretmanager
+                    self._client = secretmanager.SecretManagerServiceClient()
+                except Exception as e:
+                    self._client_error = e
+            if self._client_error is not None:
+                raise self._client_error
+            return self._client
+
+    def _fetch(self, secret_name: str) -> str:
+        name = f"projects/{self.project_id}/secrets/{secret_name}/versions/latest"
+        response = self._get_client().access_secret_version(request={"name": name}, timeout=self.timeout)
+        return response.payload.data.decode("UTF-8").strip()
+
+    def get(self, secret_name: str, default_env: str = None) -> Optional[str]:
+        """Safely retrieves a secret from Google Secret Manager or, failing that, an environment variable."""
+        if secret_name in self._cache:
+            return self._cache[secret_name]
+        value = None
+        if self.use_secret_manager:
+            try:
+                value = self._fetch(secret_name)
+            except Exception as e:
+                # Fallback to environment variables for local development
+                if default_env and os.getenv(default_env):
+                    print(f"WARNING: Using environment variable for {secret_name}. Secret Manager failed: {e}", file=sys.stderr)
+        if value is None and default_env:
+            value = (os.getenv(default_env) or "").strip() or None
+        self._cache[secret_name] = value
+        return value
+
+    def load_all(self, secrets: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+        """Fetches several secrets ({secret name: fallback env var}) concurrently."""
+        with ThreadPoolExecutor(max_workers=max(1, len(secrets))) as executor:
+            futures = {name: executor.submit(self.get, name, env) for name, env in secrets.items()}
+            return {name: future.result() for name, future in futures.items()}
+
+
+def preload_modules():
+    """Imports the lazily imported SDKs (run in a worker thread after startup)."""
+    for module in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Could not preload {module}: {e}")
+    startup_timer.checkpoint("preload (after ready)")
+
+
+# Global instance
+startup_timer = StartupTimer()
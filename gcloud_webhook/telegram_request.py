@@ -0,0 +1,40 @@
+"""
+HTTP transport of the bot's Telegram Bot API requests.
+
+A thin HTTPXRequest subclass that wraps every Bot API call in a
+`telegram.<method>` tracing span, so sends, edits and callback answers show
+up as stages of the update that made them, and counts requests, error
+responses and latencies per method for /metrics.
+"""
+
+import time
+from typing import Optional
+
+from telegram.request import HTTPXRequest, RequestData
+
+from tracing import tracer
+from metrics import telegram_requests, telegram_errors, telegram_latency
+
+
+class TelegramRequest(HTTPXRequest):
+    """HTTPXRequest that traces and counts each Bot API call."""
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.monotonic()
+        with tracer.span(f"telegram.{api_method}") as span:
+            try:
+                status_code, payload = await super().do_request(url, method, request_data, **kwargs)
+            except Exception:
+                telegram_requests.inc(api_method, "network_error")
+                telegram_errors.inc(api_method, 0)
+                raise
+            finally:
+                telegram_latency.observe(time.monotonic() - started, api_method)
+            span.set_attribute("status_code", status_code)
+            if status_code >= 400:
+                telegram_requests.inc(api_method, "error")
+                telegram_errors.inc(api_method, status_code)
+            else:
+                telegram_requests.inc(api_method, "ok")
+            return status_code, payload
@@ -0,0 +1,201 @@
+"""
+Summarises a trace file written by tracing.py.
+
+Prints a per-stage latency table (count, total and self time, p50/p95/max
+per span name) and a call tree that aggregates every path of nested spans,
+with each path's share of its root's time, so the slow stages of a turn stand
+out. `--folded` prints collapsed stacks instead (one "a;b;c <microseconds>"
+line per path, self time only) for flamegraph.pl or speedscope.
+
+Usage:
+    python trace_report.py /tmp/glossa_traces.jsonl
+    python trace_report.py traces.jsonl --action message --group-by cache
+    python trace_report.py traces.jsonl --user 42 --depth 4
+    python trace_report.py traces.jsonl --folded > stacks.txt
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+NANOS_PER_MS = 1_000_000
+
+
+def load_spans(paths: Iterable[str]) -> List[dict]:
+    """Finished spans from JSON-lines files (lines that do not parse are skipped)."""
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as trace_file:
+            for line in trace_file:
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue
+                if span.get("end_time_unix_nano"):
+                    spans.append(span)
+    return spans
+
+
+def matches(span: dict, filters: Dict[str, str]) -> bool:
+    attributes = span.get("attributes", {})
+    return all(str(attributes.get(key)) == value for key, value in filters.items())
+
+
+def duration_ns(span: dict) -> int:
+    return span["end_time_unix_nano"] - span["start_time_unix_nano"]
+
+
+def self_time_ns(span: dict, children: List[dict]) -> int:
+    """Duration minus the time covered by children (concurrent children are counted once)."""
+    start, end = span["start_time_unix_nano"], span["end_time_unix_nano"]
+    intervals = sorted((max(start, child["start_time_unix_nano"]), min(end, child["end_time_unix_nano"]))
+                       for child in children)
+    covered, cursor = 0, start
+    for child_start, child_end in intervals:
+        child_start = max(child_start, cursor)
+        if child_end > child_start:
+            covered += child_end - child_start
+            cursor = child_end
+    return max(0, end - start - covered)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def stage_key(span: dict, group_by: Optional[str]) -> str:
+    value = span.get("attributes", {}).get(group_by) if group_by else None
+    return f"{span['name']} [{group_by}={value}]" if value is not None else span["name"]
+
+
+def build_children(spans: List[dict]) -> Tuple[List[dict], Dict[str, List[dict]]]:
+    """Roots (spans whose parent is not in the set) and children per span id."""
+    by_id = {span["span_id"]: span for span in spans}
+    children: Dict[str, List[dict]] = defaultdict(list)
+    roots = []
+    for span in spans:
+        parent = span.get("parent_span_id")
+        if parent in by_id:
+            children[parent].append(span)
+        else:
+            roots.append(span)
+    return roots, children
+
+
+def stage_table(spans: List[dict], children: Dict[str, List[dict]], group_by: Optional[str]) -> List[Tuple[str, dict]]:
+    stages: Dict[str, dict] = defaultdict(lambda: {"durations": [], "self": 0})
+    for span in spans:
+        stage = stages[stage_key(span, group_by)]
+        stage["durations"].append(duration_ns(span) / NANOS_PER_MS)
+        stage["self"] += self_time_ns(span, children.get(span["span_id"], [])) / NANOS_PER_MS
+    rows = []
+    for key, stage in stages.items():
+        durations = sorted(stage["durations"])
+        rows.append((key, {"count": len(durations), "total": sum(durations), "self": stage["self"],
+                           "p50": percentile(durations, 0.50), "p95": percentile(durations, 0.95), "max": durations[-1]}))
+    return sorted(rows, key=lambda row: row[1]["self"], reverse=True)
+
+
+def call_tree(roots: List[dict], children: Dict[str, List[dict]]) -> Dict[Tuple[str, ...], dict]:
+    """
+    Count, total and self time per path of span names from a root.
+
+    Roots also get their extent: from their start to the end of their last descendant. The
+    webhook answers before the queued processing finishes, so shares are relative to the extent.
+    """
+    paths: Dict[Tuple[str, ...], dict] = defaultdict(lambda: {"count": 0, "total": 0.0, "self": 0.0, "extent": 0.0})
+    for root in roots:
+        end = root["end_time_unix_nano"]
+        stack = [((root["name"],), root)]
+        while stack:
+            path, span = stack.pop()
+            span_children = children.get(span["span_id"], [])
+            node = paths[path]
+            node["count"] += 1
+            node["total"] += duration_ns(span) / NANOS_PER_MS
+            node["self"] += self_time_ns(span, span_children) / NANOS_PER_MS
+            end = max(end, span["end_time_unix_nano"])
+            stack.extend((path + (child["name"],), child) for child in span_children)
+        paths[(root["name"],)]["extent"] += (end - root["start_time_unix_nano"]) / NANOS_PER_MS
+    return paths
+
+
+def print_stage_table(rows: List[Tuple[str, dict]], top: int):
+    print(f"{'stage':<48}{'count':>7}{'total ms':>11}{'self ms':>11}{'p50':>9}{'p95':>9}{'max':>9}")
+    for key, row in rows[:top]:
+        print(f"{key[:47]:<48}{row['count']:>7}{row['total']:>11.0f}{row['self']:>11.0f}"
+              f"{row['p50']:>9.1f}{row['p95']:>9.1f}{row['max']:>9.1f}")
+
+
+def print_call_tree(paths: Dict[Tuple[str, ...], dict], max_depth: int, min_share: float):
+    print(f"{'path':<60}{'count':>7}{'avg ms':>10}{'self ms':>10}{'% root':>9}")
+
+    def visit(path: Tuple[str, ...]):
+        node = paths[path]
+        root_extent = paths[path[:1]]["extent"] or 1.0
+        # A root row shows its extent, so it stands for the whole (possibly backgrounded) trace
+        elapsed = node["extent"] if len(path) == 1 else node["total"]
+        share = 100 * elapsed / root_extent
+        if len(path) > 1 and share < min_share:
+            return
+        label = "  " * (len(path) - 1) + path[-1]
+        print(f"{label[:59]:<60}{node['count']:>7}{elapsed / node['count']:>10.1f}"
+              f"{node['self'] / node['count']:>10.1f}{share:>8.1f}%")
+        if len(path) < max_depth:
+            child_paths = [child for child in paths if len(child) == len(path) + 1 and child[:len(path)] == path]
+            for child in sorted(child_paths, key=lambda child: paths[child]["total"], reverse=True):
+                visit(child)
+
+    for root in sorted((path for path in paths if len(path) == 1), key=lambda path: paths[path]["extent"], reverse=True):
+        visit(root)
+
+
+def print_folded(paths: Dict[Tuple[str, ...], dict]):
+    for path, node in sorted(paths.items()):
+        microseconds = int(node["self"] * 1000)
+        if microseconds > 0:
+            print(f"{';'.join(path)} {microseconds}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="trace files (JSON lines)")
+    parser.add_argument("--user", help="only spans of this user_id")
+    parser.add_argument("--action", help="only spans of this action type (message, or a button action such as explain)")
+    parser.add_argument("--where", action="append", default=[], metavar="KEY=VALUE",
+                        help="only spans with this attribute value (repeatable)")
+    parser.add_argument("--group-by", metavar="ATTRIBUTE", help="split stages by an attribute, e.g. cache or route")
+    parser.add_argument("--top", type=int, default=40, help="stages shown in the table")
+    parser.add_argument("--depth", type=int, default=6, help="depth of the call tree")
+    parser.add_argument("--min-share", type=float, default=0.5, help="hide tree paths below this %% of their root")
+    parser.add_argument("--folded", action="store_true", help="print collapsed stacks for flame graph tools instead")
+    args = parser.parse_args(argv)
+
+    filters = dict(condition.split("=", 1) for condition in args.where)
+    if args.user:
+        filters["user_id"] = args.user
+    if args.action:
+        filters["action"] = args.action
+    spans = [span for span in load_spans(args.files) if matches(span, filters)]
+    if not spans:
+        sys.exit("No matching spans.")
+
+    roots, children = build_children(spans)
+    paths = call_tree(roots, children)
+    if args.folded:
+        print_folded(paths)
+        return
+
+    traces = len({span["trace_id"] for span in spans})
+    print(f"{len(spans)} spans in {traces} traces\n")
+    print_stage_table(stage_table(spans, children, args.group_by), args.top)
+    print()
+    print_call_tree(paths, args.depth, args.min_share)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Per-stage latency tracing of the update pipeline.
+
+A span times one stage of handling an update (webhook parsing, queue wait,
+GCS loads, director decision, each LLM call, each Telegram request, scene
+pauses...). Spans nest through a context variable, so a span opened while
+another is active becomes its child, also across `asyncio.create_task`
+(tasks copy the context). The webhook opens the root span of every update;
+the update queue, the handlers and the services below add children.
+
+Spans follow the OpenTelemetry span model (W3C trace/span ids, parent span
+id, start/end in Unix nanoseconds, attributes, status) and are appended as
+JSON lines to TRACE_FILE. `user_id` and `action` are copied from a parent
+span to its children, so every stage can be filtered by player and by action
+type. Summarise a trace file with `python trace_report.py <file>`.
+
+Tracing is off unless TRACING_ENABLED is set; spans are then no-ops.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import TRACING_ENABLED, TRACE_FILE, TRACE_SAMPLE_RATE, TRACE_FLUSH_SPANS, TRACE_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Attributes a span inherits from its parent
+INHERITED_ATTRIBUTES = ("user_id", "action")
+SERVICE_NAME = "glossa"
+
+
+class Span:
+    """One timed stage. Attributes are set with `set_attribute`/`set_attributes`."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "start_ns", "end_ns", "attributes", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.status = "OK"
+        self.error = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": "INTERNAL",
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.error} if self.error else {"code": self.status},
+            "resource": {"service.name": SERVICE_NAME},
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off or the trace is not sampled."""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes: Any):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+# The active span of the current task (a _NoopSpan inside an unsampled trace)
+_current_span: ContextVar[Any] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Creates spans and writes finished ones to a JSON-lines file in batches."""
+
+    def __init__(self, enabled: bool = TRACING_ENABLED, path: str = TRACE_FILE, sample_rate: float = TRACE_SAMPLE_RATE,
+                 flush_spans: int = TRACE_FLUSH_SPANS, flush_interval: float = TRACE_FLUSH_INTERVAL):
+        self.enabled = enabled
+        self.path = path
+        self.sample_rate = sample_rate
+        self.flush_spans = flush_spans
+        self.flush_interval = flush_interval
+        self._buffer: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {"spans": 0, "traces": 0, "unsampled": 0, "write_errors": 0}
+
+    def _start(self, name: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        if parent is _NOOP_SPAN:
+            return _NOOP_SPAN
+        if parent is None:
+            if random.random() >= self.sample_rate:
+                self._stats["unsampled"] += 1
+                return _NOOP_SPAN
+            self._stats["traces"] += 1
+            return Span(name, f"{random.getrandbits(128):032x}", None, attributes)
+        inherited = {key: parent.attributes[key] for key in INHERITED_ATTRIBUTES if key in parent.attributes}
+        return Span(name, parent.trace_id, parent.span_id, {**inherited, **attributes})
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """Times the enclosed block as a child of the active span (or as a new trace)."""
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+        span = self._start(name, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if isinstance(span, Span):
+                span.status = "ERROR"
+                span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            if isinstance(span, Span):
+                self._finish(span)
+
+    def traced(self, name: Optional[str] = None):
+        """Decorator running an async function inside a span (named after the function by default)."""
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name: str, seconds: float, **attributes: Any):
+        """Adds a span for a stage that has just finished and took `seconds` (e.g. a queue wait)."""
+        if not self.enabled:
+            return
+        span = self._start(name, attributes)
+        if isinstance(span, Span):
+            span.start_ns -= int(seconds * 1e9)
+            self._finish(span)
+
+    async def sleep(self, seconds: float, reason: str):
+        """asyncio.sleep for intentional pauses (dramatic pauses, scene gaps), traced as a `pause` span."""
+        with self.span("pause", reason=reason, seconds=seconds):
+            await asyncio.sleep(seconds)
+
+    def current(self) -> Any:
+        """The active span (a no-op stand-in if there is none)."""
+        return _current_span.get() or _NOOP_SPAN
+
+    def set_attributes(self, **attributes: Any):
+        """Sets attributes on the active span."""
+        self.current().set_attributes(**attributes)
+
+    def _finish(self, span: Span):
+        span.end_ns = time.time_ns()
+        self._stats["spans"] += 1
+        self._buffer.append(span.to_dict())
+        if len(self._buffer) >= self.flush_spans or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Appends the buffered spans to the trace file."""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        spans, self._buffer = self._buffer, []
+        try:
+            with self._lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as trace_file:
+                    trace_file.write("".join(json.dumps(span, default=str) + "\n" for span in spans))
+        except OSError as e:
+            self._stats["write_errors"] += 1
+            logger.warning(f"Failed to write {len(spans)} spans to {self.path}: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Span, trace and write-error counters."""
+        return {"enabled": self.enabled, "buffered": len(self._buffer), **self._stats}
+
+
+# Global instance
+tracer = Tracer()
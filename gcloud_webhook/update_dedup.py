@@ -0,0 +1,119 @@
+"""
+Duplicate suppression for Telegram webhook redeliveries.
+
+Telegram redelivers an update when it thinks the previous delivery failed,
+which used to run the whole director/LLM pipeline twice. Every update_id is
+claimed before the update is parsed: ids seen within a sliding window of recent
+updates are dropped. Optionally the claim is also made in Google Cloud Storage
+(create-if-absent), so a redelivery routed to another instance is dropped too.
+The shared markers should be removed by a bucket lifecycle rule on the
+`update_dedup/` prefix (e.g. delete after 1 day).
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+
+from config import GCS_BUCKET_NAME, TELEGRAM_TOKEN, UPDATE_DEDUP_WINDOW, UPDATE_DEDUP_SHARED
+from metrics import gcs_operation
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateDeduplicator:
+    """Sliding window of recently seen update_ids, optionally shared through GCS."""
+
+    def __init__(self, window: int = UPDATE_DEDUP_WINDOW, shared: bool = UPDATE_DEDUP_SHARED):
+        self.storage_client = None
+        self.bucket = None
+        self.window = window
+        self.shared = shared
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+        self._stats = {"accepted": 0, "duplicates": 0, "shared_duplicates": 0}
+
+    def _get_bucket(self):
+        """Lazy initialization of storage client and bucket."""
+        if self.storage_client is None and GCS_BUCKET_NAME:
+            try:
+                # Deferred import: the SDK is only loaded once storage is used (see startup.py)
+                from google.cloud import storage
+                self.storage_client = storage.Client()
+                self.bucket = self.storage_client.bucket(GCS_BUCKET_NAME)
+            except Exception as e:
+                logger.error(f"Failed to initialize GCS bucket '{GCS_BUCKET_NAME}': {e}")
+                self.bucket = None
+        return self.bucket
+
+    @staticmethod
+    def _get_marker_blob_name(update_id: int) -> str:
+        # update_ids are only unique per bot
+        return f"update_dedup/bot_{TELEGRAM_TOKEN.split(':', 1)[0]}/{update_id}"
+
+    def _claim_shared(self, update_id: int) -> bool:
+        """Creates the shared marker; False if another instance already created it."""
+        bucket = self._get_bucket()
+        if not bucket:
+            return True
+        # Deferred import, like the storage SDK (see startup.py)
+        from google.api_core.exceptions import PreconditionFailed
+        # An existing marker is an expected answer, not a failed operation
+        with gcs_operation("update_dedup", "claim"):
+            try:
+                bucket.blob(self._get_marker_blob_name(update_id)).upload_from_string("", if_generation_match=0)
+                return True
+            except PreconditionFailed:
+                return False
+
+    def _release_shared(self, update_id: int):
+        bucket = self._get_bucket()
+        if not bucket:
+            return
+        from google.api_core.exceptions import NotFound
+        with gcs_operation("update_dedup", "release"):
+            try:
+                bucket.blob(self._get_marker_blob_name(update_id)).delete()
+            except NotFound:
+                pass
+
+    async def claim(self, update_id: int) -> bool:
+        """Returns True the first time an update_id is seen, False for a duplicate."""
+        if update_id in self._seen:
+            self._stats["duplicates"] += 1
+            logger.info(f"Dropping duplicate update {update_id}")
+            return False
+        self._seen[update_id] = None
+        while len(self._seen) > self.window:
+            self._seen.popitem(last=False)
+
+        if self.shared:
+            try:
+                claimed = await asyncio.to_thread(self._claim_shared, update_id)
+            except Exception as e:
+                # Prefer processing an update twice over losing it
+                logger.warning(f"Shared dedup check failed for update {update_id}, processing it: {e}")
+                claimed = True
+            if not claimed:
+                self._stats["duplicates"] += 1
+                self._stats["shared_duplicates"] += 1
+                logger.info(f"Dropping duplicate update {update_id} (claimed by another instance)")
+                return False
+
+        self._stats["accepted"] += 1
+        return True
+
+    async def release(self, update_id: int):
+        """Forgets a claim, e.g. when the update was refused and Telegram should redeliver it."""
+        self._seen.pop(update_id, None)
+        if self.shared:
+            try:
+                await asyncio.to_thread(self._release_shared, update_id)
+            except Exception as e:
+                logger.warning(f"Failed to release shared dedup marker for update {update_id}: {e}")
+
+    def metrics(self) -> dict:
+        """Window size and duplicate counters."""
+        return {"window": len(self._seen), **self._stats}
+
+
+# Global instance
+update_dedup = UpdateDeduplicator()
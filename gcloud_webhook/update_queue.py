@@ -0,0 +1,145 @@
+"""
+In-process queue between the webhook and the Telegram update handlers.
+
+The webhook hands every update to `UpdateQueue.submit` and answers Telegram
+immediately; the update is then processed in the background. Each update runs
+in its user's lane (see user_lanes.py), so one player's updates are handled
+strictly in arrival order and never mutate the same game state concurrently,
+while updates of different players run in parallel up to a global concurrency
+limit. When too many updates are pending, `submit` refuses new ones so the
+webhook can answer 503 and Telegram retries later (backpressure).
+
+With a shared session backend, the player's sessions are read from it before
+their update is handled and the changed ones are written back afterwards.
+"""
+
+import asyncio
+import logging
+import time
+import traceback
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from telegram import Update
+
+from config import UPDATE_QUEUE_CONCURRENCY, UPDATE_QUEUE_MAX_PENDING, UPDATE_QUEUE_DRAIN_TIMEOUT
+from tracing import tracer
+from user_lanes import user_lanes
+from session_store import refresh_user_sessions, flush_user_sessions
+
+logger = logging.getLogger(__name__)
+
+
+def get_update_user_id(update: Update) -> int:
+    """The id that orders an update: its user, else its chat, else the update itself."""
+    if update.effective_user:
+        return update.effective_user.id
+    if update.effective_chat:
+        return update.effective_chat.id
+    return update.update_id
+
+
+class UpdateQueue:
+    """Background update processing with per-user lanes, bounded concurrency and a bounded backlog."""
+
+    def __init__(self, concurrency: int = UPDATE_QUEUE_CONCURRENCY, max_pending: int = UPDATE_QUEUE_MAX_PENDING):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._processor: Optional[Callable[[Update], Awaitable[Any]]] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._running = False
+        self._in_flight = 0
+        self._observers: List[Callable[[Update, float, bool], Any]] = []
+        self._stats = {"enqueued": 0, "processed": 0, "failed": 0, "rejected": 0,
+                       "max_pending": 0, "max_wait_seconds": 0.0}
+
+    def start(self, processor: Callable[[Update], Awaitable[Any]]):
+        """Starts accepting updates; `processor` handles one update (e.g. Application.process_update)."""
+        self._processor = processor
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._running = True
+        logger.info(f"Update queue started (concurrency {self.concurrency}, max {self.max_pending} pending)")
+
+    def add_observer(self, observer: Callable[[Update, float, bool], Any]):
+        """Registers observer(update, seconds_since_enqueued, failed), called after each update is handled."""
+        self._observers.append(observer)
+
+    def submit(self, update: Update) -> bool:
+        """Queues an update. Returns False if the queue is full or not running."""
+        if not self._running:
+            logger.error("Update queue is not running; update rejected")
+            return False
+        if len(self._tasks) >= self.max_pending:
+            self._stats["rejected"] += 1
+            logger.warning(f"Update queue full, rejecting update {update.update_id}: {self.metrics()}")
+            return False
+
+        # Tasks start in creation order, so they also enter their user's lane in arrival order
+        task = asyncio.create_task(self._process(update, time.monotonic()), name=f"update-{update.update_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._stats["enqueued"] += 1
+        self._stats["max_pending"] = max(self._stats["max_pending"], len(self._tasks))
+        return True
+
+    async def _process(self, update: Update, enqueued_at: float):
+        user_id = get_update_user_id(update)
+        # Wait for the user's lane first, so queued updates of a busy player don't hold concurrency slots
+        async with user_lanes.lane(user_id):
+            async with self._semaphore:
+                wait_seconds = time.monotonic() - enqueued_at
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait_seconds)
+                tracer.record("update_queue.wait", wait_seconds)
+                self._in_flight += 1
+                failed = False
+                try:
+                    with tracer.span("update_queue.process", update_id=update.update_id):
+                        with tracer.span("session.refresh"):
+                            await refresh_user_sessions(user_id)
+                        try:
+                            await self._processor(update)
+                        finally:
+                            with tracer.span("session.flush"):
+                                await flush_user_sessions(user_id)
+                    self._stats["processed"] += 1
+                except Exception:
+                    failed = True
+                    self._stats["failed"] += 1
+                    logger.error(f"!!! CAUGHT EXCEPTION while processing update {update.update_id} !!!")
+                    logger.error(traceback.format_exc())
+                finally:
+                    self._in_flight -= 1
+        self._notify_observers(update, time.monotonic() - enqueued_at, failed)
+
+    def _notify_observers(self, update: Update, seconds: float, failed: bool):
+        for observer in self._observers:
+            try:
+                observer(update, seconds, failed)
+            except Exception as e:
+                logger.warning(f"Update queue observer failed: {e}")
+
+    async def drain(self, timeout: float = UPDATE_QUEUE_DRAIN_TIMEOUT):
+        """Stops accepting updates and waits (up to timeout) for pending ones; the rest are cancelled."""
+        self._running = False
+        if not self._tasks:
+            return
+        _, still_pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if still_pending:
+            logger.warning(f"Update queue drain timed out, cancelling {len(still_pending)} updates")
+            for task in still_pending:
+                task.cancel()
+            await asyncio.gather(*still_pending, return_exceptions=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, in-flight count and backpressure counters."""
+        return {
+            "pending": len(self._tasks),
+            "queued": len(self._tasks) - self._in_flight,
+            "in_flight": self._in_flight,
+            **self._stats,
+            **user_lanes.metrics(),
+        }
+
+
+# Global instance
+update_queue = UpdateQueue()
@@ -0,0 +1,55 @@
+"""
+Per-user execution lanes.
+
+A lane is an asyncio lock per user: work for the same user runs one item at a
+time in arrival order (asyncio locks are FIFO), while different users never
+wait for each other. Locks exist only while someone holds or waits for them,
+so idle users cost no memory.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, List
+
+logger = logging.getLogger(__name__)
+
+
+class UserLanes:
+    """Lock map keyed by user with reference counting, so idle lanes are evicted immediately."""
+
+    def __init__(self):
+        # user_id -> [lock, number of holders and waiters]
+        self._lanes: Dict[Hashable, List] = {}
+        self._stats = {"entered": 0, "contended": 0, "max_queue": 0}
+
+    @asynccontextmanager
+    async def lane(self, user_id: Hashable):
+        """Runs the enclosed block exclusively for this user."""
+        lane = self._lanes.get(user_id)
+        if lane is None:
+            lane = self._lanes[user_id] = [asyncio.Lock(), 0]
+        lane[1] += 1
+        if lane[1] > 1:
+            self._stats["contended"] += 1
+            self._stats["max_queue"] = max(self._stats["max_queue"], lane[1])
+        try:
+            async with lane[0]:
+                self._stats["entered"] += 1
+                yield
+        finally:
+            lane[1] -= 1
+            if lane[1] == 0 and self._lanes.get(user_id) is lane:
+                del self._lanes[user_id]
+
+    def is_busy(self, user_id: Hashable) -> bool:
+        """True if work for this user is running or waiting."""
+        return user_id in self._lanes
+
+    def metrics(self) -> dict:
+        """Number of active lanes and contention counters."""
+        return {"active_lanes": len(self._lanes), **self._stats}
+
+
+# Global instance
+user_lanes = UserLanes()
@@ -1,36 +1,17 @@
 import os
 import datetime
+import hashlib
 import json
 import tempfile
 import re
 from typing import Optional
-from google.cloud import storage
-from config import GCS_BUCKET_NAME
 import pytz
-storage_client = None
-bucket = None
+from chat_log_writer import chat_log_writer
 
-def _get_bucket():
-    """Lazy initialization of storage client and bucket."""
-    global storage_client, bucket
-    if storage_client is None:
-        storage_client = storage.Client()
-    if bucket is None and GCS_BUCKET_NAME:
-        try:
-            bucket = storage_client.bucket(GCS_BUCKET_NAME)
-        except Exception as e:
-            print(f"WARNING: Failed to initialize GCS bucket '{GCS_BUCKET_NAME}': {e}")
-            bucket = None
-    return bucket
 _BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def log_message(user_id: int, role: str, content: str, participant_code: str = None):
-    """Writes a message to the user's chat history log in Google Cloud Storage."""
-    bucket = _get_bucket()
-    if not bucket:
-        print("WARNING: GCS_BUCKET_NAME is not set or invalid. Cloud logging is disabled.")
-        return
-
+    """Appends a message to the user's chat history log (flushed to Google Cloud Storage in the background)."""
     try:
         # Log all messages in full without any truncation
         # This ensures complete data capture for both research and regular logs
@@ -41,35 +22,32 @@ def log_message(user_id: int, role: str, content: str, participant_code: str = N
             blob_name = f"participant_logs/{participant_code}_chat_history.txt"
         else:
             blob_name = f"user_logs/chat_history_{user_id}.txt"
-        blob = bucket.blob(blob_name)
-
-        try:
-            existing_content = blob.download_as_text(encoding="utf-8")
-        except Exception: 
-            existing_content = ""
 
         # Use CET/CEST timezone (Central European Time)
         cet_tz = pytz.timezone('Europe/Berlin')
         timestamp = datetime.datetime.now(cet_tz).strftime("%Y-%m-%d %H:%M:%S %Z")
         log_entry = f"[{timestamp}] ({role}): {sanitized_content}\n"
-        new_content = existing_content + log_entry
 
-        blob.upload_from_string(new_content, content_type="text/plain; charset=utf-8")
+        chat_log_writer.append(blob_name, log_entry)
 
     except Exception as e:
-        print(f"[ERROR] Failed to write log to Cloud Storage for user {user_id}: {e}")
+        print(f"[ERROR] Failed to queue log entry for user {user_id}: {e}")
 
 # Cache for system prompts to avoid repeated file I/O
 _prompt_cache = {}
+# Content hashes of cached prompts (see get_prompt_version)
+_prompt_versions = {}
 
 def clear_prompt_cache(filepath: str = None):
     """Clears the prompt cache for a specific file or all files."""
     global _prompt_cache
     if filepath:
         _prompt_cache.pop(filepath, None)
+        _prompt_versions.pop(filepath, None)
         print(f"Cleared cache for {filepath}")
     else:
         _prompt_cache.clear()
+        _prompt_versions.clear()
         print("Cleared all prompt cache")
 
 def combine_character_prompt(character_name: str, language_level: str = "B1") -> str:
@@ -88,23 +66,14 @@ def combine_character_prompt(character_name: str, language_level: str = "B1") ->
     game_characters = ["narrator", "tim", "fiona", "pauline", "ronnie"]
     
     try:
-        # Load character-specific prompt
-        character_prompt_path = f"prompts/prompt_{character_name}.md"
-        character_prompt = load_system_prompt(character_prompt_path)
-        
         # Only combine with language requirements for game characters and narrator
         if character_name in game_characters:
-            # Load language requirements for the specified level
-            language_file = f"prompts/language_learning/{language_level.lower()}.md"
-            language_requirements = load_system_prompt(language_file)
-            
-            # Combine them with clear separation
-            combined_prompt = f"{character_prompt}\n\n---\n\n## Language Requirements\n{language_requirements}"
-            
-            return combined_prompt
+            # Combined prompts are prebuilt once per character and level
+            from prompt_table import prompt_table  # Import here to avoid circular dependency
+            return prompt_table.get(character_name, language_level).text
         else:
             # For non-game characters (like tutor), return just the character prompt
-            return character_prompt
+            return load_system_prompt(f"prompts/prompt_{character_name}.md")
         
     except Exception as e:
         print(f"ERROR: Failed to combine prompt for character {character_name} with level {language_level}: {e}")
@@ -150,6 +119,12 @@ def load_system_prompt(filepath: str) -> str:
         print(f"ERROR: Could not load prompt file {absolute_path}: {e}")
         return "You are a helpful assistant."
 
+def get_prompt_version(filepath: str) -> str:
+    """Returns a short content hash of a prompt file, used to version cached AI answers."""
+    if filepath not in _prompt_versions:
+        _prompt_versions[filepath] = hashlib.sha256(load_system_prompt(filepath).encode("utf-8")).hexdigest()[:12]
+    return _prompt_versions[filepath]
+
 
 
 
@@ -0,0 +1,91 @@
+"""
+Precomputed difficult-word index for the static texts in game_texts/.
+
+The index (game_texts/word_index.json) is produced offline by
+build_word_index.py. For every static text and language level it holds the
+word-spotter result, the tutor explanation of each of those words in context
+and the explanation of the whole text. The "Explain" buttons on clues and
+narrator phrases are then answered from memory without calling the LLM.
+
+The index is only used while it matches the current lexicographer and tutor
+prompts; after a prompt edit it is ignored until it is rebuilt.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+from explanation_cache import normalise_text
+
+logger = logging.getLogger(__name__)
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+WORD_INDEX_PATH = "game_texts/word_index.json"
+LEXICOGRAPHER_PROMPT_FILE = "prompts/prompt_lexicographer.md"
+LANGUAGE_LEVELS = ("A2", "B1", "B2")
+
+
+def text_key(text: str, language_level: str) -> str:
+    """Index key of a static text for one language level."""
+    digest = hashlib.sha256(normalise_text(text).encode("utf-8")).hexdigest()
+    return f"{language_level.upper()}:{digest}"
+
+
+class WordIndex:
+    """Read-only lookups into the precomputed word index."""
+
+    def __init__(self):
+        self._entries: Dict[str, dict] = {}
+        self.loaded = False
+
+    def load(self, path: str = WORD_INDEX_PATH):
+        """Loads the index file. A missing, unreadable or outdated index just disables lookups."""
+        from config import CHARACTER_DATA
+        from utils import get_prompt_version
+
+        self._entries = {}
+        self.loaded = False
+        absolute_path = os.path.join(_BASE_DIR, path)
+        try:
+            with open(absolute_path, "r", encoding="utf-8") as index_file:
+                data = json.load(index_file)
+        except FileNotFoundError:
+            logger.info(f"No word index at {path}; static texts will be analysed at runtime")
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load word index {path}: {e}")
+            return
+
+        expected_versions = {
+            "lexicographer": get_prompt_version(LEXICOGRAPHER_PROMPT_FILE),
+            "tutor": get_prompt_version(CHARACTER_DATA["tutor"]["prompt_file"]),
+        }
+        if data.get("prompt_versions") != expected_versions:
+            logger.warning(f"Word index {path} was built with different prompts; run build_word_index.py to rebuild it")
+            return
+
+        self._entries = data.get("entries", {})
+        self.loaded = True
+        logger.info(f"Loaded word index with {len(self._entries)} entries")
+
+    def lookup_words(self, text: str, language_level: str) -> Optional[List[str]]:
+        """Difficult words of a static text, or None if the text is not indexed."""
+        entry = self._entries.get(text_key(text, language_level))
+        return list(entry["words"]) if entry else None
+
+    def lookup_explanation(self, text_to_explain: str, original_message: str, language_level: str) -> Optional[dict]:
+        """Tutor explanation of a word (or the whole text) of a static text, or None if not indexed."""
+        entry = self._entries.get(text_key(original_message, language_level))
+        if not entry:
+            return None
+        if normalise_text(text_to_explain) == normalise_text(original_message):
+            explanation = entry.get("text_explanation")
+        else:
+            explanation = entry.get("explanations", {}).get(normalise_text(text_to_explain))
+        return dict(explanation) if explanation else None
+
+
+# Global instance
+word_index = WordIndex()